@@ -0,0 +1,77 @@
+"""Per-call overhead of the hot DBSnippetRepo reads
+
+Runs each read against an in-memory SQLite library, once through the
+repository (lambda statements) and once with the repository's statement
+built as a plain select() per call (cached=False), as it did before. The
+database work is the same, so the difference is statement construction
+and cache key generation.
+
+    uv run python benchmarks/hot_queries.py [calls]
+"""
+
+import sys
+import timeit
+
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+from snipster_tui.models import Language, Snippet
+from snipster_tui.repo import DBSnippetRepo
+
+
+def main(calls: int = 5000) -> None:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        repo = DBSnippetRepo(session)
+        for number in range(200):
+            language = list(Language)[number % len(Language)]
+            snippet = Snippet(
+                title=f"Snippet {number}",
+                code="print()",
+                description="",
+                language=language,
+            )
+            repo.add(snippet)
+
+        cases = {
+            "get": (
+                lambda: repo.get(7),
+                lambda: session.exec(
+                    DBSnippetRepo.get_statement(7, cached=False)
+                ).first(),
+            ),
+            "list": (
+                lambda: repo.list(language=Language.python, order_by="title"),
+                lambda: (
+                    session.exec(
+                        DBSnippetRepo.list_statement(
+                            language=Language.python, order_by="title", cached=False
+                        )
+                    )
+                    .unique()
+                    .all()
+                ),
+            ),
+            "search": (
+                lambda: repo.search("nippet 1"),
+                lambda: session.exec(
+                    DBSnippetRepo.search_statement("nippet 1", cached=False)
+                ).all(),
+            ),
+        }
+        print(f"{'query':<8} {'fresh select':>14} {'cached':>10} {'saved':>8}")
+        for name, (cached, fresh) in cases.items():
+            fresh_time = min(timeit.repeat(fresh, number=calls, repeat=3)) / calls
+            cached_time = min(timeit.repeat(cached, number=calls, repeat=3)) / calls
+            print(
+                f"{name:<8} {fresh_time * 1e6:>12.1f}us {cached_time * 1e6:>8.1f}us"
+                f" {1 - cached_time / fresh_time:>7.0%}"
+            )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -1,2 +1,33 @@
-def main() -> None:
-    print("Hello from snipster-tui!")
+import argparse
+import sys
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="snipster-tui")
+    parser.add_argument(
+        "--memory-report",
+        action="store_true",
+        help="print the top allocators per screen (tracemalloc) on exit",
+    )
+    args = parser.parse_args(argv)
+
+    from snipster_tui.tui import Snipster
+
+    if not args.memory_report:
+        Snipster().run()
+        return
+
+    from snipster_tui.memory import MemoryReport
+
+    report = MemoryReport()
+    report.start("Snipster")
+    app = Snipster(memory_report=report)
+    try:
+        app.run()
+    finally:
+        report.stop()
+        report.write(sys.stderr)
+        print(
+            f"Approximate bytes held at exit: {app.memory_budget.usage()}",
+            file=sys.stderr,
+        )
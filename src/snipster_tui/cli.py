@@ -0,0 +1,377 @@
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+# Headless fast path: subcommands import what they need themselves and nothing
+# here pulls in Textual/Rich. The Language values are repeated so that parsing
+# arguments (and --help) does not have to import the models.
+LANGUAGE_CODES = ("py", "js", "rs", "go", "ps", "sh", "sql", "ot")
+
+
+@contextmanager
+def open_repo(snippet_type=None, session_factory=None, libraries=None):
+    """Repository of the running daemon, direct DB access otherwise
+
+    snippet_type: what the daemon's snippets are returned as (SnippetData by
+    default), session_factory and libraries default to the configured ones.
+    """
+    from snipster_tui.client import connect
+
+    remote = connect(snippet_type=snippet_type)
+    if remote is not None:
+        with remote:
+            yield remote
+        return
+
+    from snipster_tui import db
+
+    if libraries is None:
+        libraries = db.LIBRARIES_MOD
+    if libraries:
+        from snipster_tui.federation import get_federation
+
+        yield get_federation(libraries)
+        return
+
+    from snipster_tui.repo import DBSnippetRepo
+
+    with db.session_scope(session_factory) as session:
+        yield DBSnippetRepo(session)
+
+
+def snippet_to_dict(snippet, tags=None, with_code=False) -> dict:
+    from snipster_tui.usage import decayed
+
+    data = {
+        "id": snippet.id,
+        "title": snippet.title,
+        "description": snippet.description,
+        "language": snippet.language.value,
+        "favorite": snippet.favorite,
+        # Uses, each weighted by how recent it is
+        "frecency": round(decayed(snippet.frecency), 3),
+    }
+    if tags is not None:
+        data["tags"] = tags
+    if with_code:
+        data["code"] = snippet.code
+    return data
+
+
+def print_snippets(snippets, tags: dict, as_json: bool) -> None:
+    if as_json:
+        rows = [snippet_to_dict(s, tags[s.id]) for s in snippets]
+        print(json.dumps(rows, ensure_ascii=False))
+        return
+    for snippet in snippets:
+        favorite = "*" if snippet.favorite else " "
+        line = f"{snippet.id}\t{favorite} {snippet.language.value}\t{snippet.title}"
+        if tags[snippet.id]:
+            line += f"\t[{', '.join(tags[snippet.id])}]"
+        print(line)
+
+
+def cmd_get(args: argparse.Namespace) -> int:
+    with open_repo() as repo:
+        snippet = repo.get(args.snippet_id, with_body=True)
+        if snippet is None:
+            print(f"Snippet {args.snippet_id} not found", file=sys.stderr)
+            return 1
+        if args.json:
+            tags = repo.get_tags([snippet.id])[snippet.id]
+            print(json.dumps(snippet_to_dict(snippet, tags, with_code=True)))
+        else:
+            sys.stdout.write(snippet.code)
+            if not snippet.code.endswith("\n"):
+                sys.stdout.write("\n")
+    return 0
+
+
+def cmd_list(args: argparse.Namespace) -> int:
+    from snipster_tui.languages import Language
+
+    with open_repo() as repo:
+        snippets = repo.list(
+            favorite=args.favorites or None,
+            language=Language(args.language) if args.language else None,
+            tags=args.tag,
+            match_all_tags=args.all_tags,
+            order_by="frecency",
+            descending=True,
+        )
+        tags = repo.get_tags([s.id for s in snippets])
+        print_snippets(snippets, tags, args.json)
+    return 0
+
+
+def cmd_search(args: argparse.Namespace) -> int:
+    from snipster_tui.languages import Language
+
+    with open_repo() as repo:
+        language = Language(args.language) if args.language else None
+        snippets = repo.search(args.term, language=language)
+        tags = repo.get_tags([s.id for s in snippets])
+        print_snippets(snippets, tags, args.json)
+    return 0 if snippets else 1
+
+
+def cmd_add(args: argparse.Namespace) -> int:
+    from snipster_tui.models import FILE_EXTENSIONS, Language, Snippet
+
+    if args.file:
+        code = args.file.read_text(encoding="utf-8")
+    else:
+        code = sys.stdin.read()
+
+    if args.language:
+        language = Language(args.language)
+    else:
+        by_extension = {ext: lang for lang, ext in FILE_EXTENSIONS.items()}
+        suffix = args.file.suffix if args.file else ""
+        language = by_extension.get(suffix, Language.other)
+
+    title = args.title or (args.file.stem if args.file else "Untitled")
+    with open_repo() as repo:
+        snippet = Snippet(
+            title=title,
+            code=code,
+            description=args.description,
+            language=language,
+        )
+        repo.add(snippet)
+        if args.tag:
+            repo.set_tags(snippet.id, args.tag)
+        print(snippet.id)
+    return 0
+
+
+def cmd_similar(args: argparse.Namespace) -> int:
+    with open_repo() as repo:
+        matches = repo.similar(args.snippet_id, args.threshold, args.limit)
+    if args.json:
+        rows = [{**snippet_to_dict(s), "similarity": score} for s, score in matches]
+        print(json.dumps(rows, ensure_ascii=False))
+        return 0
+    for snippet, score in matches:
+        print(f"{snippet.id}\t{score:.2f}\t{snippet.language.value}\t{snippet.title}")
+    return 0
+
+
+def cmd_duplicates(args: argparse.Namespace) -> int:
+    with open_repo() as repo:
+        clusters = repo.duplicate_clusters(args.threshold)
+    if args.json:
+        print(json.dumps(clusters))
+        return 0
+    for cluster in clusters:
+        print(" ".join(str(snippet_id) for snippet_id in cluster))
+    return 0
+
+
+def cmd_purge(args: argparse.Namespace) -> int:
+    from datetime import timedelta
+
+    from snipster_tui.repo import TRASH_RETENTION
+
+    if args.all:
+        older_than = None
+    elif args.days is not None:
+        older_than = timedelta(days=args.days)
+    else:
+        older_than = TRASH_RETENTION
+    with open_repo() as repo:
+        count = repo.purge(older_than, batch_size=args.batch_size)
+    print(f"Purged {count} snippets from the trash")
+    return 0
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    from snipster_tui.export import export_snippets
+
+    with open_repo() as repo:
+        count = export_snippets(
+            repo,
+            args.format,
+            args.target,
+            compress=args.gzip,
+            workers=args.workers,
+            batch_size=args.batch_size,
+        )
+    print(f"Exported {count} snippets to {args.target}")
+    return 0
+
+
+def cmd_mirror(args: argparse.Namespace) -> int:
+    from snipster_tui.mirror import SnippetMirror
+
+    with open_repo() as repo:
+        mirror = SnippetMirror(repo, args.target, args.debounce)
+        stats = mirror.sync_from_db()
+        print(
+            f"Mirrored to {args.target}: {stats.written} written, "
+            f"{stats.removed} removed, {stats.unchanged} unchanged"
+        )
+        if args.watch:
+            print("Watching for changes, Ctrl+C to stop")
+            try:
+                mirror.watch(interval=args.interval)
+            except KeyboardInterrupt:
+                pass
+    return 0
+
+
+def cmd_daemon(args: argparse.Namespace) -> int:
+    from snipster_tui.daemon import serve
+
+    server = serve(args.socket)
+    print(f"Serving on {server.path}, Ctrl+C to stop", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def cmd_maintain(args: argparse.Namespace) -> int:
+    from snipster_tui.db import session_scope
+    from snipster_tui.maintain import maintain
+
+    # Works on the database itself, never through the daemon
+    with session_scope() as session:
+        report = maintain(
+            session,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            rebuild=args.rebuild,
+            vacuum=not args.skip_vacuum,
+            reindex=not args.skip_reindex,
+        )
+    if args.json:
+        print(json.dumps(report.to_dict()))
+        return 0
+    print(
+        f"Checked {report.checked} snippets in {report.seconds:.2f} s "
+        f"({report.rows_per_second:.0f}/s, {report.workers} workers): "
+        f"{report.repaired} repaired, "
+        f"{report.reindexed} signatures rebuilt, {report.orphans} orphans removed"
+    )
+    for name, seconds, outcome in report.steps:
+        print(f"{name}\t{seconds:.2f} s\t{outcome}")
+    ok = all(
+        outcome == "ok"
+        for name, _, outcome in report.steps
+        if name == "integrity_check"
+    )
+    return 0 if ok else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="snipster", description="Snipster CLI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    get = commands.add_parser("get", help="Print the code of a snippet")
+    get.add_argument("snippet_id", type=int)
+    get.add_argument("--json", action="store_true", help="Print all fields as JSON")
+    get.set_defaults(handler=cmd_get)
+
+    list_ = commands.add_parser("list", help="List snippets")
+    list_.add_argument("--favorites", action="store_true")
+    list_.add_argument("--language", choices=LANGUAGE_CODES)
+    list_.add_argument("--tag", action="append", help="Filter by tag (repeatable)")
+    list_.add_argument("--all-tags", action="store_true", help="Require every tag")
+    list_.add_argument("--json", action="store_true")
+    list_.set_defaults(handler=cmd_list)
+
+    search = commands.add_parser("search", help="Search snippets by title")
+    search.add_argument("term")
+    search.add_argument("--language", choices=LANGUAGE_CODES)
+    search.add_argument("--json", action="store_true")
+    search.set_defaults(handler=cmd_search)
+
+    add = commands.add_parser("add", help="Add a snippet from a file or stdin")
+    add.add_argument("file", type=Path, nargs="?", help="Defaults to stdin")
+    add.add_argument("--title")
+    add.add_argument("--description", default="")
+    add.add_argument("--language", choices=LANGUAGE_CODES)
+    add.add_argument("--tag", action="append", help="Tag (repeatable)")
+    add.set_defaults(handler=cmd_add)
+
+    similar = commands.add_parser("similar", help="Snippets with similar code")
+    similar.add_argument("snippet_id", type=int)
+    similar.add_argument("--threshold", type=float)
+    similar.add_argument("--limit", type=int, default=10)
+    similar.add_argument("--json", action="store_true")
+    similar.set_defaults(handler=cmd_similar)
+
+    duplicates = commands.add_parser(
+        "duplicates", help="Clusters of near-duplicate snippets, one per line"
+    )
+    duplicates.add_argument("--threshold", type=float)
+    duplicates.add_argument("--json", action="store_true")
+    duplicates.set_defaults(handler=cmd_duplicates)
+
+    purge = commands.add_parser(
+        "purge", help="Delete snippets that have been in the trash for a while"
+    )
+    purge.add_argument(
+        "--days", type=float, help="Default: SNIPSTER_TRASH_DAYS, else 30"
+    )
+    purge.add_argument("--all", action="store_true", help="Empty the whole trash")
+    purge.add_argument("--batch-size", type=int, default=500)
+    purge.set_defaults(handler=cmd_purge)
+
+    export = commands.add_parser("export", help="Export all snippets")
+    export.add_argument("target", type=Path, help="Output file or directory")
+    export.add_argument(
+        "--format",
+        choices=("jsonl", "markdown", "files"),
+        default="jsonl",
+        help="jsonl, a Markdown cookbook or one file per snippet",
+    )
+    export.add_argument("--gzip", action="store_true", help="gzip the output")
+    export.add_argument("--workers", type=int, default=4)
+    export.add_argument("--batch-size", type=int, default=500)
+    export.set_defaults(handler=cmd_export)
+
+    mirror = commands.add_parser("mirror", help="Mirror snippets to a directory")
+    mirror.add_argument("target", type=Path, help="Mirror root directory")
+    mirror.add_argument("--watch", action="store_true", help="Sync edits back")
+    mirror.add_argument("--interval", type=float, default=1.0)
+    mirror.add_argument("--debounce", type=float, default=0.5)
+    mirror.set_defaults(handler=cmd_mirror)
+
+    daemon = commands.add_parser("daemon", help="Serve the library over a socket")
+    daemon.add_argument("--socket", type=Path, help="Defaults to SNIPSTER_SOCKET")
+    daemon.set_defaults(handler=cmd_daemon)
+
+    maintain = commands.add_parser(
+        "maintain", help="Verify derived data, then reindex, analyze and vacuum"
+    )
+    maintain.add_argument(
+        "--workers", type=int, help="Processes recomputing, default: all CPUs"
+    )
+    maintain.add_argument("--chunk-size", type=int, default=500)
+    maintain.add_argument(
+        "--rebuild", action="store_true", help="Rewrite all derived data"
+    )
+    maintain.add_argument("--skip-vacuum", action="store_true")
+    maintain.add_argument("--skip-reindex", action="store_true")
+    maintain.add_argument("--json", action="store_true")
+    maintain.set_defaults(handler=cmd_maintain)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    from snipster_tui.exceptions import LibraryNotSetUpError
+
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except LibraryNotSetUpError as error:
+        print(error, file=sys.stderr)
+        return 1
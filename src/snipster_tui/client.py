@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import builtins
+import json
+import socket
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from decouple import config
+
+from snipster_tui.exceptions import DaemonError, SnippetNotFoundError
+from snipster_tui.languages import Language
+
+# Client side of `snipster daemon`, see daemon.py for the protocol. Kept free
+# of SQLAlchemy and numpy so a CLI call served by the daemon starts fast.
+
+# db.DEFAULT_PROJECT_HOME, repeated so this module does not import the database
+SOCKET_PATH = Path(
+    config(
+        "SNIPSTER_SOCKET", default=str(Path.home() / ".snipster_tui" / "snipster.sock")
+    )
+)
+
+# Exceptions re-raised as themselves on the client side
+ERRORS = {
+    "SnippetNotFoundError": SnippetNotFoundError,
+    "ValueError": ValueError,
+}
+
+# Fields of models.Snippet sent over the wire
+SNIPPET_FIELDS = (
+    "id",
+    "title",
+    "code",
+    "description",
+    "favorite",
+    "language",
+    "content_hash",
+    "code_preview",
+    "line_count",
+    "byte_size",
+    "frecency",
+    "deleted_at",
+)
+
+
+@dataclass
+class SnippetData:
+    """A snippet as the daemon sends it, with the fields of models.Snippet"""
+
+    title: str = ""
+    # None when the body was not requested
+    code: str | None = None
+    description: str = ""
+    language: Language = Language.python
+    id: int | None = None
+    favorite: bool = False
+    content_hash: str | None = None
+    code_preview: str = ""
+    line_count: int = 0
+    byte_size: int = 0
+    frecency: float = 0.0
+    deleted_at: datetime | None = None
+
+    def model_dump(self, mode: str = "python") -> dict:
+        data = asdict(self)
+        if mode == "json":
+            data["language"] = self.language.value
+            if self.deleted_at is not None:
+                data["deleted_at"] = self.deleted_at.isoformat()
+        return data
+
+
+@dataclass
+class RevisionData:
+    """Revision metadata as the daemon sends it, see models.SnippetRevision"""
+
+    snippet_id: int
+    number: int
+    title: str
+    created_at: datetime
+    keyframe: bool
+
+
+def snippet_to_wire(snippet) -> dict:
+    """Fields of a snippet (models.Snippet or SnippetData) the caller set"""
+    data = {
+        name: getattr(snippet, name)
+        for name in SNIPPET_FIELDS
+        if getattr(snippet, name, None) is not None
+    }
+    if "deleted_at" in data:
+        data["deleted_at"] = data["deleted_at"].isoformat()
+    return data
+
+
+def snippet_from_wire(data: dict, snippet_type=SnippetData):
+    """snippet_type(**data) with the JSON values converted back"""
+    data = dict(data)
+    data["language"] = Language(data.get("language", Language.python))
+    # Body columns left out by with_body=False
+    data.setdefault("description", "")
+    if data.get("deleted_at") is not None:
+        data["deleted_at"] = datetime.fromisoformat(data["deleted_at"])
+    return snippet_type(**data)
+
+
+def revision_from_wire(data: dict) -> RevisionData:
+    data = dict(data)
+    data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return RevisionData(**data)
+
+
+def connect(path: Path | None = None, snippet_type=None):
+    """Client for the running daemon, None if there is none"""
+    path = path or SOCKET_PATH
+    if not path.exists():
+        return None
+    try:
+        return RemoteSnippetRepo(path, snippet_type=snippet_type)
+    except OSError:
+        return None
+
+
+class RemoteSnippetRepo:
+    """The SnippetRepository interface, served by a running `snipster daemon`
+
+    Snippets come back as snippet_type, SnippetData unless the caller wants
+    models.Snippet.
+    """
+
+    def __init__(self, path: Path, timeout: float = 10.0, snippet_type=None):
+        self.path = path
+        self.snippet_type = snippet_type or SnippetData
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(str(path))
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rwb")
+        self._next_id = 0
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _send(self, op: str, args: dict) -> int:
+        self._next_id += 1
+        request = {"id": self._next_id, "op": op, "args": args}
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        return self._next_id
+
+    def _read(self, request_id: int) -> dict:
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("Daemon closed the connection")
+        message = json.loads(line)
+        if message["id"] != request_id:
+            raise DaemonError(f"Expected reply {request_id}, got {message['id']}")
+        return message
+
+    @staticmethod
+    def _check(message: dict) -> dict:
+        if "error" in message:
+            error = ERRORS.get(message["error"], DaemonError)
+            raise error(message["message"])
+        return message
+
+    def _receive(self, request_id: int) -> dict:
+        return self._check(self._read(request_id))
+
+    def call(self, op: str, **args) -> Any:
+        request_id = self._send(op, args)
+        self._file.flush()
+        return self._receive(request_id)["ok"]
+
+    def pipeline(self, calls: Sequence[tuple[str, dict]]) -> builtins.list[Any]:
+        """Send all calls in one write, then collect the replies in order"""
+        request_ids = [self._send(op, args) for op, args in calls]
+        self._file.flush()
+        # Every reply is read before an error is raised, or the next call
+        # would find the rest of them
+        messages = [self._read(request_id) for request_id in request_ids]
+        return [self._check(message)["ok"] for message in messages]
+
+    def _snippet(self, data: dict):
+        return snippet_from_wire(data, self.snippet_type)
+
+    def add(self, snippet) -> None:
+        stored = self.call("add", snippet=snippet_to_wire(snippet))
+        for name, value in stored.items():
+            setattr(snippet, name, value)
+
+    def list(
+        self,
+        favorite: bool | None = None,
+        with_body: bool = False,
+        language: Language | None = None,
+        order_by: str = "id",
+        descending: bool = False,
+        tags: Sequence[str] | None = None,
+        match_all_tags: bool = False,
+    ) -> builtins.list:
+        rows = self.call(
+            "list",
+            favorite=favorite,
+            with_body=with_body,
+            language=language,
+            order_by=order_by,
+            descending=descending,
+            tags=list(tags) if tags else None,
+            match_all_tags=match_all_tags,
+        )
+        return [self._snippet(row) for row in rows]
+
+    def get(self, snippet_id: int, with_body: bool = True):
+        row = self.call("get", snippet_id=snippet_id, with_body=with_body)
+        return self._snippet(row) if row else None
+
+    def get_many(
+        self, snippet_ids: Sequence[int], with_body: bool = True
+    ) -> builtins.list:
+        rows = self.call("get_many", snippet_ids=list(snippet_ids), with_body=with_body)
+        return [self._snippet(row) for row in rows]
+
+    def delete(self, snippet_id: int) -> None:
+        self.call("delete", snippet_id=snippet_id)
+
+    def restore(self, snippet_id: int) -> None:
+        self.call("restore", snippet_id=snippet_id)
+
+    def list_trash(self) -> builtins.list:
+        return [self._snippet(row) for row in self.call("list_trash")]
+
+    def purge(self, older_than: timedelta | None = None, batch_size: int = 500) -> int:
+        seconds = older_than.total_seconds() if older_than is not None else None
+        return self.call("purge", older_than=seconds, batch_size=batch_size)
+
+    def search(
+        self, snippet_title: str, language: Language | None = None
+    ) -> builtins.list:
+        rows = self.call("search", snippet_title=snippet_title, language=language)
+        return [self._snippet(row) for row in rows]
+
+    def favorite_on(self, snippet_id: int) -> None:
+        self.call("favorite_on", snippet_id=snippet_id)
+
+    def favorite_off(self, snippet_id: int) -> None:
+        self.call("favorite_off", snippet_id=snippet_id)
+
+    def list_favorites(self) -> builtins.list:
+        return [self._snippet(row) for row in self.call("list_favorites")]
+
+    def update(self, snippet) -> None:
+        self.call("update", snippet=snippet_to_wire(snippet))
+
+    def patch(self, snippet_id: int, **fields) -> None:
+        self.call("patch", snippet_id=snippet_id, **fields)
+
+    def history(self, snippet_id: int) -> builtins.list[RevisionData]:
+        rows = self.call("history", snippet_id=snippet_id)
+        return [revision_from_wire(row) for row in rows]
+
+    def revision_code(self, snippet_id: int, number: int) -> str:
+        return self.call("revision_code", snippet_id=snippet_id, number=number)
+
+    def iter_snippets(self, batch_size: int = 500, with_body: bool = True) -> Iterator:
+        # Own connection, so the caller can keep using this one meanwhile
+        with RemoteSnippetRepo(self.path, snippet_type=self.snippet_type) as stream:
+            request_id = stream._send(
+                "iter_snippets", {"batch_size": batch_size, "with_body": with_body}
+            )
+            stream._file.flush()
+            while "batch" in (message := stream._receive(request_id)):
+                for row in message["batch"]:
+                    yield self._snippet(row)
+
+    def set_tags(self, snippet_id: int, tags: Sequence[str]) -> None:
+        self.call("set_tags", snippet_id=snippet_id, tags=list(tags))
+
+    def get_tags(self, snippet_ids: Sequence[int]) -> dict[int, builtins.list[str]]:
+        tags = self.call("get_tags", snippet_ids=list(snippet_ids))
+        return {int(snippet_id): names for snippet_id, names in tags.items()}
+
+    def list_tags(self) -> builtins.list[str]:
+        return self.call("list_tags")
+
+    def similar(
+        self, snippet_id: int, threshold: float | None = None, limit: int = 10
+    ) -> builtins.list[tuple[Any, float]]:
+        """threshold=None: the daemon's similarity.SIMILAR_THRESHOLD"""
+        args = {"snippet_id": snippet_id, "limit": limit}
+        if threshold is not None:
+            args["threshold"] = threshold
+        rows = self.call("similar", **args)
+        return [(self._snippet(row), score) for row, score in rows]
+
+    def duplicate_clusters(
+        self, threshold: float | None = None
+    ) -> builtins.list[builtins.list[int]]:
+        """threshold=None: the daemon's similarity.DUPLICATE_THRESHOLD"""
+        args = {} if threshold is None else {"threshold": threshold}
+        return self.call("duplicate_clusters", **args)
+
+    def related(
+        self, snippet_id: int, limit: int = 5
+    ) -> builtins.list[tuple[Any, float]]:
+        """Snippets with similar words, from the daemon's TF-IDF index"""
+        rows = self.call("related", snippet_id=snippet_id, limit=limit)
+        return [(self._snippet(row), score) for row, score in rows]
+
+    def record_usage(self, usage: Mapping) -> None:
+        """usage: {snippet id: models.UsageCount}"""
+        wire = {
+            snippet_id: [
+                count.opens,
+                count.copies,
+                count.last_used.isoformat() if count.last_used else None,
+                count.frecency,
+            ]
+            for snippet_id, count in usage.items()
+        }
+        self.call("record_usage", usage=wire)
+
+    def most_used(self, limit: int = 50) -> builtins.list[tuple[Any, int]]:
+        rows = self.call("most_used", limit=limit)
+        return [(self._snippet(row), uses) for row, uses in rows]
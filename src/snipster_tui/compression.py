@@ -0,0 +1,63 @@
+import zlib
+from functools import cache
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# Every stored body starts with a one byte codec marker.
+CODEC_PLAIN = b"\x00"
+CODEC_ZLIB = b"\x01"
+
+
+@cache
+def compress_threshold() -> int:
+    """SNIPSTER_COMPRESS_THRESHOLD, read on first use: importing db creates
+    the config file, which importing the models must not"""
+    from snipster_tui.db import config_modul
+
+    return config_modul("SNIPSTER_COMPRESS_THRESHOLD", default=4096, cast=int)
+
+
+def compress_code(code: str, threshold: int | None = None) -> bytes:
+    """Encode code, zlib-compressed when it is larger than threshold bytes"""
+    if threshold is None:
+        threshold = compress_threshold()
+    raw = code.encode("utf-8")
+    if len(raw) > threshold:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return CODEC_ZLIB + packed
+    return CODEC_PLAIN + raw
+
+
+def decompress_code(blob: bytes | str) -> str:
+    """Decode a stored body, plain text rows from older DBs pass through"""
+    if isinstance(blob, str):
+        return blob
+    blob = bytes(blob)
+    marker, payload = blob[:1], blob[1:]
+    if marker == CODEC_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if marker == CODEC_PLAIN:
+        return payload.decode("utf-8")
+    raise ValueError(f"Unknown codec marker {marker!r}")
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored as a codec-tagged (optionally compressed) blob"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, threshold: int | None = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_code(value, self.threshold)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_code(value)
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, cast
+
+from decouple import config
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+from snipster_tui import client, db, related
+from snipster_tui.exceptions import DaemonError, SnippetNotFoundError
+from snipster_tui.models import (
+    DERIVED_FIELDS,
+    Language,
+    Snippet,
+    SnippetRevision,
+    UsageCount,
+)
+from snipster_tui.repo import TRASH_RETENTION, DBSnippetRepo
+from snipster_tui.routing import ReplicaRouter
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two purges of snippets older than TRASH_RETENTION
+PURGE_INTERVAL = config("SNIPSTER_PURGE_INTERVAL", default=3600, cast=float)
+
+# Repository methods a client may call
+OPERATIONS = {
+    "add",
+    "list",
+    "get",
+    "get_many",
+    "delete",
+    "restore",
+    "list_trash",
+    "purge",
+    "search",
+    "favorite_on",
+    "favorite_off",
+    "list_favorites",
+    "update",
+    "patch",
+    "history",
+    "revision_code",
+    "iter_snippets",
+    "set_tags",
+    "get_tags",
+    "list_tags",
+    "similar",
+    "duplicate_clusters",
+    "record_usage",
+    "most_used",
+    "related",
+}
+
+# Writes after which the related index re-reads the snippet they touched
+REINDEXING_OPERATIONS = {"add", "update", "patch", "delete", "restore"}
+
+# Errors a request can cause: bad JSON, ops or arguments, missing snippets and
+# database errors. Any other is a bug in the daemon and logged as such.
+REQUEST_ERRORS = (
+    ValueError,
+    KeyError,
+    TypeError,
+    SnippetNotFoundError,
+    SQLAlchemyError,
+)
+
+
+# Protocol: one JSON object per line in both directions. Requests carry an
+# id and are answered in order, so a client may pipeline several before it
+# reads the replies.
+#   -> {"id": 1, "op": "get", "args": {"snippet_id": 42}}
+#   <- {"id": 1, "ok": {...}}  or  {"id": 1, "error": "...", "message": "..."}
+# iter_snippets answers with any number of {"id": 1, "batch": [...]} lines
+# before the final "ok".
+
+
+def snippet_to_wire(snippet: Snippet) -> dict:
+    """Loaded fields only, deferred body columns are left out"""
+    unloaded = inspect(snippet, raiseerr=True).unloaded
+    data = {
+        name: getattr(snippet, name)
+        for name in Snippet.model_fields
+        if name not in unloaded
+    }
+    if data.get("deleted_at") is not None:
+        data["deleted_at"] = data["deleted_at"].isoformat()
+    return data
+
+
+def revision_to_wire(revision: SnippetRevision) -> dict:
+    """Revision metadata, the payload stays on the server"""
+    return {
+        "snippet_id": revision.snippet_id,
+        "number": revision.number,
+        "title": revision.title,
+        "created_at": revision.created_at.isoformat(),
+        "keyframe": revision.keyframe,
+    }
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Snippet):
+        return snippet_to_wire(value)
+    if isinstance(value, SnippetRevision):
+        return revision_to_wire(value)
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode_args(args: dict) -> dict:
+    if args.get("language") is not None:
+        args["language"] = Language(args["language"])
+    if "snippet" in args:
+        args["snippet"] = client.snippet_from_wire(args["snippet"], Snippet)
+    if args.get("older_than") is not None:
+        args["older_than"] = timedelta(seconds=args["older_than"])
+    if "usage" in args:
+        args["usage"] = {
+            int(snippet_id): UsageCount(
+                opens,
+                copies,
+                datetime.fromisoformat(used) if used else None,
+                frecency,
+            )
+            for snippet_id, (opens, copies, used, frecency) in args["usage"].items()
+        }
+    return args
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    @property
+    def daemon(self) -> "SnippetDaemon":
+        return cast("SnippetDaemon", self.server)
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            request_id = None
+            try:
+                request = json.loads(line)
+                request_id = request["id"]
+                self.dispatch(request_id, request["op"], request.get("args", {}))
+            except REQUEST_ERRORS as error:
+                self.reply_error(request_id, error)
+            except Exception as error:
+                logger.exception("Request %s failed", request_id)
+                # The client still gets its reply and stays in step
+                self.reply_error(request_id, error)
+
+    def dispatch(self, request_id: int, op: str, args: dict) -> None:
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation {op!r}")
+        args = _decode_args(args)
+        # One short session per request, connections come from the shared pool
+        with db.session_scope(self.daemon.router.session) as session:
+            repo = DBSnippetRepo(session)
+            if op == "iter_snippets":
+                self.stream(request_id, repo.iter_snippets(**args), args)
+                return
+            if op == "related":
+                result = self.daemon.related(repo, **args)
+            else:
+                result = getattr(repo, op)(**args)
+            if op in REINDEXING_OPERATIONS:
+                snippet_id = (
+                    args["snippet"].id if "snippet" in args else args["snippet_id"]
+                )
+                self.daemon.reindex(repo, snippet_id)
+            if op == "add":
+                # What the caller's transient snippet is missing after the insert
+                snippet = args["snippet"]
+                result = {
+                    "id": snippet.id,
+                    **{name: getattr(snippet, name) for name in DERIVED_FIELDS},
+                }
+            self.reply({"id": request_id, "ok": _encode(result)})
+
+    def stream(self, request_id: int, snippets: Iterator[Snippet], args: dict):
+        batch_size = args.get("batch_size", 500)
+        batch = []
+        for snippet in snippets:
+            batch.append(snippet_to_wire(snippet))
+            if len(batch) >= batch_size:
+                self.reply({"id": request_id, "batch": batch})
+                batch = []
+        if batch:
+            self.reply({"id": request_id, "batch": batch})
+        self.reply({"id": request_id, "ok": None})
+
+    def reply(self, message: dict) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def reply_error(self, request_id: int | None, error: Exception) -> None:
+        self.reply(
+            {"id": request_id, "error": type(error).__name__, "message": str(error)}
+        )
+
+
+class SnippetDaemon(socketserver.ThreadingUnixStreamServer):
+    """Serves one set of engines (and their connection pools) to all clients"""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, database_url: str, replica_urls=()):
+        self.path = path
+        self.router = ReplicaRouter(database_url, replica_urls)
+        self.engine = self.router.primary
+        try:
+            db.upgraded(self.engine)
+        except BaseException:
+            self.router.dispose()
+            raise
+        if db.DEBUG_SESSIONS:
+            for engine in (self.router.primary, *self.router.replicas):
+                db.leak_tracker.watch(engine)
+        self._last_purge: float | None = None
+        # TF-IDF index for related(), loaded on first use, then kept up to
+        # date by the writes this daemon serves
+        self.related_index: related.RelatedIndex | None = None
+        self._related_lock = threading.Lock()
+        # Owner-only from the moment bind() creates the socket file
+        umask = os.umask(0o077)
+        try:
+            super().__init__(str(path), RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def service_actions(self) -> None:
+        """Runs between requests in serve_forever, starts the trash purge"""
+        now = time.monotonic()
+        if self._last_purge is None or now - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = now
+            threading.Thread(target=self.purge_trash, daemon=True).start()
+
+    def related(
+        self, repo: DBSnippetRepo, snippet_id: int, limit: int = 5
+    ) -> list[tuple[Snippet, float]]:
+        with self._related_lock:
+            if self.related_index is None:
+                index = related.RelatedIndex(related.INDEX_DIR)
+                # Catch up once with writes made while no daemon ran
+                index.sync(repo)
+                self.related_index = index
+            matches = self.related_index.related(snippet_id, limit)
+        rows = []
+        for match_id, score in matches:
+            snippet = repo.get(match_id, with_body=False)
+            if snippet is not None:
+                rows.append((snippet, score))
+        return rows
+
+    def reindex(self, repo: DBSnippetRepo, snippet_id: int) -> None:
+        with self._related_lock:
+            if self.related_index is not None:
+                self.related_index.refresh(repo, snippet_id)
+
+    def purge_trash(self) -> int:
+        with db.session_scope(self.router.session) as session:
+            return DBSnippetRepo(session).purge(TRASH_RETENTION)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.path.unlink(missing_ok=True)
+        self.router.dispose()
+
+
+def serve(path: Path | None = None, database_url: str | None = None):
+    """Create the daemon, replacing a stale socket left by a crashed one"""
+    path = path or client.SOCKET_PATH
+    if path.exists():
+        running = client.connect(path)
+        if running is not None:
+            running.close()
+            raise DaemonError(f"A daemon is already listening on {path}")
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if database_url is None:
+        return SnippetDaemon(path, db.DATABASE_URL_MOD, db.REPLICA_URLS_MOD)
+    return SnippetDaemon(path, database_url)
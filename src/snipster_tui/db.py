@@ -0,0 +1,164 @@
+import atexit
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+
+from decouple import Config, RepositoryEnv
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, create_engine
+
+from snipster_tui.leaks import LeakTracker
+
+DEFAULT_PROJECT_HOME = Path.home() / ".snipster_tui"
+DEFAULT_DB_PATH = DEFAULT_PROJECT_HOME / "snipster_tui.sqlite"
+ENV_PATH = DEFAULT_PROJECT_HOME / ".env"
+
+
+def ensure_env_file() -> tuple[Config, str | None]:
+    if not ENV_PATH.exists():
+        # stderr, so piped CLI output stays clean
+        print(f"⚠️  No .env found at {ENV_PATH}", file=sys.stderr)
+        DEFAULT_PROJECT_HOME.mkdir(parents=True, exist_ok=True)
+        # Datei anlegen, damit open nicht crasht
+        ENV_PATH.touch(exist_ok=True)
+        fallback_url = f"sqlite:///{DEFAULT_DB_PATH}"
+        return Config(RepositoryEnv(ENV_PATH)), fallback_url
+    return Config(RepositoryEnv(ENV_PATH)), None
+
+
+# EINMALIGE Config-Ladung
+config_modul, fallback_url = ensure_env_file()
+DATABASE_URL_MOD = fallback_url or f"sqlite:///{DEFAULT_DB_PATH}"
+
+DB_USER_MOD = config_modul("DB_USER", default="")
+DB_PASS_MOD = config_modul("DB_PASS", default="")
+DB_HOST_MOD = config_modul("DB_HOST", default="localhost")
+DB_PORT_MOD = config_modul("DB_PORT", default="5432")
+DB_NAME_MOD = config_modul("DB_NAME", default="snipster")
+
+# PostgreSQL URL if Postgres-config exists
+if DB_USER_MOD and all([DB_PASS_MOD, DB_HOST_MOD, DB_PORT_MOD, DB_NAME_MOD]):
+    DATABASE_URL_MOD = f"postgresql://{DB_USER_MOD}:{DB_PASS_MOD}@{DB_HOST_MOD}:{DB_PORT_MOD}/{DB_NAME_MOD}"
+
+# Several libraries at once, "name=url,name=url" (see federation.py)
+LIBRARIES_MOD = config_modul("SNIPSTER_LIBRARIES", default="")
+
+# Read replicas of DATABASE_URL_MOD, "url,url" (see routing.py)
+REPLICA_URLS_MOD = [
+    url.strip()
+    for url in config_modul("SNIPSTER_REPLICAS", default="").split(",")
+    if url.strip()
+]
+
+
+# Connections opened ahead of the first action when the TUI starts
+POOL_WARM_CONNECTIONS = config_modul("SNIPSTER_POOL_WARM", default=2, cast=int)
+
+# Report sessions left open and connections still checked out (see leaks.py)
+DEBUG_SESSIONS = config_modul("SNIPSTER_DEBUG_SESSIONS", default=False, cast=bool)
+leak_tracker = LeakTracker()
+if DEBUG_SESSIONS:
+    atexit.register(leak_tracker.warn)
+
+
+def upgraded(engine: Engine) -> Engine:
+    """engine, once the library behind it has the current schema"""
+    from snipster_tui import schema
+
+    try:
+        schema.upgrade(engine)
+    except BaseException:
+        engine.dispose()
+        raise
+    return engine
+
+
+@cache
+def get_engine():
+    """The process-wide engine, so all sessions share one connection pool"""
+    engine = upgraded(create_engine(DATABASE_URL_MOD, echo=False))
+    if DEBUG_SESSIONS:
+        leak_tracker.watch(engine)
+    return engine
+
+
+@cache
+def replica_router():
+    from snipster_tui.routing import ReplicaRouter
+
+    router = ReplicaRouter(DATABASE_URL_MOD, REPLICA_URLS_MOD)
+    try:
+        upgraded(router.primary)
+    except BaseException:
+        router.dispose()
+        raise
+    if DEBUG_SESSIONS:
+        for engine in (router.primary, *router.replicas):
+            leak_tracker.watch(engine)
+    return router
+
+
+def get_session():
+    if REPLICA_URLS_MOD:
+        session = replica_router().session()
+    else:
+        session = Session(get_engine())
+    if DEBUG_SESSIONS:
+        leak_tracker.opened(session)
+    return session
+
+
+@contextmanager
+def session_scope(factory=None):
+    """One unit of work: rolled back on errors, always closed"""
+    session = (factory or get_session)()
+    if DEBUG_SESSIONS:
+        leak_tracker.enter(session)
+    try:
+        yield session
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        if DEBUG_SESSIONS:
+            leak_tracker.exit(session)
+            leak_tracker.warn(leaks_only=True)
+
+
+def warm_pool(engine: Engine, connections: int = POOL_WARM_CONNECTIONS) -> int:
+    """Open connections at once and hand them back to the pool, so the next
+    checkouts find them ready. Returns how many were opened."""
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+def probe(database_url: str, rounds: int = 5) -> tuple[float, float]:
+    """(connect time, median SELECT 1 round trip) in seconds, on a fresh
+    engine so no pooled connection hides the setup cost"""
+    engine = create_engine(database_url, echo=False)
+    try:
+        started = time.perf_counter()
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connect_time = time.perf_counter() - started
+            round_trips = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                connection.execute(text("SELECT 1"))
+                round_trips.append(time.perf_counter() - started)
+    finally:
+        engine.dispose()
+    return connect_time, statistics.median(round_trips)
@@ -4,3 +4,11 @@ class SnippetNotFoundError(Exception):
 
 class NoMatches(Exception):
     pass
+
+
+class DaemonError(Exception):
+    pass
+
+
+class LibraryNotSetUpError(Exception):
+    pass
@@ -0,0 +1,121 @@
+import gzip
+import json
+import re
+from collections.abc import Iterable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TextIO
+
+from snipster_tui.models import Language, Snippet
+from snipster_tui.repo import SnippetRepository
+
+EXPORT_FORMATS = ("jsonl", "markdown", "files")
+
+# Info strings for fenced code blocks in the Markdown cookbook
+FENCE_NAMES = {
+    Language.python: "python",
+    Language.javascript: "javascript",
+    Language.rust: "rust",
+    Language.golang: "go",
+    Language.powershell: "powershell",
+    Language.bash: "bash",
+    Language.sql: "sql",
+    Language.other: "",
+}
+
+
+def slugify(title: str, max_length: int = 40) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+    return slug[:max_length].rstrip("-") or "snippet"
+
+
+def snippet_filename(snippet: Snippet) -> str:
+    return f"{snippet.id:05d}-{slugify(snippet.title)}{snippet.language.extension}"
+
+
+def _gz_path(path: Path, compress: bool) -> Path:
+    if compress and path.suffix != ".gz":
+        return path.with_name(path.name + ".gz")
+    return path
+
+
+def _open_text(path: Path, compress: bool) -> TextIO:
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8")
+    return path.open("w", encoding="utf-8")
+
+
+def write_jsonl(snippets: Iterable[Snippet], path: Path, compress: bool = False) -> int:
+    count = 0
+    with _open_text(path, compress) as fh:
+        for snippet in snippets:
+            fh.write(json.dumps(snippet.model_dump(mode="json")) + "\n")
+            count += 1
+    return count
+
+
+def write_markdown(
+    snippets: Iterable[Snippet], path: Path, compress: bool = False
+) -> int:
+    count = 0
+    with _open_text(path, compress) as fh:
+        fh.write("# Snipster Cookbook\n")
+        for snippet in snippets:
+            fence = FENCE_NAMES[snippet.language]
+            favorite = " ⭐" if snippet.favorite else ""
+            fh.write(f"\n## {snippet.title}{favorite}\n\n")
+            if snippet.description:
+                fh.write(f"{snippet.description}\n\n")
+            fh.write(f"```{fence}\n{snippet.code.rstrip()}\n```\n")
+            count += 1
+    return count
+
+
+def _write_file(path: Path, text: str, compress: bool) -> None:
+    with _open_text(path, compress) as fh:
+        fh.write(text)
+
+
+def write_files(
+    snippets: Iterable[Snippet],
+    directory: Path,
+    compress: bool = False,
+    workers: int = 4,
+) -> int:
+    """One file per snippet, written by a thread pool with bounded backlog"""
+    directory.mkdir(parents=True, exist_ok=True)
+    max_pending = workers * 4
+    count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for snippet in snippets:
+            # Pull the data out on this thread, workers only touch the disk
+            path = _gz_path(directory / snippet_filename(snippet), compress)
+            pending.add(pool.submit(_write_file, path, snippet.code, compress))
+            count += 1
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        for future in pending:
+            future.result()
+    return count
+
+
+def export_snippets(
+    repo: SnippetRepository,
+    fmt: str,
+    target: Path,
+    compress: bool = False,
+    workers: int = 4,
+    batch_size: int = 500,
+) -> int:
+    """Stream every snippet of repo to target, returns the number written"""
+    snippets = repo.iter_snippets(batch_size=batch_size)
+    if fmt == "jsonl":
+        return write_jsonl(snippets, _gz_path(target, compress), compress)
+    if fmt == "markdown":
+        return write_markdown(snippets, _gz_path(target, compress), compress)
+    if fmt == "files":
+        return write_files(snippets, target, compress, workers)
+    raise ValueError(f"Unknown export format: {fmt}")
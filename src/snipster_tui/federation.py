@@ -0,0 +1,400 @@
+import atexit
+import builtins
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager, suppress
+from datetime import timedelta
+from functools import cache, partial
+from inspect import isgeneratorfunction
+from operator import attrgetter
+from typing import Any, cast
+
+from decouple import config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, create_engine
+
+from snipster_tui import db
+from snipster_tui.exceptions import SnippetNotFoundError
+from snipster_tui.models import (
+    DERIVED_FIELDS,
+    Language,
+    Snippet,
+    SnippetRevision,
+    UsageCount,
+    normalize_tags,
+    stored_id,
+)
+from snipster_tui.repo import DBSnippetRepo, SnippetRepository, _check_sort_column
+
+# Global id = mount index * ID_STRIDE + id within the library, so the first
+# library keeps its own ids
+ID_STRIDE = 1_000_000_000
+
+# Seconds a fanned-out read waits for each library before leaving it out
+TIMEOUT = config("SNIPSTER_FEDERATION_TIMEOUT", default=2.0, cast=float)
+
+
+def parse_libraries(value: str) -> dict[str, str]:
+    """ "personal=sqlite:///a.db,team=postgresql://..." -> {name: url}"""
+    libraries = {}
+    for entry in value.split(","):
+        if entry.strip():
+            name, _, url = entry.partition("=")
+            libraries[name.strip()] = url.strip()
+    return libraries
+
+
+def _sort_value(snippet: Snippet, order_by: str):
+    value = getattr(snippet, order_by)
+    # Enums are stored by name, sort them the same way the DB does
+    return value.name if isinstance(value, Language) else value
+
+
+def _search_rank(snippet: Snippet, term: str) -> tuple:
+    """Exact title matches first, then prefix matches, then the rest, each
+    most frecent first"""
+    title = snippet.title.lower()
+    term = term.lower()
+    return (title != term, not title.startswith(term), -snippet.frecency, title)
+
+
+class FederatedSnippetRepository(SnippetRepository):
+    """Several libraries behind one repository
+
+    Reads over all libraries run concurrently, one thread per library, and a
+    library that misses the timeout or cannot be reached is left out (see
+    unavailable) instead of stalling the caller. Everything addressing one snippet goes to the library
+    owning it, new snippets go to write_to.
+    """
+
+    def __init__(
+        self,
+        mounts: Mapping[str, SnippetRepository],
+        write_to: str | None = None,
+        timeout: float = TIMEOUT,
+    ):
+        if not mounts:
+            raise ValueError("At least one library is needed")
+        self.names = list(mounts)
+        self.mounts = [mounts[name] for name in self.names]
+        self.write_to = write_to or self.names[0]
+        if self.write_to not in mounts:
+            raise ValueError(f"Unknown library {self.write_to!r}")
+        self.timeout = timeout
+        # Libraries left out of the last fanned-out read
+        self.unavailable: list[str] = []
+        self._pool = ThreadPoolExecutor(
+            max_workers=len(self.mounts), thread_name_prefix="federation"
+        )
+        # A library still busy with a timed-out call is skipped, its session
+        # must not be used from two threads
+        self._pending: dict[int, Future] = {}
+
+    def close(self) -> None:
+        """Cancel queued calls and wait for those running, so nothing is
+        still using a library when the caller releases it"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    # Ids
+
+    def global_id(self, index: int, local_id: int) -> int:
+        return index * ID_STRIDE + local_id
+
+    def locate(self, snippet_id: int) -> tuple[int, int]:
+        """(mount index, id within that library)"""
+        index, local_id = divmod(snippet_id, ID_STRIDE)
+        if index >= len(self.mounts):
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        return index, local_id
+
+    def qualified_id(self, snippet_id: int) -> str:
+        """Human-readable id, e.g. "team:42" """
+        index, local_id = self.locate(snippet_id)
+        return f"{self.names[index]}:{local_id}"
+
+    def _rebase(self, index: int, snippet: Snippet) -> Snippet:
+        """Detached copy carrying the global id, deferred columns stay unset"""
+        unloaded = inspect(snippet, raiseerr=True).unloaded
+        copy = Snippet(
+            **{
+                name: getattr(snippet, name)
+                for name in Snippet.model_fields
+                if name not in unloaded
+            }
+        )
+        copy.id = self.global_id(index, stored_id(snippet))
+        return copy
+
+    def _owner(self, snippet_id: int) -> tuple[SnippetRepository, int]:
+        index, local_id = self.locate(snippet_id)
+        return self.mounts[index], local_id
+
+    # Fan-out
+
+    def _fan_out(self, call: Callable[[SnippetRepository], Any]) -> dict[int, Any]:
+        """Run call on every library at once, {mount index: result} of those
+        answering within the timeout (a library that is down counts as slow)"""
+        futures = {}
+        for index, mount in enumerate(self.mounts):
+            pending = self._pending.get(index)
+            if pending is None or pending.done():
+                futures[index] = self._pending[index] = self._pool.submit(call, mount)
+        wait(futures.values(), timeout=self.timeout)
+
+        results = {}
+        for index, future in futures.items():
+            if not future.done():
+                continue
+            try:
+                results[index] = future.result()
+            except (OSError, OperationalError):
+                pass
+        self.unavailable = [
+            name for index, name in enumerate(self.names) if index not in results
+        ]
+        return results
+
+    def _merged(self, call) -> builtins.list[Snippet]:
+        return [
+            self._rebase(index, snippet)
+            for index, snippets in sorted(self._fan_out(call).items())
+            for snippet in snippets
+        ]
+
+    # SnippetRepository
+
+    def add(self, snippet: Snippet) -> None:
+        index = self.names.index(self.write_to)
+        # The library gets its own instance, the caller's keeps the global id
+        stored = Snippet(**snippet.model_dump(exclude={"id"}))
+        self.mounts[index].add(stored)
+        snippet.id = self.global_id(index, stored.id)
+        for name in DERIVED_FIELDS:
+            setattr(snippet, name, getattr(stored, name))
+
+    def list(
+        self,
+        favorite: bool | None = None,
+        with_body: bool = False,
+        language: Language | None = None,
+        order_by: str = "id",
+        descending: bool = False,
+        tags: Sequence[str] | None = None,
+        match_all_tags: bool = False,
+    ) -> Sequence[Snippet]:
+        _check_sort_column(order_by)
+        snippets = self._merged(
+            lambda mount: mount.list(
+                favorite=favorite,
+                with_body=with_body,
+                language=language,
+                order_by=order_by,
+                descending=descending,
+                tags=tags,
+                match_all_tags=match_all_tags,
+            )
+        )
+        # Stable, so the global id (library, then local id) breaks ties
+        snippets.sort(key=stored_id)
+        return sorted(
+            snippets, key=lambda s: _sort_value(s, order_by), reverse=descending
+        )
+
+    def get(self, snippet_id: int, with_body: bool = True) -> Snippet | None:
+        try:
+            index, local_id = self.locate(snippet_id)
+        except SnippetNotFoundError:
+            return None
+        snippet = self.mounts[index].get(local_id, with_body=with_body)
+        return self._rebase(index, snippet) if snippet else None
+
+    def get_many(
+        self, snippet_ids: Sequence[int], with_body: bool = True
+    ) -> builtins.list[Snippet]:
+        by_mount: dict[int, list[int]] = {}
+        for snippet_id in snippet_ids:
+            try:
+                index, local_id = self.locate(snippet_id)
+            except SnippetNotFoundError:
+                continue
+            by_mount.setdefault(index, []).append(local_id)
+        snippets = [
+            self._rebase(index, snippet)
+            for index, ids in by_mount.items()
+            for snippet in self.mounts[index].get_many(ids, with_body)
+        ]
+        return sorted(snippets, key=stored_id)
+
+    def delete(self, snippet_id: int) -> None:
+        mount, local_id = self._owner(snippet_id)
+        mount.delete(local_id)
+
+    def restore(self, snippet_id: int) -> None:
+        mount, local_id = self._owner(snippet_id)
+        mount.restore(local_id)
+
+    def list_trash(self) -> Sequence[Snippet]:
+        snippets = self._merged(lambda mount: mount.list_trash())
+        return sorted(snippets, key=attrgetter("deleted_at"), reverse=True)
+
+    def purge(self, older_than: timedelta | None = None, batch_size: int = 500) -> int:
+        return sum(mount.purge(older_than, batch_size) for mount in self.mounts)
+
+    def search(
+        self, snippet_title: str, language: Language | None = None
+    ) -> Sequence[Snippet]:
+        snippets = self._merged(lambda mount: mount.search(snippet_title, language))
+        return sorted(snippets, key=lambda s: _search_rank(s, snippet_title))
+
+    def favorite_on(self, snippet_id: int) -> None:
+        mount, local_id = self._owner(snippet_id)
+        mount.favorite_on(local_id)
+
+    def favorite_off(self, snippet_id: int) -> None:
+        mount, local_id = self._owner(snippet_id)
+        mount.favorite_off(local_id)
+
+    def list_favorites(self) -> Sequence[Snippet]:
+        return self._merged(lambda mount: mount.list_favorites())
+
+    def update(self, snippet: Snippet) -> None:
+        mount, local_id = self._owner(stored_id(snippet))
+        mount.update(Snippet(**{**snippet.model_dump(), "id": local_id}))
+
+    def patch(self, snippet_id: int, **fields) -> None:
+        mount, local_id = self._owner(snippet_id)
+        mount.patch(local_id, **fields)
+
+    def history(self, snippet_id: int) -> builtins.list[SnippetRevision]:
+        mount, local_id = self._owner(snippet_id)
+        return mount.history(local_id)
+
+    def revision_code(self, snippet_id: int, number: int) -> str:
+        mount, local_id = self._owner(snippet_id)
+        return mount.revision_code(local_id, number)
+
+    def iter_snippets(
+        self, batch_size: int = 500, with_body: bool = True
+    ) -> Iterator[Snippet]:
+        for index, mount in enumerate(self.mounts):
+            for snippet in mount.iter_snippets(batch_size, with_body):
+                yield self._rebase(index, snippet)
+
+    def set_tags(self, snippet_id: int, tags: Sequence[str]) -> None:
+        mount, local_id = self._owner(snippet_id)
+        mount.set_tags(local_id, tags)
+
+    def get_tags(self, snippet_ids: Sequence[int]) -> dict[int, builtins.list[str]]:
+        by_mount: dict[int, list[int]] = {}
+        for snippet_id in snippet_ids:
+            index, _ = self.locate(snippet_id)
+            by_mount.setdefault(index, []).append(snippet_id)
+        tags = {}
+        for index, ids in by_mount.items():
+            local = self.mounts[index].get_tags([i % ID_STRIDE for i in ids])
+            tags.update({i: local[i % ID_STRIDE] for i in ids})
+        return tags
+
+    def list_tags(self) -> builtins.list[str]:
+        names = self._fan_out(lambda mount: mount.list_tags()).values()
+        return sorted(set(normalize_tags(name for tags in names for name in tags)))
+
+    def similar(
+        self,
+        snippet_id: int,
+        threshold: float | None = None,
+        limit: int = 10,
+    ) -> builtins.list[tuple[Snippet, float]]:
+        # Signatures live per library, so matches come from the same one
+        index, local_id = self.locate(snippet_id)
+        matches = self.mounts[index].similar(local_id, threshold, limit)
+        return [(self._rebase(index, snippet), score) for snippet, score in matches]
+
+    def duplicate_clusters(
+        self, threshold: float | None = None
+    ) -> builtins.list[builtins.list[int]]:
+        return [
+            [self.global_id(index, snippet_id) for snippet_id in cluster]
+            for index, mount in enumerate(self.mounts)
+            for cluster in mount.duplicate_clusters(threshold)
+        ]
+
+    def record_usage(self, usage: Mapping[int, UsageCount]) -> None:
+        by_mount: dict[int, dict[int, UsageCount]] = {}
+        for snippet_id, count in usage.items():
+            index, local_id = self.locate(snippet_id)
+            by_mount.setdefault(index, {})[local_id] = count
+        for index, local in by_mount.items():
+            self.mounts[index].record_usage(local)
+
+    def most_used(self, limit: int = 50) -> builtins.list[tuple[Snippet, int]]:
+        ranked = [
+            (self._rebase(index, snippet), uses)
+            for index, rows in sorted(
+                self._fan_out(lambda mount: mount.most_used(limit)).items()
+            )
+            for snippet, uses in rows
+        ]
+        # Stable, ties keep the library order
+        ranked.sort(key=lambda row: -row[1])
+        return ranked[:limit]
+
+
+class LibraryRepo:
+    """DBSnippetRepo over one library, every call in a session of its own
+
+    Calls from the federation's threads never share a session, and nothing
+    outlives the call but detached snippets.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def _session(self) -> Session:
+        return Session(self.engine, expire_on_commit=False)
+
+    def __getattr__(self, name: str):
+        method = getattr(DBSnippetRepo, name)
+        if isgeneratorfunction(method):
+            return partial(self._iterate, method)
+        return partial(self._call, method)
+
+    def _call(self, method, *args, **kwargs):
+        with db.session_scope(self._session) as session:
+            return method(DBSnippetRepo(session), *args, **kwargs)
+
+    def _iterate(self, method, *args, **kwargs):
+        with db.session_scope(self._session) as session:
+            yield from method(DBSnippetRepo(session), *args, **kwargs)
+
+
+@contextmanager
+def open_federation(libraries: Mapping[str, str], timeout: float = TIMEOUT):
+    """FederatedSnippetRepository over {name: database url}"""
+    with ExitStack() as stack:
+        mounts: dict[str, SnippetRepository] = {}
+        for name, url in libraries.items():
+            engine = create_engine(url, echo=False)
+            stack.callback(engine.dispose)
+            # An unreachable library is upgraded once it is back; until then
+            # its calls fail like any other's
+            with suppress(OperationalError):
+                db.upgraded(engine)
+            # Proxies every SnippetRepository method
+            mounts[name] = cast(SnippetRepository, LibraryRepo(engine))
+        federation = FederatedSnippetRepository(mounts, timeout=timeout)
+        # Runs first: in-flight calls finish before the engines go
+        stack.callback(federation.close)
+        yield federation
+
+
+@cache
+def get_federation(libraries: str) -> FederatedSnippetRepository:
+    """The process-wide federation over a SNIPSTER_LIBRARIES value, so its
+    engines, threads and pending calls are shared by every open_repo()"""
+    stack = ExitStack()
+    federation = stack.enter_context(open_federation(parse_libraries(libraries)))
+    atexit.register(stack.close)
+    return federation
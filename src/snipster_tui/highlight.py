@@ -0,0 +1,56 @@
+from functools import cache
+
+from decouple import config
+from pygments.lexer import Lexer
+from pygments.lexers import get_lexer_by_name
+from pygments.lexers.special import TextLexer
+from pygments.util import ClassNotFound
+from rich.syntax import Syntax, SyntaxTheme
+
+from snipster_tui.models import Language
+
+CODE_THEME = config("SNIPSTER_CODE_THEME", default="monokai")
+
+# Pygments lexer per language, the stored values ("ps", "ot") are no lexer
+# names (or the wrong one)
+LEXER_NAMES = {
+    Language.python: "python",
+    Language.javascript: "javascript",
+    Language.rust: "rust",
+    Language.golang: "go",
+    Language.powershell: "powershell",
+    Language.bash: "bash",
+    Language.sql: "sql",
+    Language.other: "text",
+}
+
+
+@cache
+def lexer_for(language: str) -> Lexer:
+    """Shared lexer for a Language (or its value), built once
+
+    Options match what rich.syntax.Syntax passes itself.
+    """
+    try:
+        name = LEXER_NAMES[Language(language)]
+    except ValueError:
+        name = language
+    try:
+        return get_lexer_by_name(name, stripnl=False, ensurenl=True, tabsize=4)
+    except ClassNotFound:
+        return TextLexer(stripnl=False, ensurenl=True, tabsize=4)
+
+
+@cache
+def code_theme(name: str = CODE_THEME) -> SyntaxTheme:
+    """Shared theme instance, it caches its styles"""
+    return Syntax.get_theme(name)
+
+
+def warm_up(theme: str = CODE_THEME) -> None:
+    """Import and compile every lexer and load the theme ahead of first use"""
+    code_theme(theme).get_background_style()
+    for language in Language:
+        # Lexers compile their rules on first use, highlight a token to do it
+        for _ in lexer_for(language.value).get_tokens("x\n"):
+            pass
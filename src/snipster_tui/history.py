@@ -0,0 +1,83 @@
+import difflib
+import json
+import zlib
+from collections.abc import Sequence
+
+from snipster_tui.models import SnippetRevision
+
+# Revisions are stored newest-to-oldest as reverse deltas: revision n holds
+# what turns version n+1 (or the current code) back into version n. Old
+# deltas never change when a new revision is added. Every KEYFRAME_INTERVAL-th
+# revision is stored in full instead, so reconstructing any revision applies
+# at most KEYFRAME_INTERVAL - 1 deltas.
+KEYFRAME_INTERVAL = 64
+
+
+def make_delta(base: str, target: str) -> list:
+    """Line delta turning base into target
+
+    [start, end] copies base lines, a string is an inserted line.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    delta = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        else:
+            delta.extend(target_lines[j1:j2])
+    return delta
+
+
+def apply_delta(base: str, delta: Sequence) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in delta:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0] : op[1]])
+    return "".join(parts)
+
+
+def new_revision(
+    snippet_id: int, number: int, title: str, previous: str, current: str
+) -> SnippetRevision:
+    """Revision number holding previous, the code replaced by current"""
+    keyframe = number % KEYFRAME_INTERVAL == 0
+    if keyframe:
+        raw = previous.encode("utf-8")
+    else:
+        delta = make_delta(current, previous)
+        raw = json.dumps(delta, separators=(",", ":")).encode("utf-8")
+    return SnippetRevision(
+        snippet_id=snippet_id,
+        number=number,
+        title=title,
+        keyframe=keyframe,
+        payload=zlib.compress(raw, 9),
+    )
+
+
+def reconstruct(current: str, chain: Sequence[SnippetRevision]) -> str:
+    """Code of chain[0], chain runs up to a keyframe or the newest revision"""
+    code = current
+    for revision in reversed(chain):
+        raw = zlib.decompress(revision.payload).decode("utf-8")
+        code = raw if revision.keyframe else apply_delta(code, json.loads(raw))
+    return code
+
+
+def chain_for(revisions: Sequence[SnippetRevision], number: int):
+    """Revisions needed to rebuild number, from an ascending revision list"""
+    chain = []
+    for revision in revisions:
+        if revision.number < number:
+            continue
+        chain.append(revision)
+        if revision.keyframe:
+            break
+    if not chain or chain[0].number != number:
+        return None
+    return chain
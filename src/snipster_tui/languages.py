@@ -0,0 +1,29 @@
+from enum import Enum
+
+
+class Language(str, Enum):
+    python = "py"
+    javascript = "js"
+    rust = "rs"
+    golang = "go"
+    powershell = "ps"
+    bash = "sh"
+    sql = "sql"
+    other = "ot"
+
+    @property
+    def extension(self) -> str:
+        """File extension used when writing a snippet to disk"""
+        return FILE_EXTENSIONS[self]
+
+
+FILE_EXTENSIONS = {
+    Language.python: ".py",
+    Language.javascript: ".js",
+    Language.rust: ".rs",
+    Language.golang: ".go",
+    Language.powershell: ".ps1",
+    Language.bash: ".sh",
+    Language.sql: ".sql",
+    Language.other: ".txt",
+}
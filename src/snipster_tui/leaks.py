@@ -0,0 +1,92 @@
+import logging
+import threading
+import traceback
+import weakref
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+
+class LeakTracker:
+    """Open sessions and checked-out connections, for SNIPSTER_DEBUG_SESSIONS
+
+    A session counts as leaked while it still holds a transaction (and with
+    it a pooled connection) outside of an active session scope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # session -> where it was opened
+        self._sessions: weakref.WeakKeyDictionary[Session, str] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._active: weakref.WeakSet[Session] = weakref.WeakSet()
+        self._checked_out: Counter[str] = Counter()
+
+    def watch(self, engine: Engine) -> Engine:
+        """Count the connections engine's pool hands out"""
+        url = engine.url.render_as_string(hide_password=True)
+
+        def checkout(dbapi_connection, record, proxy):
+            with self._lock:
+                self._checked_out[url] += 1
+
+        def checkin(dbapi_connection, record):
+            with self._lock:
+                self._checked_out[url] -= 1
+
+        event.listen(engine, "checkout", checkout)
+        event.listen(engine, "checkin", checkin)
+        return engine
+
+    def opened(self, session: Session) -> Session:
+        origin = "".join(traceback.format_stack(limit=6)[:-1])
+        with self._lock:
+            self._sessions[session] = origin
+        return session
+
+    def enter(self, session: Session) -> None:
+        self.opened(session)
+        with self._lock:
+            self._active.add(session)
+
+    def exit(self, session: Session) -> None:
+        with self._lock:
+            self._active.discard(session)
+
+    def checked_out(self) -> dict[str, int]:
+        with self._lock:
+            return {url: n for url, n in self._checked_out.items() if n}
+
+    def unclosed(self) -> list[str]:
+        """Origins of sessions outside a scope still holding a transaction"""
+        with self._lock:
+            sessions = [
+                (session, origin)
+                for session, origin in self._sessions.items()
+                if session not in self._active
+            ]
+        return [origin for session, origin in sessions if session.in_transaction()]
+
+    def report(self) -> str | None:
+        unclosed = self.unclosed()
+        checked_out = self.checked_out()
+        if not unclosed and not checked_out:
+            return None
+        lines = [f"{len(unclosed)} unclosed session(s), connections checked out:"]
+        lines += [f"  {url}: {n}" for url, n in checked_out.items()] or ["  none"]
+        for origin in unclosed:
+            lines += ["Session opened at:", origin.rstrip()]
+        return "\n".join(lines)
+
+    def warn(self, leaks_only: bool = False) -> None:
+        """Log the report, with leaks_only not just for checked-out connections"""
+        if leaks_only and not self.unclosed():
+            return
+        report = self.report()
+        if report:
+            logger.warning(report)
@@ -0,0 +1,241 @@
+import os
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from sqlalchemy import exists, or_, text, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, col, delete, select
+
+from snipster_tui import similarity
+from snipster_tui.models import (
+    DERIVED_FIELDS,
+    Snippet,
+    SnippetBand,
+    SnippetSignature,
+    derived_values,
+)
+from snipster_tui.repo import LIVE
+from snipster_tui.routing import PRIMARY
+
+# Snippets per chunk handed to a worker process and committed together
+CHUNK_SIZE = 500
+
+
+@dataclass
+class MaintenanceReport:
+    checked: int = 0
+    # Rows whose derived columns (hash, preview, counts) were rewritten
+    repaired: int = 0
+    # Similarity signatures (and their LSH bands) rebuilt
+    reindexed: int = 0
+    # Signatures of trashed or deleted snippets removed
+    orphans: int = 0
+    # Processes that recomputed, 1: in-process
+    workers: int = 1
+    seconds: float = 0.0
+    # (step, seconds, result) of the backend maintenance
+    steps: list[tuple[str, float, str]] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.checked / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "rows_per_second": self.rows_per_second}
+
+
+def derive_chunk(rows: list[tuple[int, str]]) -> list[tuple[int, dict, bytes, list]]:
+    """(id, derived columns, signature, band keys) per (id, code), runs in a
+    worker process"""
+    derived = []
+    for snippet_id, code in rows:
+        signature = similarity.minhash_signature(code)
+        derived.append(
+            (
+                snippet_id,
+                derived_values(code),
+                similarity.signature_to_bytes(signature),
+                similarity.band_keys(signature),
+            )
+        )
+    return derived
+
+
+def _chunks(session: Session, chunk_size: int) -> Iterator[list]:
+    """Live snippets as (id, code, *DERIVED_FIELDS), keyset-paginated by id"""
+    columns = [getattr(Snippet, name) for name in DERIVED_FIELDS]
+    last = 0
+    while True:
+        statement = (
+            select(Snippet.id, Snippet.code, *columns)
+            .where(LIVE, col(Snippet.id) > last)
+            .order_by(col(Snippet.id))
+            .limit(chunk_size)
+            .execution_options(**PRIMARY)
+        )
+        rows = session.exec(statement).all()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield rows
+
+
+def _reindex(session: Session, snippet_id: int, values: dict, signature, bands):
+    session.exec(delete(SnippetBand).where(col(SnippetBand.snippet_id) == snippet_id))
+    session.exec(
+        delete(SnippetSignature).where(col(SnippetSignature.snippet_id) == snippet_id)
+    )
+    session.add(
+        SnippetSignature(
+            snippet_id=snippet_id,
+            content_hash=values["content_hash"],
+            signature=signature,
+        )
+    )
+    session.add_all(
+        SnippetBand(snippet_id=snippet_id, band=band, bucket=key)
+        for band, key in enumerate(bands)
+    )
+
+
+def _apply(session, rows, outcome, rebuild: bool, report: MaintenanceReport):
+    """Write what differs from the recomputed values, one commit per chunk"""
+    derived = outcome.result() if isinstance(outcome, Future) else outcome
+    stored = {row[0]: dict(zip(DERIVED_FIELDS, row[2:])) for row in rows}
+    signed = dict(
+        session.exec(
+            select(SnippetSignature.snippet_id, SnippetSignature.content_hash)
+            .where(col(SnippetSignature.snippet_id).in_(list(stored)))
+            .execution_options(**PRIMARY)
+        ).all()
+    )
+    for snippet_id, values, signature, bands in derived:
+        if rebuild or stored[snippet_id] != values:
+            session.exec(
+                update(Snippet).where(col(Snippet.id) == snippet_id).values(**values)
+            )
+            report.repaired += 1
+        if rebuild or signed.get(snippet_id) != values["content_hash"]:
+            _reindex(session, snippet_id, values, signature, bands)
+            report.reindexed += 1
+    session.commit()
+    report.checked += len(derived)
+
+
+def verify(
+    session: Session,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    rebuild: bool = False,
+    report: MaintenanceReport | None = None,
+) -> MaintenanceReport:
+    """Recompute derived data in worker processes and repair what drifted
+
+    With rebuild everything is rewritten. workers=1 computes in-process.
+    """
+    report = report or MaintenanceReport()
+    report.workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(report.workers) if report.workers != 1 else None
+    # Enough chunks in flight to keep every worker busy
+    max_pending = 2 * report.workers
+    pending = deque()
+    try:
+        for rows in _chunks(session, chunk_size):
+            code = [(row[0], row[1]) for row in rows]
+            outcome = pool.submit(derive_chunk, code) if pool else derive_chunk(code)
+            pending.append((rows, outcome))
+            if len(pending) >= max_pending:
+                _apply(session, *pending.popleft(), rebuild, report)
+        while pending:
+            _apply(session, *pending.popleft(), rebuild, report)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    return report
+
+
+def remove_orphans(session: Session, batch_size: int = CHUNK_SIZE) -> int:
+    """Drop similarity data of snippets that are trashed or gone"""
+    statement = (
+        select(SnippetSignature.snippet_id)
+        .outerjoin(Snippet, col(Snippet.id) == SnippetSignature.snippet_id)
+        .where(or_(col(Snippet.id).is_(None), col(Snippet.deleted_at).is_not(None)))
+        .execution_options(**PRIMARY)
+    )
+    orphans = session.exec(statement).all()
+    for start in range(0, len(orphans), batch_size):
+        batch = orphans[start : start + batch_size]
+        for model in (SnippetBand, SnippetSignature):
+            session.exec(delete(model).where(col(model.snippet_id).in_(batch)))
+    # Bands left behind without a signature
+    session.exec(
+        delete(SnippetBand).where(
+            ~exists().where(col(SnippetSignature.snippet_id) == SnippetBand.snippet_id)
+        )
+    )
+    session.commit()
+    return len(orphans)
+
+
+def _backend_steps(engine: Engine, vacuum: bool, reindex: bool) -> list:
+    quote = engine.dialect.identifier_preparer.quote
+    tables = [quote(table.name) for table in SQLModel.metadata.sorted_tables]
+    if engine.dialect.name == "sqlite":
+        steps = [("integrity_check", ["PRAGMA integrity_check"])]
+        if reindex:
+            steps.append(("reindex", ["REINDEX"]))
+        steps.append(("analyze", ["ANALYZE"]))
+        if vacuum:
+            steps.append(("vacuum", ["VACUUM"]))
+        return steps
+    if engine.dialect.name == "postgresql":
+        steps = []
+        if reindex:
+            # CONCURRENTLY keeps the tables writable meanwhile
+            steps.append(
+                ("reindex", [f"REINDEX TABLE CONCURRENTLY {t}" for t in tables])
+            )
+        if vacuum:
+            steps.append(("vacuum", [f"VACUUM (ANALYZE) {', '.join(tables)}"]))
+        else:
+            steps.append(("analyze", [f"ANALYZE {', '.join(tables)}"]))
+        return steps
+    return [("analyze", ["ANALYZE"])]
+
+
+def optimize(
+    engine: Engine, vacuum: bool = True, reindex: bool = True
+) -> list[tuple[str, float, str]]:
+    """ANALYZE/VACUUM/REINDEX as the backend does them, outside a transaction"""
+    results = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, statements in _backend_steps(engine, vacuum, reindex):
+            started = time.perf_counter()
+            outcome = "done"
+            for statement in statements:
+                result = conn.execute(text(statement))
+                if result.returns_rows:
+                    outcome = ", ".join(str(row[0]) for row in result)
+            results.append((name, time.perf_counter() - started, outcome))
+    return results
+
+
+def maintain(
+    session: Session,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    rebuild: bool = False,
+    vacuum: bool = True,
+    reindex: bool = True,
+) -> MaintenanceReport:
+    """Verify and repair derived data, then let the database tidy up"""
+    started = time.perf_counter()
+    report = verify(session, workers, chunk_size, rebuild)
+    report.orphans = remove_orphans(session)
+    report.seconds = time.perf_counter() - started
+    session.close()
+    report.steps = optimize(session.get_bind().engine, vacuum, reindex)
+    return report
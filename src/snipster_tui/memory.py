@@ -0,0 +1,187 @@
+import itertools
+import sys
+import tracemalloc
+from collections import Counter, OrderedDict
+from collections.abc import Hashable
+from typing import Any, TextIO
+
+from decouple import config
+from rich.text import Text
+
+from snipster_tui.models import Snippet
+
+# Approximate bytes the TUI may hold in its table and caches
+MEMORY_BUDGET = int(config("SNIPSTER_MEMORY_BUDGET_MB", default=64, cast=float) * 2**20)
+
+# Rough per-object costs, measured with CPython 3.13
+_OBJECT_OVERHEAD = 64
+_SPAN_SIZE = 72
+
+
+def approx_size(value: Any) -> int:
+    """Cheap estimate of the bytes value keeps alive (no deep traversal)"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, Snippet):
+        fields = (value.title, value.code, value.description)
+        return _OBJECT_OVERHEAD * 4 + sum(approx_size(field) for field in fields)
+    if isinstance(value, Text):
+        return approx_size(value.plain) + _SPAN_SIZE * len(value.spans)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(approx_size(item) for item in value)
+    highlighted = getattr(value, "_highlighted", None)
+    if highlighted is not None:
+        # PrehighlightedSyntax: the code plus its highlighted Text
+        return _OBJECT_OVERHEAD + approx_size(highlighted)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Least-recently-used cache whose entries count against a MemoryBudget"""
+
+    def __init__(self, budget: "MemoryBudget", name: str, max_entries: int = 0):
+        self.budget = budget
+        self.name = name
+        self.max_entries = max_entries
+        # key -> (value, bytes, last use)
+        self._entries: OrderedDict[Hashable, tuple[Any, int, int]] = OrderedDict()
+        self.nbytes = 0
+        budget.caches.append(self)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        if key not in self._entries:
+            return default
+        value, nbytes, _ = self._entries[key]
+        self._entries[key] = (value, nbytes, self.budget.tick())
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, nbytes: int | None = None) -> None:
+        self.pop(key)
+        nbytes = approx_size(value) if nbytes is None else nbytes
+        self._entries[key] = (value, nbytes, self.budget.tick())
+        self.nbytes += nbytes
+        while self.max_entries and len(self._entries) > self.max_entries:
+            self.evict_oldest()
+        self.budget.trim()
+
+    def pop(self, key: Hashable, default=None):
+        if key not in self._entries:
+            return default
+        value, nbytes, _ = self._entries.pop(key)
+        self.nbytes -= nbytes
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def oldest_use(self) -> int | None:
+        for _, _, used in self._entries.values():
+            return used
+        return None
+
+    def evict_oldest(self) -> None:
+        key = next(iter(self._entries))
+        self.pop(key)
+
+
+class MemoryBudget:
+    """Approximate bytes held by the TUI, per pool
+
+    Caches are LRUCaches and get trimmed, least recently used entry first
+    across all of them, whenever the total goes over the limit. Other pools
+    (e.g. the table rows) are only tracked, they make room by taking it from
+    the caches.
+    """
+
+    def __init__(self, limit: int = MEMORY_BUDGET):
+        self.limit = limit
+        self.caches: list[LRUCache] = []
+        self.tracked: dict[str, int] = {}
+        self._clock = itertools.count()
+
+    def tick(self) -> int:
+        return next(self._clock)
+
+    def track(self, name: str, nbytes: int) -> None:
+        """Set what an untrimmable pool currently holds"""
+        self.tracked[name] = nbytes
+        self.trim()
+
+    def usage(self) -> dict[str, int]:
+        return {**self.tracked, **{cache.name: cache.nbytes for cache in self.caches}}
+
+    def used(self) -> int:
+        return sum(self.usage().values())
+
+    def trim(self) -> None:
+        while self.used() > self.limit:
+            candidates = [
+                (cache.oldest_use(), index)
+                for index, cache in enumerate(self.caches)
+                if len(cache)
+            ]
+            if not candidates:
+                return
+            self.caches[min(candidates)[1]].evict_oldest()
+
+
+class MemoryReport:
+    """tracemalloc top allocators, attributed to the screen active at the time"""
+
+    def __init__(self, top: int = 10, frames: int = 1):
+        self.top = top
+        self.frames = frames
+        # screen -> {allocation site: bytes allocated while it was active}
+        self.growth: dict[str, Counter] = {}
+        self._screen = ""
+        self._snapshot: tracemalloc.Snapshot | None = None
+
+    def start(self, screen: str) -> None:
+        tracemalloc.start(self.frames)
+        self._screen = screen
+        self._snapshot = self._take_snapshot()
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        # Leave out what the snapshots themselves allocate
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+
+    def switch(self, screen: str) -> None:
+        """Book the allocations so far to the current screen, then change"""
+        if self._snapshot is None:
+            return
+        snapshot = self._take_snapshot()
+        growth = self.growth.setdefault(self._screen, Counter())
+        for stat in snapshot.compare_to(self._snapshot, "lineno"):
+            if stat.size_diff > 0:
+                growth[str(stat.traceback)] += stat.size_diff
+        self._snapshot = snapshot
+        self._screen = screen
+
+    def stop(self) -> None:
+        if self._snapshot is not None:
+            self.switch(self._screen)
+            self._snapshot = None
+            tracemalloc.stop()
+
+    def write(self, out: TextIO) -> None:
+        for screen, growth in self.growth.items():
+            total = sum(growth.values())
+            print(f"== {screen}: {total / 1024:.1f} KiB allocated", file=out)
+            for site, size in growth.most_common(self.top):
+                print(f"{size / 1024:10.1f} KiB  {site}", file=out)
@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from snipster_tui.exceptions import SnippetNotFoundError
+from snipster_tui.export import snippet_filename
+from snipster_tui.models import Snippet, content_hash, stored_id
+from snipster_tui.repo import SnippetRepository
+
+MANIFEST_NAME = ".snipster-mirror.json"
+# Changed snippets whose bodies are loaded per query
+BODY_BATCH_SIZE = 500
+
+
+class MirrorStats(NamedTuple):
+    written: int
+    removed: int
+    unchanged: int
+
+
+class SnippetMirror:
+    """Keeps a directory tree (one folder per Language) in sync with a repo
+
+    A manifest next to the files remembers path, content hash and mtime of
+    every mirrored snippet, so a resync only touches what actually changed.
+    """
+
+    def __init__(self, repo: SnippetRepository, root: Path, debounce: float = 0.5):
+        self.repo = repo
+        self.root = root
+        self.debounce = debounce
+        self.manifest: dict[int, dict] = {}
+        self._load_manifest()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_NAME
+
+    def _load_manifest(self) -> None:
+        if self.manifest_path.exists():
+            raw = json.loads(self.manifest_path.read_text())
+            self.manifest = {int(key): entry for key, entry in raw.items()}
+
+    def _save_manifest(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(json.dumps(self.manifest))
+
+    def relative_path(self, snippet: Snippet) -> str:
+        return f"{snippet.language.name}/{snippet_filename(snippet)}"
+
+    def _write(self, snippet: Snippet, relative: str, digest: str) -> None:
+        path = self.root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(snippet.code, encoding="utf-8")
+        self.manifest[stored_id(snippet)] = {
+            "path": relative,
+            "hash": digest,
+            "mtime": path.stat().st_mtime_ns,
+        }
+
+    def _is_current(self, entry: dict | None, relative: str, digest: str | None):
+        return bool(
+            entry
+            and digest
+            and entry["hash"] == digest
+            and entry["path"] == relative
+            and (self.root / relative).exists()
+        )
+
+    def sync_from_db(self) -> MirrorStats:
+        """Materialize the repo, rewriting only files whose content changed"""
+        written = unchanged = 0
+        seen = set()
+        stale = {}
+        for snippet in self.repo.iter_snippets(with_body=False):
+            snippet_id = stored_id(snippet)
+            seen.add(snippet_id)
+            relative = self.relative_path(snippet)
+            # Stored hash lets us skip unchanged rows without loading the body
+            if self._is_current(
+                self.manifest.get(snippet_id), relative, snippet.content_hash
+            ):
+                unchanged += 1
+            else:
+                stale[snippet_id] = relative
+
+        # Bodies of the rest, one query per batch
+        stale_ids = list(stale)
+        for start in range(0, len(stale_ids), BODY_BATCH_SIZE):
+            batch = stale_ids[start : start + BODY_BATCH_SIZE]
+            for full in self.repo.get_many(batch, with_body=True):
+                relative = stale[stored_id(full)]
+                entry = self.manifest.get(full.id)
+                digest = content_hash(full.code)
+                if self._is_current(entry, relative, digest):
+                    unchanged += 1
+                    continue
+                if entry and entry["path"] != relative:
+                    (self.root / entry["path"]).unlink(missing_ok=True)
+                self._write(full, relative, digest)
+                written += 1
+
+        removed = 0
+        for snippet_id in set(self.manifest) - seen:
+            entry = self.manifest.pop(snippet_id)
+            (self.root / entry["path"]).unlink(missing_ok=True)
+            removed += 1
+
+        self._save_manifest()
+        return MirrorStats(written, removed, unchanged)
+
+    def scan_changes(self) -> dict[int, str]:
+        """Return {snippet_id: code} for mirrored files edited on disk"""
+        changes = {}
+        for snippet_id, entry in self.manifest.items():
+            path = self.root / entry["path"]
+            try:
+                mtime = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if mtime == entry["mtime"]:
+                continue
+            entry["mtime"] = mtime
+            code = path.read_text(encoding="utf-8")
+            if content_hash(code) != entry["hash"]:
+                changes[snippet_id] = code
+        return changes
+
+    def sync_to_db(self, changes: dict[int, str]) -> int:
+        """Push edited files back through the repository"""
+        for snippet_id, code in changes.items():
+            try:
+                self.repo.patch(snippet_id, code=code)
+            except SnippetNotFoundError:
+                continue
+            self.manifest[snippet_id]["hash"] = content_hash(code)
+        if changes:
+            self._save_manifest()
+        return len(changes)
+
+    def watch(
+        self,
+        interval: float = 1.0,
+        pull_every: float = 10.0,
+        stop: threading.Event | None = None,
+    ) -> None:
+        """Poll for file edits and push them in debounced batches
+
+        Edits are collected until the tree has been quiet for `debounce`
+        seconds, then written in one go; the DB side is re-pulled every
+        `pull_every` seconds.
+        """
+        stop = stop or threading.Event()
+        pending: dict[int, str] = {}
+        last_change = last_pull = time.monotonic()
+        while not stop.is_set():
+            changes = self.scan_changes()
+            now = time.monotonic()
+            if changes:
+                pending.update(changes)
+                last_change = now
+            if pending and now - last_change >= self.debounce:
+                self.sync_to_db(pending)
+                pending = {}
+            if not pending and now - last_pull >= pull_every:
+                self.sync_from_db()
+                last_pull = now
+            stop.wait(interval)
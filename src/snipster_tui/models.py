@@ -1,40 +1,180 @@
-from enum import Enum
-from typing import Optional
+import hashlib
+from datetime import UTC, datetime
+from typing import NamedTuple
 
 from decouple import config
+from sqlalchemy import BigInteger, DateTime, LargeBinary
+from sqlalchemy.orm import QueryableAttribute
 from sqlmodel import (
     Field,
+    Index,
     Session,
     SQLModel,
     create_engine,
     select,
 )
 
+from snipster_tui.compression import CompressedText
+from snipster_tui.exceptions import SnippetNotFoundError
+from snipster_tui.languages import FILE_EXTENSIONS, Language  # noqa: F401
 
-class Language(str, Enum):
-    python = "py"
-    javascript = "js"
-    rust = "rs"
-    golang = "go"
-    powershell = "ps"
-    bash = "sh"
-    sql = "sql"
-    other = "ot"
+# Characters of code shown in the list
+PREVIEW_LENGTH = 100
+
+# Columns refresh_derived() fills in, never written directly
+DERIVED_FIELDS = ("content_hash", "code_preview", "line_count", "byte_size")
 
 
 class Snippet(SQLModel, table=True):
     __table_args__ = {"extend_existing": True}
-    id: Optional[int] = Field(default=None, primary_key=True)
-    title: str
-    code: str
+    id: int | None = Field(default=None, primary_key=True)
+    title: str = Field(index=True)
+    code: str = Field(sa_type=CompressedText)
     description: str
-    favorite: bool = Field(default=False)
-    language: Language = Field(default=Language.python)
+    favorite: bool = Field(default=False, index=True)
+    language: Language = Field(default=Language.python, index=True)
+    content_hash: str | None = Field(default=None, max_length=64)
+    # Kept with the row so the list never needs the code body
+    code_preview: str = Field(default="", max_length=PREVIEW_LENGTH + 3)
+    line_count: int = 0
+    byte_size: int = 0
+    # Sum of the frecency weights of all uses, see usage.py
+    frecency: float = Field(default=0.0, index=True)
+    # Set while the snippet is in the trash, every read skips those rows
+    deleted_at: datetime | None = Field(
+        default=None, index=True, sa_type=DateTime(timezone=True)
+    )
 
     @classmethod
     def create(cls, **kwargs):
         return cls(**kwargs)
 
+    def refresh_derived(self) -> None:
+        """Recompute columns derived from the code body (call before saving)"""
+        for name, value in derived_values(self.code).items():
+            setattr(self, name, value)
+
+
+def derived_values(code: str) -> dict:
+    """DERIVED_FIELDS for code"""
+    return {
+        "content_hash": content_hash(code),
+        "code_preview": code_preview(code),
+        "line_count": len(code.splitlines()),
+        "byte_size": len(code.encode("utf-8")),
+    }
+
+
+def content_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def code_preview(code: str) -> str:
+    return code[:PREVIEW_LENGTH] + "..." if len(code) > PREVIEW_LENGTH else code
+
+
+class Tag(SQLModel, table=True):
+    __table_args__ = {"extend_existing": True}
+    id: int | None = Field(default=None, primary_key=True)
+    name: str = Field(index=True, unique=True)
+
+
+class SnippetTag(SQLModel, table=True):
+    """Snippet <-> Tag link, indexed both ways"""
+
+    __tablename__ = "snippet_tags"
+    __table_args__ = (
+        # PK serves "tags of a snippet", this one "snippets with a tag"
+        Index("ix_snippet_tags_tag_id_snippet_id", "tag_id", "snippet_id"),
+        {"extend_existing": True},
+    )
+    snippet_id: int = Field(foreign_key="snippet.id", primary_key=True)
+    tag_id: int = Field(foreign_key="tag.id", primary_key=True)
+
+
+class SnippetSignature(SQLModel, table=True):
+    """MinHash signature of a snippet's code, see similarity.py"""
+
+    __tablename__ = "snippet_signatures"
+    __table_args__ = {"extend_existing": True}
+    snippet_id: int = Field(foreign_key="snippet.id", primary_key=True)
+    # content_hash of the code the signature was computed from
+    content_hash: str = Field(max_length=64)
+    signature: bytes = Field(sa_type=LargeBinary)
+
+
+class SnippetBand(SQLModel, table=True):
+    """LSH bucket of one signature band, snippets sharing one are candidates"""
+
+    __tablename__ = "snippet_bands"
+    __table_args__ = (
+        Index("ix_snippet_bands_band_bucket", "band", "bucket"),
+        {"extend_existing": True},
+    )
+    snippet_id: int = Field(foreign_key="snippet.id", primary_key=True)
+    band: int = Field(primary_key=True)
+    bucket: int = Field(sa_type=BigInteger)
+
+
+class SnippetRevision(SQLModel, table=True):
+    """Code a snippet had before an update, see history.py"""
+
+    __tablename__ = "snippet_revisions"
+    __table_args__ = (
+        Index(
+            "ix_snippet_revisions_snippet_id_number",
+            "snippet_id",
+            "number",
+            unique=True,
+        ),
+        {"extend_existing": True},
+    )
+    id: int | None = Field(default=None, primary_key=True)
+    snippet_id: int = Field(foreign_key="snippet.id")
+    # 1, 2, ... per snippet, oldest first
+    number: int
+    title: str
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        sa_type=DateTime(timezone=True),
+    )
+    # Full (compressed) code, otherwise a compressed reverse delta
+    keyframe: bool = False
+    payload: bytes = Field(sa_type=LargeBinary)
+
+
+class SnippetUsage(SQLModel, table=True):
+    """How often a snippet was opened and copied, written by usage.py"""
+
+    __tablename__ = "snippet_usage"
+    __table_args__ = {"extend_existing": True}
+    snippet_id: int = Field(foreign_key="snippet.id", primary_key=True)
+    opens: int = 0
+    copies: int = 0
+    # opens + copies, what "most used" sorts by
+    uses: int = Field(default=0, index=True)
+    last_used: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+
+
+class UsageCount(NamedTuple):
+    """Uses of one snippet not written yet"""
+
+    opens: int = 0
+    copies: int = 0
+    last_used: datetime | None = None
+    # What the uses add to Snippet.frecency
+    frecency: float = 0.0
+
+
+def normalize_tags(tags) -> list[str]:
+    """Lower-case, strip and de-duplicate tag names, keeping their order"""
+    seen = []
+    for tag in tags:
+        name = tag.strip().lower()
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
 
 if __name__ == "__main__":  # pragma: no cover
     DB_USER = config("DB_USER")
@@ -77,3 +217,16 @@ if __name__ == "__main__":  # pragma: no cover
             session.commit()
 
     print("Database + table created!")
+
+
+def attr(field) -> QueryableAttribute:
+    """A model field as the mapped attribute it is on the class, for loader
+    options such as defer(); SQLModel declares fields as their Python type"""
+    return field
+
+
+def stored_id(snippet: Snippet) -> int:
+    """The id of a snippet that has been added, which SQLModel types optional"""
+    if snippet.id is None:
+        raise SnippetNotFoundError(f"Snippet {snippet.title!r} was never added")
+    return snippet.id
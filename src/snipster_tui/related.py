@@ -0,0 +1,269 @@
+import hashlib
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+from snipster_tui.db import DEFAULT_PROJECT_HOME
+from snipster_tui.models import Snippet, stored_id
+from snipster_tui.repo import SnippetRepository
+
+if TYPE_CHECKING:
+    import numpy as np
+
+INDEX_DIR = DEFAULT_PROJECT_HOME / "related"
+SNAPSHOT_NAME = "snapshot.npz"
+JOURNAL_NAME = "journal.jsonl"
+# Journal entries replayed on load before a fresh snapshot is written
+COMPACT_AFTER = 500
+# Changed snippets whose bodies sync() loads per query
+SYNC_BATCH_SIZE = 500
+TITLE_WEIGHT = 3
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+WORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased words, identifiers split at snake_case and camelCase"""
+    return [
+        word.lower()
+        for identifier in IDENTIFIER_PATTERN.findall(text)
+        for word in WORD_PATTERN.findall(identifier)
+        if len(word) > 1
+    ]
+
+
+def term_counts(snippet: Snippet) -> Counter:
+    counts = Counter(tokenize(f"{snippet.description}\n{snippet.code}"))
+    for word in tokenize(snippet.title):
+        counts[word] += TITLE_WEIGHT
+    return counts
+
+
+def fingerprint(snippet: Snippet) -> str:
+    """Changes whenever title, description or code change (code via its hash)"""
+    key = f"{snippet.title}\0{snippet.description}\0{snippet.content_hash}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class RelatedIndex:
+    """Sparse TF-IDF vectors of all snippets for "related snippets" queries
+
+    Raw term frequencies are kept per document, IDF and norms are derived at
+    query time, so a write only touches its own document. Writes go to an
+    append-only journal next to a numpy snapshot, compacted every
+    COMPACT_AFTER entries. directory=None keeps the index in memory.
+    """
+
+    def __init__(self, directory: Path | None = INDEX_DIR):
+        import numpy as np
+
+        self.directory = directory
+        self.vocabulary: dict[str, int] = {}
+        self.terms: list[str] = []
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        # snippet id -> (term ids, log-scaled term frequencies)
+        self.documents: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self.fingerprints: dict[int, str] = {}
+        self._journal_entries = 0
+        self._matrix = None
+        if directory is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _term_ids(self, words) -> "np.ndarray":
+        import numpy as np
+
+        for word in words:
+            if word not in self.vocabulary:
+                self.vocabulary[word] = len(self.terms)
+                self.terms.append(word)
+        missing = len(self.terms) - self.document_frequency.size
+        if missing > 0:
+            self.document_frequency = np.concatenate(
+                [self.document_frequency, np.zeros(missing, dtype=np.int64)]
+            )
+        return np.array([self.vocabulary[word] for word in words], dtype=np.int64)
+
+    def _apply_update(self, snippet_id: int, digest: str, counts: dict) -> None:
+        import numpy as np
+
+        self._apply_remove(snippet_id)
+        term_ids = self._term_ids(list(counts))
+        frequencies = 1 + np.log(np.array(list(counts.values()), dtype=np.float64))
+        self.documents[snippet_id] = (term_ids, frequencies)
+        self.fingerprints[snippet_id] = digest
+        self.document_frequency[term_ids] += 1
+        self._matrix = None
+
+    def _apply_remove(self, snippet_id: int) -> None:
+        document = self.documents.pop(snippet_id, None)
+        self.fingerprints.pop(snippet_id, None)
+        if document is not None:
+            self.document_frequency[document[0]] -= 1
+            self._matrix = None
+
+    def _index(self, snippet: Snippet) -> dict:
+        """Apply one snippet, returns its journal entry"""
+        counts = dict(term_counts(snippet))
+        snippet_id = stored_id(snippet)
+        digest = fingerprint(snippet)
+        self._apply_update(snippet_id, digest, counts)
+        return {"op": "update", "id": snippet_id, "fp": digest, "terms": counts}
+
+    def update(self, snippet: Snippet) -> None:
+        """(Re-)index one snippet, which needs its code and description"""
+        self._journal(self._index(snippet))
+
+    def remove(self, snippet_id: int) -> None:
+        if snippet_id in self.documents:
+            self._apply_remove(snippet_id)
+            self._journal({"op": "remove", "id": snippet_id})
+
+    def refresh(self, repo: SnippetRepository, snippet_id: int) -> None:
+        """Follow a write to one snippet: re-index it, or drop it once it is
+        trashed or gone"""
+        snippet = repo.get(snippet_id, with_body=True)
+        if snippet is None:
+            self.remove(snippet_id)
+        elif self.fingerprints.get(snippet_id) != fingerprint(snippet):
+            self.update(snippet)
+
+    def sync(self, repo: SnippetRepository) -> int:
+        """Catch up with writes made since the last sync, returns the changes
+
+        Changed bodies are loaded SYNC_BATCH_SIZE at a time. The changes
+        bypass the journal and are written as one snapshot at the end.
+        """
+        current = {stored_id(s): fingerprint(s) for s in repo.list()}
+        changes = 0
+        for snippet_id in set(self.documents) - set(current):
+            self._apply_remove(snippet_id)
+            changes += 1
+        stale = [
+            snippet_id
+            for snippet_id, digest in current.items()
+            if self.fingerprints.get(snippet_id) != digest
+        ]
+        for start in range(0, len(stale), SYNC_BATCH_SIZE):
+            batch = stale[start : start + SYNC_BATCH_SIZE]
+            for snippet in repo.get_many(batch, with_body=True):
+                self._index(snippet)
+                changes += 1
+        if changes:
+            self.save()
+        return changes
+
+    def _build_matrix(self):
+        """COO arrays over all documents, cached until the next write"""
+        import numpy as np
+
+        if self._matrix is None:
+            ids = np.fromiter(self.documents, dtype=np.int64, count=len(self.documents))
+            sizes = [terms.size for terms, _ in self.documents.values()]
+            rows = np.repeat(np.arange(ids.size), sizes)
+            if ids.size:
+                columns = np.concatenate([t for t, _ in self.documents.values()])
+                values = np.concatenate([f for _, f in self.documents.values()])
+            else:
+                columns = np.zeros(0, dtype=np.int64)
+                values = np.zeros(0, dtype=np.float64)
+            self._matrix = (ids, rows, columns, values)
+        return self._matrix
+
+    def related(self, snippet_id: int, limit: int = 5) -> list[tuple[int, float]]:
+        """(snippet_id, cosine similarity) of the closest documents"""
+        import numpy as np
+
+        if snippet_id not in self.documents:
+            return []
+        ids, rows, columns, values = self._build_matrix()
+        idf = np.log((1 + ids.size) / (1 + self.document_frequency)) + 1
+        weights = values * idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights**2, minlength=ids.size))
+
+        query = np.zeros(idf.size)
+        terms, frequencies = self.documents[snippet_id]
+        query[terms] = frequencies * idf[terms]
+        dots = np.bincount(rows, weights * query[columns], minlength=ids.size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.nan_to_num(dots / (norms * np.linalg.norm(query)))
+        scores[ids == snippet_id] = 0
+
+        best = np.argsort(-scores, kind="stable")[:limit]
+        return [(int(ids[i]), float(scores[i])) for i in best if scores[i] > 0]
+
+    # Persistence
+
+    @property
+    def snapshot_path(self) -> Path:
+        return cast(Path, self.directory) / SNAPSHOT_NAME
+
+    @property
+    def journal_path(self) -> Path:
+        return cast(Path, self.directory) / JOURNAL_NAME
+
+    def _journal(self, entry: dict) -> None:
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self.journal_path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry) + "\n")
+        self._journal_entries += 1
+        if self._journal_entries >= COMPACT_AFTER:
+            self.save()
+
+    def save(self) -> None:
+        """Write a snapshot and start an empty journal"""
+        import numpy as np
+
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        ids = list(self.documents)
+        sizes = [self.documents[i][0].size for i in ids]
+        empty = np.zeros(0)
+        temporary = self.snapshot_path.with_suffix(".tmp.npz")
+        np.savez(
+            temporary,
+            terms=np.array(self.terms, dtype=str),
+            ids=np.array(ids, dtype=np.int64),
+            fingerprints=np.array([self.fingerprints[i] for i in ids], dtype=str),
+            sizes=np.array(sizes, dtype=np.int64),
+            columns=np.concatenate([self.documents[i][0] for i in ids] or [empty]),
+            values=np.concatenate([self.documents[i][1] for i in ids] or [empty]),
+        )
+        temporary.replace(self.snapshot_path)
+        self.journal_path.unlink(missing_ok=True)
+        self._journal_entries = 0
+
+    def _load(self) -> None:
+        import numpy as np
+
+        if self.snapshot_path.exists():
+            with np.load(self.snapshot_path) as snapshot:
+                self.terms = snapshot["terms"].tolist()
+                self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+                all_columns = snapshot["columns"].astype(np.int64)
+                self.document_frequency = np.bincount(
+                    all_columns, minlength=len(self.terms)
+                )
+                offsets = np.cumsum(snapshot["sizes"])[:-1]
+                columns = np.split(all_columns, offsets)
+                values = np.split(snapshot["values"], offsets)
+                fingerprints = snapshot["fingerprints"].tolist()
+                for i, snippet_id in enumerate(snapshot["ids"].tolist()):
+                    self.documents[snippet_id] = (columns[i], values[i])
+                    self.fingerprints[snippet_id] = fingerprints[i]
+        if self.journal_path.exists():
+            for line in self.journal_path.read_text(encoding="utf-8").splitlines():
+                entry = json.loads(line)
+                if entry["op"] == "update":
+                    self._apply_update(entry["id"], entry["fp"], entry["terms"])
+                else:
+                    self._apply_remove(entry["id"])
+                self._journal_entries += 1
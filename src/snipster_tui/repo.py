@@ -1,12 +1,96 @@
+import builtins
 from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from datetime import UTC, datetime, timedelta
+from itertools import groupby
 
 # from pathlib import Path
-from typing import Dict, List, Optional, Sequence
+from typing import TYPE_CHECKING
 
-from sqlmodel import select
+from decouple import config
+from sqlalchemy import bindparam, func, lambda_stmt, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import aliased, defer, load_only, undefer
+from sqlmodel import and_, col, delete, exists, or_, select
 
+from snipster_tui import history
 from snipster_tui.exceptions import SnippetNotFoundError
-from snipster_tui.models import Language, Snippet
+from snipster_tui.models import (
+    Language,
+    Snippet,
+    SnippetBand,
+    SnippetRevision,
+    SnippetSignature,
+    SnippetTag,
+    SnippetUsage,
+    Tag,
+    UsageCount,
+    attr,
+    content_hash,
+    normalize_tags,
+    stored_id,
+)
+from snipster_tui.routing import PRIMARY
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Columns holding the (possibly large) snippet body, only loaded on demand.
+BODY_COLUMNS = (attr(Snippet.code), attr(Snippet.description))
+
+# Snippets not in the trash, what every read is restricted to
+LIVE = col(Snippet.deleted_at).is_(None)
+
+# How long deleted snippets stay restorable before a scheduled purge
+TRASH_RETENTION = timedelta(days=config("SNIPSTER_TRASH_DAYS", default=30, cast=float))
+
+# Columns list() can sort by, each backed by an index
+SORT_COLUMNS = {
+    "id": col(Snippet.id),
+    "title": col(Snippet.title),
+    "language": col(Snippet.language),
+    "favorite": col(Snippet.favorite),
+    "frecency": col(Snippet.frecency),
+}
+
+
+def _check_sort_column(order_by: str) -> None:
+    if order_by not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort snippets by {order_by!r}")
+
+
+# INSERT ... ON CONFLICT per backend, for record_usage()
+UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Fields patch() and update() may change. Derived ones are recomputed, the
+# rest (trash state, frecency) is kept by the repository itself
+PATCH_FIELDS = ("title", "code", "description", "language", "favorite")
+
+
+def _check_patch_fields(fields: dict) -> None:
+    unknown = set(fields) - set(PATCH_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot patch {', '.join(sorted(unknown))}")
+
+
+def chain_statement(pieces: Sequence[Callable], cached: bool = True):
+    """The first piece builds a select(), each further one refines it
+
+    cached=True chains them into a lambda statement: each piece is built and
+    compiled once per call site, later calls only pull the bound values out
+    of the closures. cached=False builds a plain select() on every call.
+    """
+    first, *rest = pieces
+    if not cached:
+        statement = first()
+        for piece in rest:
+            statement = piece(statement)
+        return statement
+    statement = lambda_stmt(first)
+    for piece in rest:
+        statement += piece
+    return statement
 
 
 class SnippetRepository(ABC):  # pragma : no cover
@@ -15,20 +99,47 @@ class SnippetRepository(ABC):  # pragma : no cover
         pass
 
     @abstractmethod
-    def list(self) -> Sequence[Snippet]:
+    def list(
+        self,
+        favorite: bool | None = None,
+        with_body: bool = False,
+        language: Language | None = None,
+        order_by: str = "id",
+        descending: bool = False,
+        tags: Sequence[str] | None = None,
+        match_all_tags: bool = False,
+    ) -> Sequence[Snippet]:
         pass
 
     @abstractmethod
-    def get(self, snippet_id: int) -> Snippet | None:
+    def get(self, snippet_id: int, with_body: bool = True) -> Snippet | None:
         pass
 
+    @abstractmethod
+    def get_many(
+        self, snippet_ids: Sequence[int], with_body: bool = True
+    ) -> builtins.list[Snippet]:
+        """The live snippets among snippet_ids, by id"""
+
     @abstractmethod
     def delete(self, snippet_id: int) -> None:
         pass
 
+    @abstractmethod
+    def restore(self, snippet_id: int) -> None:
+        pass
+
+    @abstractmethod
+    def list_trash(self) -> Sequence[Snippet]:
+        pass
+
+    @abstractmethod
+    def purge(self, older_than: timedelta | None = None, batch_size: int = 500) -> int:
+        pass
+
     @abstractmethod
     def search(
-        self, snippet_title: str, language: Optional[Language] = None
+        self, snippet_title: str, language: Language | None = None
     ) -> Sequence[Snippet]:
         pass
 
@@ -48,47 +159,198 @@ class SnippetRepository(ABC):  # pragma : no cover
     def update(self, snippet: Snippet) -> None:
         pass
 
+    @abstractmethod
+    def patch(self, snippet_id: int, **fields) -> None:
+        pass
+
+    @abstractmethod
+    def history(self, snippet_id: int) -> builtins.list[SnippetRevision]:
+        pass
+
+    @abstractmethod
+    def revision_code(self, snippet_id: int, number: int) -> str:
+        pass
+
+    @abstractmethod
+    def iter_snippets(
+        self, batch_size: int = 500, with_body: bool = True
+    ) -> Iterator[Snippet]:
+        pass
+
+    @abstractmethod
+    def set_tags(self, snippet_id: int, tags: Sequence[str]) -> None:
+        pass
+
+    @abstractmethod
+    def get_tags(self, snippet_ids: Sequence[int]) -> dict[int, builtins.list[str]]:
+        pass
+
+    @abstractmethod
+    def list_tags(self) -> builtins.list[str]:
+        pass
+
+    # Similarity: threshold=None means similarity.SIMILAR_THRESHOLD and
+    # DUPLICATE_THRESHOLD. similarity (and numpy) is imported on first use.
+    @abstractmethod
+    def similar(
+        self,
+        snippet_id: int,
+        threshold: float | None = None,
+        limit: int = 10,
+    ) -> builtins.list[tuple[Snippet, float]]:
+        pass
+
+    @abstractmethod
+    def duplicate_clusters(
+        self, threshold: float | None = None
+    ) -> builtins.list[builtins.list[int]]:
+        pass
+
+    @abstractmethod
+    def record_usage(self, usage: Mapping[int, UsageCount]) -> None:
+        pass
+
+    @abstractmethod
+    def most_used(self, limit: int = 50) -> builtins.list[tuple[Snippet, int]]:
+        pass
+
 
 class InMemorySnippetRepo(SnippetRepository):
     def __init__(self):
-        self._data: Dict[int, Snippet] = {}
+        self._data: dict[int, Snippet] = {}
+        # Soft-deleted snippets, until purge()
+        self._trash: dict[int, Snippet] = {}
+        self._tags: dict[int, set[str]] = {}
+        self._signatures: dict[int, np.ndarray] = {}
+        self._buckets: dict[tuple[int, int], set[int]] = defaultdict(set)
+        # snippet id -> revisions, oldest first
+        self._revisions: dict[int, list[SnippetRevision]] = {}
+        # Code as last written, the base the reverse deltas apply to. Callers
+        # hold the stored instances, so their .code may already be edited.
+        self._code: dict[int, str] = {}
+        self._usage: dict[int, SnippetUsage] = {}
         self._next_id = 1
 
     def add(self, snippet: Snippet) -> None:
-        snippet.id = self._next_id
-        self._data[self._next_id] = snippet
+        snippet.refresh_derived()
+        snippet_id = snippet.id = self._next_id
+        self._data[snippet_id] = snippet
+        self._code[snippet_id] = snippet.code
         self._next_id += 1
+        self._index_similarity(snippet_id, snippet.code)
+
+    def _index_similarity(self, snippet_id: int, code: str) -> None:
+        from snipster_tui import similarity
+
+        self._unindex_similarity(snippet_id)
+        signature = similarity.minhash_signature(code)
+        self._signatures[snippet_id] = signature
+        for band, key in enumerate(similarity.band_keys(signature)):
+            self._buckets[(band, key)].add(snippet_id)
 
-    def list(self, favorite: bool | None = None) -> Sequence[Snippet]:
-        if favorite is True:
-            return [
-                snippet
-                for snippet in self._data.values()
-                if snippet.favorite == favorite
-            ]
-        return list(self._data.values())
+    def _unindex_similarity(self, snippet_id: int) -> None:
+        from snipster_tui import similarity
+
+        signature = self._signatures.pop(snippet_id, None)
+        if signature is None:
+            return
+        for band, key in enumerate(similarity.band_keys(signature)):
+            self._buckets[(band, key)].discard(snippet_id)
+
+    def list(
+        self,
+        favorite: bool | None = None,
+        with_body: bool = False,
+        language: Language | None = None,
+        order_by: str = "id",
+        descending: bool = False,
+        tags: Sequence[str] | None = None,
+        match_all_tags: bool = False,
+    ) -> Sequence[Snippet]:
+        _check_sort_column(order_by)
+        wanted = set(normalize_tags(tags or []))
+        snippets = [
+            snippet
+            for snippet_id, snippet in self._data.items()
+            if (favorite is not True or snippet.favorite)
+            and (language is None or snippet.language == language)
+            and self._matches_tags(snippet_id, wanted, match_all_tags)
+        ]
 
-    def get(self, snippet_id: int) -> Snippet | None:
+        def sort_value(snippet):
+            value = getattr(snippet, order_by)
+            # Enums are stored by name, sort them the same way the DB does
+            return value.name if isinstance(value, Language) else value
+
+        # _data is in id order, a stable sort keeps id as the tie breaker
+        return sorted(snippets, key=sort_value, reverse=descending)
+
+    def _matches_tags(self, snippet_id: int, wanted: set[str], match_all: bool):
+        if not wanted:
+            return True
+        have = self._tags.get(snippet_id, set())
+        return wanted <= have if match_all else bool(wanted & have)
+
+    def get(self, snippet_id: int, with_body: bool = True) -> Snippet | None:
         return self._data.get(snippet_id)
 
+    def get_many(
+        self, snippet_ids: Sequence[int], with_body: bool = True
+    ) -> builtins.list[Snippet]:
+        return [self._data[i] for i in sorted(set(snippet_ids)) if i in self._data]
+
     def add_all(self, snippet: Snippet) -> None:
         for snip in snippet:
             self.add(snip)
 
     def delete(self, snippet_id: int) -> None:
+        """Move a snippet to the trash"""
         if snippet_id not in self._data:
             raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
-        self._data.pop(snippet_id, None)
+        snippet = self._data.pop(snippet_id)
+        snippet.deleted_at = datetime.now(UTC)
+        self._trash[snippet_id] = snippet
+        self._unindex_similarity(snippet_id)
+
+    def restore(self, snippet_id: int) -> None:
+        if snippet_id not in self._trash:
+            raise SnippetNotFoundError(f"Snippet {snippet_id} not in the trash")
+        snippet = self._trash.pop(snippet_id)
+        snippet.deleted_at = None
+        # Keep _data in id order, list() relies on it
+        self._data = dict(sorted({**self._data, snippet_id: snippet}.items()))
+        self._index_similarity(snippet_id, snippet.code)
+
+    def list_trash(self) -> Sequence[Snippet]:
+        # Kept in the order of deletion
+        return list(reversed(self._trash.values()))
+
+    def purge(self, older_than: timedelta | None = None, batch_size: int = 500) -> int:
+        """Drop trashed snippets for good, returns how many"""
+        cutoff = datetime.now(UTC) - (older_than or timedelta(0))
+        expired = [
+            snippet_id
+            for snippet_id, snippet in self._trash.items()
+            if snippet.deleted_at is not None and snippet.deleted_at <= cutoff
+        ]
+        for snippet_id in expired:
+            del self._trash[snippet_id]
+            self._tags.pop(snippet_id, None)
+            self._revisions.pop(snippet_id, None)
+            self._code.pop(snippet_id, None)
+            self._usage.pop(snippet_id, None)
+        return len(expired)
 
     def search(
         self, snippet_title: str, language: Language | None = None
     ) -> Sequence[Snippet]:
-        return [
+        matches = [
             snippet
             for snippet in self._data.values()
             if snippet_title.lower() in snippet.title.lower()
             and (language is None or language == snippet.language)
         ]
+        return sorted(matches, key=lambda snippet: -snippet.frecency)
 
     def favorite_on(self, snippet_id: int) -> None:
         snippet = self.get(snippet_id)
@@ -109,12 +371,137 @@ class InMemorySnippetRepo(SnippetRepository):
 
     def update(self, snippet: Snippet) -> None:
         """Update bestehendes Snippet (ID unverändert!)"""
-        if snippet.id not in self._data:
-            raise SnippetNotFoundError(f"Snippet {snippet.id} not found")
+        snippet_id = stored_id(snippet)
+        if snippet_id not in self._data:
+            raise SnippetNotFoundError(f"Snippet {snippet_id} not found")
 
-        existing = self._data[snippet.id]
-        for key, value in snippet.model_dump(exclude={"id"}).items():
+        existing = self._data[snippet_id]
+        previous_hash = existing.content_hash
+        self._record_revision(snippet_id, existing.title, snippet.code)
+        for key, value in snippet.model_dump(include=set(PATCH_FIELDS)).items():
             setattr(existing, key, value)
+        existing.refresh_derived()
+        if existing.content_hash != previous_hash:
+            self._index_similarity(snippet_id, existing.code)
+
+    def patch(self, snippet_id: int, **fields) -> None:
+        _check_patch_fields(fields)
+        if snippet_id not in self._data:
+            raise SnippetNotFoundError(f"Snippet {snippet_id} not found")
+        existing = self._data[snippet_id]
+        if "code" in fields:
+            self._record_revision(snippet_id, existing.title, fields["code"])
+        for key, value in fields.items():
+            setattr(existing, key, value)
+        if "code" in fields:
+            existing.refresh_derived()
+            self._index_similarity(snippet_id, existing.code)
+
+    def _record_revision(self, snippet_id: int, title: str, code: str) -> None:
+        """Keep the code last written before code replaces it"""
+        previous = self._code[snippet_id]
+        self._code[snippet_id] = code
+        if previous == code:
+            return
+        revisions = self._revisions.setdefault(snippet_id, [])
+        revisions.append(
+            history.new_revision(snippet_id, len(revisions) + 1, title, previous, code)
+        )
+
+    def history(self, snippet_id: int) -> builtins.list[SnippetRevision]:
+        if snippet_id not in self._data:
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        return list(reversed(self._revisions.get(snippet_id, [])))
+
+    def revision_code(self, snippet_id: int, number: int) -> str:
+        if snippet_id not in self._data:
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        chain = history.chain_for(self._revisions.get(snippet_id, []), number)
+        if chain is None:
+            raise SnippetNotFoundError(
+                f"Revision {number} of snippet {snippet_id} not found"
+            )
+        return history.reconstruct(self._code[snippet_id], chain)
+
+    def iter_snippets(
+        self, batch_size: int = 500, with_body: bool = True
+    ) -> Iterator[Snippet]:
+        yield from list(self._data.values())
+
+    def set_tags(self, snippet_id: int, tags: Sequence[str]) -> None:
+        if snippet_id not in self._data:
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        self._tags[snippet_id] = set(normalize_tags(tags))
+
+    def get_tags(self, snippet_ids: Sequence[int]) -> dict[int, builtins.list[str]]:
+        return {
+            snippet_id: sorted(self._tags.get(snippet_id, set()))
+            if snippet_id in self._data
+            else []
+            for snippet_id in snippet_ids
+        }
+
+    def list_tags(self) -> builtins.list[str]:
+        return sorted(set().union(*self._tags.values()))
+
+    def similar(
+        self,
+        snippet_id: int,
+        threshold: float | None = None,
+        limit: int = 10,
+    ) -> builtins.list[tuple[Snippet, float]]:
+        from snipster_tui import similarity
+
+        if threshold is None:
+            threshold = similarity.SIMILAR_THRESHOLD
+        if snippet_id not in self._data:
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        signature = self._signatures[snippet_id]
+        candidates = set().union(
+            *(
+                self._buckets[(band, key)]
+                for band, key in enumerate(similarity.band_keys(signature))
+            )
+        )
+        candidates.discard(snippet_id)
+        ranked = similarity.rank_similar(
+            signature,
+            {candidate: self._signatures[candidate] for candidate in candidates},
+            threshold,
+            limit,
+        )
+        return [(self._data[candidate], score) for candidate, score in ranked]
+
+    def duplicate_clusters(
+        self, threshold: float | None = None
+    ) -> builtins.list[builtins.list[int]]:
+        from snipster_tui import similarity
+
+        if threshold is None:
+            threshold = similarity.DUPLICATE_THRESHOLD
+        buckets = [ids for ids in self._buckets.values() if len(ids) > 1]
+        return similarity.duplicate_clusters(buckets, self._signatures, threshold)
+
+    def record_usage(self, usage: Mapping[int, UsageCount]) -> None:
+        for snippet_id, count in usage.items():
+            if snippet_id not in self._data and snippet_id not in self._trash:
+                continue
+            stored = self._usage.setdefault(
+                snippet_id, SnippetUsage(snippet_id=snippet_id)
+            )
+            stored.opens += count.opens
+            stored.copies += count.copies
+            stored.uses += count.opens + count.copies
+            stored.last_used = count.last_used or stored.last_used
+            snippet = self._data.get(snippet_id) or self._trash[snippet_id]
+            snippet.frecency += count.frecency
+
+    def most_used(self, limit: int = 50) -> builtins.list[tuple[Snippet, int]]:
+        ranked = sorted(
+            (usage for usage in self._usage.values() if usage.snippet_id in self._data),
+            key=lambda usage: (-usage.uses, usage.snippet_id),
+        )
+        return [(self._data[usage.snippet_id], usage.uses) for usage in ranked[:limit]]
 
 
 class DBSnippetRepo(SnippetRepository):
@@ -122,38 +509,278 @@ class DBSnippetRepo(SnippetRepository):
         self.session = session
 
     def add(self, snippet: Snippet) -> None:
+        snippet.refresh_derived()
         self.session.add(snippet)
+        self.session.flush()
+        self._index_similarity(snippet)
         self.session.commit()
 
-    def list(self, favorite: bool | None = None):
-        query = select(Snippet)
+    def _index_similarity(self, snippet: Snippet) -> None:
+        """Replace signature and LSH bands of one snippet (caller commits)"""
+        from snipster_tui import similarity
+
+        snippet_id = stored_id(snippet)
+        self._unindex_similarity(snippet_id)
+        signature = similarity.minhash_signature(snippet.code)
+        self.session.add(
+            SnippetSignature(
+                snippet_id=snippet_id,
+                content_hash=snippet.content_hash,
+                signature=similarity.signature_to_bytes(signature),
+            )
+        )
+        self.session.add_all(
+            SnippetBand(snippet_id=snippet_id, band=band, bucket=key)
+            for band, key in enumerate(similarity.band_keys(signature))
+        )
+
+    def _unindex_similarity(self, snippet_id: int) -> None:
+        self.session.exec(
+            delete(SnippetBand).where(col(SnippetBand.snippet_id) == snippet_id)
+        )
+        self.session.exec(
+            delete(SnippetSignature).where(
+                col(SnippetSignature.snippet_id) == snippet_id
+            )
+        )
+
+    def _index_missing(self, batch_size: int = 500) -> None:
+        """Index rows written without a signature or changed since"""
+        statement = (
+            select(Snippet.id)
+            .outerjoin(SnippetSignature, col(SnippetSignature.snippet_id) == Snippet.id)
+            .where(
+                LIVE,
+                or_(
+                    col(SnippetSignature.snippet_id).is_(None),
+                    col(SnippetSignature.content_hash) != Snippet.content_hash,
+                ),
+            )
+        )
+        stale = self.session.exec(statement).all()
+        # Bodies are loaded and indexed one batch at a time
+        for start in range(0, len(stale), batch_size):
+            batch = select(Snippet).where(
+                col(Snippet.id).in_(stale[start : start + batch_size])
+            )
+            for snippet in self.session.exec(
+                batch.options(defer(attr(Snippet.description)))
+            ):
+                snippet.refresh_derived()
+                self._index_similarity(snippet)
+            self.session.commit()
+
+    def _load_signatures(self, snippet_ids) -> dict[int, "np.ndarray"]:
+        from snipster_tui import similarity
+
+        ids = list(snippet_ids)
+        signatures = {}
+        for start in range(0, len(ids), 500):
+            statement = select(
+                SnippetSignature.snippet_id, SnippetSignature.signature
+            ).where(col(SnippetSignature.snippet_id).in_(ids[start : start + 500]))
+            for snippet_id, blob in self.session.exec(statement):
+                signatures[snippet_id] = similarity.signature_from_bytes(blob)
+        return signatures
+
+    def list(
+        self,
+        favorite: bool | None = None,
+        with_body: bool = False,
+        language: Language | None = None,
+        order_by: str = "id",
+        descending: bool = False,
+        tags: Sequence[str] | None = None,
+        match_all_tags: bool = False,
+    ):
+        stmt = self.list_statement(
+            favorite, with_body, language, order_by, descending, tags, match_all_tags
+        )
+        return self.session.exec(stmt).scalars().unique().all()
+
+    @classmethod
+    def list_statement(
+        cls,
+        favorite: bool | None = None,
+        with_body: bool = False,
+        language: Language | None = None,
+        order_by: str = "id",
+        descending: bool = False,
+        tags: Sequence[str] | None = None,
+        match_all_tags: bool = False,
+        cached: bool = True,
+    ):
+        _check_sort_column(order_by)
+        pieces: builtins.list[Callable] = [lambda: select(Snippet).where(LIVE)]
+        if not with_body:
+            pieces.append(lambda s: s.options(defer(attr(Snippet.code))))
         if favorite:
-            query = query.where(Snippet.favorite)
-        result = self.session.exec(query)
-        return result.unique().all()
+            pieces.append(lambda s: s.where(Snippet.favorite))
+        if language:
+            pieces.append(lambda s: s.where(col(Snippet.language) == language))
+        if tags:
+            tag_filter = cls._tag_filter(normalize_tags(tags), match_all_tags)
+            pieces.append(lambda s: s.where(tag_filter))
+        column = SORT_COLUMNS[order_by]
+        ordering = column.desc() if descending else column
+        pieces.append(lambda s: s.order_by(ordering, col(Snippet.id)))
+        return chain_statement(pieces, cached)
 
-    def get(self, snippet_id: int) -> Snippet | None:
-        stmt = select(Snippet).where(Snippet.id == snippet_id)
-        return self.session.exec(stmt).first()
+    def get(self, snippet_id: int, with_body: bool = True) -> Snippet | None:
+        """Load one snippet, code and description only when with_body is set"""
+        stmt = self.get_statement(snippet_id, with_body)
+        return self.session.exec(stmt).scalars().first()
+
+    @staticmethod
+    def get_statement(snippet_id: int, with_body: bool = True, cached: bool = True):
+        pieces: builtins.list[Callable] = [
+            lambda: select(Snippet).where(col(Snippet.id) == snippet_id, LIVE)
+        ]
+        if with_body:
+            pieces.append(
+                lambda s: s.options(*[undefer(column) for column in BODY_COLUMNS])
+            )
+        else:
+            pieces.append(
+                lambda s: s.options(*[defer(column) for column in BODY_COLUMNS])
+            )
+        return chain_statement(pieces, cached)
+
+    def get_many(
+        self, snippet_ids: Sequence[int], with_body: bool = True
+    ) -> builtins.list[Snippet]:
+        """Many snippets in one query (per 500 ids), the body as in get()"""
+        load = undefer if with_body else defer
+        ids = sorted(set(snippet_ids))
+        snippets = []
+        # Chunked to stay below the bound parameter limit of SQLite
+        for start in range(0, len(ids), 500):
+            statement = (
+                select(Snippet)
+                .where(col(Snippet.id).in_(ids[start : start + 500]), LIVE)
+                .options(*[load(column) for column in BODY_COLUMNS])
+                .order_by(col(Snippet.id))
+            )
+            snippets.extend(self.session.exec(statement))
+        return snippets
+
+    @staticmethod
+    def _tag_filter(tags: builtins.list[str], match_all: bool):
+        """WHERE clause resolved through the snippet_tags indexes"""
+        tag_ids = select(Tag.id).where(col(Tag.name).in_(tags))
+        if match_all:
+            # Every requested tag linked: one (tag_id, snippet_id) index range
+            # per tag, grouped per snippet
+            matching = (
+                select(SnippetTag.snippet_id)
+                .where(col(SnippetTag.tag_id).in_(tag_ids))
+                .group_by(col(SnippetTag.snippet_id))
+                .having(func.count() == len(tags))
+            )
+            return col(Snippet.id).in_(matching)
+        # Any tag: correlated EXISTS probing the (snippet_id, tag_id) PK
+        return exists().where(
+            col(SnippetTag.snippet_id) == Snippet.id,
+            col(SnippetTag.tag_id).in_(tag_ids),
+        )
+
+    def _get_for_write(self, snippet_id: int, *columns) -> Snippet | None:
+        """Fetch just the columns a write needs, never the body"""
+        statement = (
+            select(Snippet)
+            .where(col(Snippet.id) == snippet_id, LIVE)
+            .options(load_only(attr(Snippet.id), *columns))
+            .execution_options(**PRIMARY)
+        )
+        return self.session.exec(statement).first()
 
     def delete(self, snippet_id: int) -> None:
-        snippet = self.session.get(Snippet, snippet_id)
+        """Move a snippet to the trash, purge() removes it for good"""
+        snippet = self._get_for_write(snippet_id, Snippet.deleted_at)
         if not snippet:
             raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
-        self.session.delete(snippet)
+        snippet.deleted_at = datetime.now(UTC)
+        # Out of the LSH buckets now, restore() re-indexes lazily
+        self._unindex_similarity(snippet_id)
+        self.session.add(snippet)
         self.session.commit()
 
+    def restore(self, snippet_id: int) -> None:
+        statement = (
+            select(Snippet)
+            .where(col(Snippet.id) == snippet_id, col(Snippet.deleted_at).is_not(None))
+            .options(load_only(attr(Snippet.id), attr(Snippet.deleted_at)))
+            .execution_options(**PRIMARY)
+        )
+        snippet = self.session.exec(statement).first()
+        if not snippet:
+            raise SnippetNotFoundError(f"Snippet {snippet_id} not in the trash")
+        snippet.deleted_at = None
+        self.session.add(snippet)
+        self.session.commit()
+
+    def list_trash(self) -> Sequence[Snippet]:
+        """Trashed snippets with their body, most recently deleted first"""
+        statement = (
+            select(Snippet)
+            .where(col(Snippet.deleted_at).is_not(None))
+            .order_by(col(Snippet.deleted_at).desc(), col(Snippet.id))
+        )
+        return self.session.exec(statement).all()
+
+    def purge(self, older_than: timedelta | None = None, batch_size: int = 500) -> int:
+        """Hard-delete trashed snippets, one transaction per batch"""
+        statement = (
+            select(Snippet.id)
+            .where(col(Snippet.deleted_at).is_not(None))
+            .execution_options(**PRIMARY)
+        )
+        if older_than is not None:
+            cutoff = datetime.now(UTC) - older_than
+            statement = statement.where(col(Snippet.deleted_at) <= cutoff)
+        expired = self.session.exec(statement).all()
+        for start in range(0, len(expired), batch_size):
+            batch = expired[start : start + batch_size]
+            for model in (
+                SnippetTag,
+                SnippetRevision,
+                SnippetBand,
+                SnippetSignature,
+                SnippetUsage,
+            ):
+                self.session.exec(delete(model).where(col(model.snippet_id).in_(batch)))
+            self.session.exec(delete(Snippet).where(col(Snippet.id).in_(batch)))
+            self.session.commit()
+        return len(expired)
+
     def search(
-        self, snippet_title: str, language: Optional[Language] = None
-    ) -> List[Snippet]:
-        statement = select(Snippet).where(Snippet.title.ilike(f"%{snippet_title}%"))
+        self, snippet_title: str, language: Language | None = None
+    ) -> builtins.list[Snippet]:
+        stmt = self.search_statement(snippet_title, language)
+        return self.session.exec(stmt).scalars().all()
+
+    @staticmethod
+    def search_statement(
+        snippet_title: str, language: Language | None = None, cached: bool = True
+    ):
+        pattern = f"%{snippet_title}%"
+        pieces: builtins.list[Callable] = [
+            lambda: (
+                select(Snippet)
+                .where(col(Snippet.title).ilike(pattern), LIVE)
+                .options(defer(attr(Snippet.code)))
+            )
+        ]
         if language:
-            statement = statement.where(Snippet.language == language)
-        result = self.session.exec(statement)
-        return result.all()
+            pieces.append(lambda s: s.where(col(Snippet.language) == language))
+        # Most frecent first, straight from the frecency index
+        pieces.append(
+            lambda s: s.order_by(col(Snippet.frecency).desc(), col(Snippet.id))
+        )
+        return chain_statement(pieces, cached)
 
     def favorite_on(self, snippet_id: int) -> None:
-        snippet = self.session.get(Snippet, snippet_id)
+        snippet = self._get_for_write(snippet_id, Snippet.favorite)
         if not snippet:
             raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
         snippet.favorite = True
@@ -161,7 +788,7 @@ class DBSnippetRepo(SnippetRepository):
         self.session.commit()
 
     def favorite_off(self, snippet_id: int) -> None:
-        snippet = self.session.get(Snippet, snippet_id)
+        snippet = self._get_for_write(snippet_id, Snippet.favorite)
         if not snippet:
             raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
         snippet.favorite = False
@@ -169,17 +796,322 @@ class DBSnippetRepo(SnippetRepository):
         self.session.commit()
 
     def list_favorites(self) -> Sequence[Snippet]:
-        statement = select(Snippet).where(Snippet.favorite)
-        return self.session.exec(statement).all()
+        stmt = lambda_stmt(
+            lambda: (
+                select(Snippet)
+                .where(Snippet.favorite, LIVE)
+                .options(defer(attr(Snippet.code)))
+            )
+        )
+        return self.session.exec(stmt).scalars().all()
 
     def update(self, snippet: Snippet) -> None:
         """Update bestehendes Snippet (SQLAlchemy-sicher!)"""
-        existing = self.session.get(Snippet, snippet.id)
-        if not existing:
-            raise SnippetNotFoundError(f"Snippet {snippet.id} not found")
+        # snippet may be the loaded instance with the new values already set,
+        # so nothing is flushed before the stored code has been read
+        snippet_id = stored_id(snippet)
+        with self.session.no_autoflush:
+            existing = self._get_for_write(snippet_id, Snippet.content_hash)
+            if not existing:
+                raise SnippetNotFoundError(f"Snippet {snippet_id} not found")
+            previous_hash = existing.content_hash
+            if content_hash(snippet.code) != previous_hash:
+                self._record_revision(snippet_id, snippet.code)
 
-        for key, value in snippet.model_dump(exclude={"id"}).items():
+        for key, value in snippet.model_dump(include=set(PATCH_FIELDS)).items():
             setattr(existing, key, value)
+        existing.refresh_derived()
+        if existing.content_hash != previous_hash:
+            self._index_similarity(existing)
 
         self.session.add(existing)
         self.session.commit()
+
+    def patch(self, snippet_id: int, **fields) -> None:
+        """Write just the given fields, without loading or re-sending the rest"""
+        _check_patch_fields(fields)
+        if not fields:
+            return
+        # Only the id is loaded, so the UPDATE lists exactly the patched columns
+        existing = self._get_for_write(snippet_id)
+        if not existing:
+            raise SnippetNotFoundError(f"Snippet {snippet_id} not found")
+        if "code" in fields:
+            self._record_revision(snippet_id, fields["code"])
+        for key, value in fields.items():
+            setattr(existing, key, value)
+        if "code" in fields:
+            existing.refresh_derived()
+            self._index_similarity(existing)
+        self.session.add(existing)
+        self.session.commit()
+
+    def _record_revision(self, snippet_id: int, code: str) -> None:
+        """Keep the stored code before it is replaced by code (caller commits)"""
+        previous, title = self.session.exec(
+            select(Snippet.code, Snippet.title).where(col(Snippet.id) == snippet_id)
+        ).one()
+        if previous == code:
+            return
+        last = self.session.exec(
+            select(func.max(SnippetRevision.number)).where(
+                col(SnippetRevision.snippet_id) == snippet_id
+            )
+        ).one()
+        self.session.add(
+            history.new_revision(snippet_id, (last or 0) + 1, title, previous, code)
+        )
+
+    def history(self, snippet_id: int) -> builtins.list[SnippetRevision]:
+        """Revisions of a snippet, newest first, without their payload"""
+        if self.get(snippet_id, with_body=False) is None:
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        statement = (
+            select(SnippetRevision)
+            .where(col(SnippetRevision.snippet_id) == snippet_id)
+            .order_by(col(SnippetRevision.number).desc())
+            .options(defer(attr(SnippetRevision.payload)))
+        )
+        return list(self.session.exec(statement))
+
+    def revision_code(self, snippet_id: int, number: int) -> str:
+        """Rebuild one revision from the nearest keyframe or the current code"""
+        current = self.session.exec(
+            select(Snippet.code).where(col(Snippet.id) == snippet_id, LIVE)
+        ).first()
+        if current is None:
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        # A keyframe (or the newest revision) is at most this far away
+        statement = (
+            select(SnippetRevision)
+            .where(
+                col(SnippetRevision.snippet_id) == snippet_id,
+                col(SnippetRevision.number) >= number,
+            )
+            .order_by(col(SnippetRevision.number))
+            .limit(history.KEYFRAME_INTERVAL)
+            .options(undefer(attr(SnippetRevision.payload)))
+        )
+        chain = history.chain_for(list(self.session.exec(statement)), number)
+        if chain is None:
+            raise SnippetNotFoundError(
+                f"Revision {number} of snippet {snippet_id} not found"
+            )
+        return history.reconstruct(current, chain)
+
+    def iter_snippets(
+        self, batch_size: int = 500, with_body: bool = True
+    ) -> Iterator[Snippet]:
+        """Stream all snippets, batch_size rows per fetch"""
+        # yield_per turns on stream_results, i.e. a server-side cursor on Postgres
+        statement = (
+            select(Snippet)
+            .where(LIVE)
+            .order_by(col(Snippet.id))
+            .execution_options(yield_per=batch_size)
+        )
+        if not with_body:
+            statement = statement.options(*[defer(c) for c in BODY_COLUMNS])
+        yield from self.session.exec(statement)
+
+    def set_tags(self, snippet_id: int, tags: Sequence[str]) -> None:
+        """Replace the tags of a snippet, creating unknown tags on the fly"""
+        if not self._get_for_write(snippet_id):
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        names = normalize_tags(tags)
+        known = {
+            tag.name: tag
+            for tag in self.session.exec(select(Tag).where(col(Tag.name).in_(names)))
+        }
+        for name in names:
+            if name not in known:
+                known[name] = Tag(name=name)
+                self.session.add(known[name])
+        self.session.flush()
+
+        wanted = {known[name].id for name in names}
+        current = set(
+            self.session.exec(
+                select(SnippetTag.tag_id).where(
+                    col(SnippetTag.snippet_id) == snippet_id
+                )
+            )
+        )
+        if current - wanted:
+            self.session.exec(
+                delete(SnippetTag).where(
+                    col(SnippetTag.snippet_id) == snippet_id,
+                    col(SnippetTag.tag_id).in_(current - wanted),
+                )
+            )
+        self.session.add_all(
+            SnippetTag(snippet_id=snippet_id, tag_id=tag_id)
+            for tag_id in wanted - current
+        )
+        self.session.commit()
+
+    def get_tags(self, snippet_ids: Sequence[int]) -> dict[int, builtins.list[str]]:
+        """Tag names for many snippets in one query"""
+        tags: dict[int, list[str]] = {snippet_id: [] for snippet_id in snippet_ids}
+        if not tags:
+            return tags
+        ids = list(tags)
+        # Chunked to stay below the bound parameter limit of SQLite
+        for start in range(0, len(ids), 500):
+            statement = (
+                select(SnippetTag.snippet_id, Tag.name)
+                .join(Tag, col(Tag.id) == SnippetTag.tag_id)
+                .join(Snippet, col(Snippet.id) == SnippetTag.snippet_id)
+                .where(col(SnippetTag.snippet_id).in_(ids[start : start + 500]), LIVE)
+                .order_by(col(Tag.name))
+            )
+            for snippet_id, name in self.session.exec(statement):
+                tags[snippet_id].append(name)
+        return tags
+
+    def list_tags(self) -> builtins.list[str]:
+        return list(self.session.exec(select(Tag.name).order_by(col(Tag.name))))
+
+    def similar(
+        self,
+        snippet_id: int,
+        threshold: float | None = None,
+        limit: int = 10,
+    ) -> builtins.list[tuple[Snippet, float]]:
+        """Snippets whose code is close to snippet_id's, best match first"""
+        from snipster_tui import similarity
+
+        if threshold is None:
+            threshold = similarity.SIMILAR_THRESHOLD
+        self._index_missing()
+        own = self.session.get(SnippetSignature, snippet_id)
+        if own is None:
+            raise SnippetNotFoundError(f"Snippet with id {snippet_id} not found")
+        # Candidates share at least one (band, bucket) with the snippet
+        mine = aliased(SnippetBand)
+        candidates = (
+            select(SnippetBand.snippet_id)
+            .join(
+                mine,
+                and_(mine.band == SnippetBand.band, mine.bucket == SnippetBand.bucket),
+            )
+            .where(
+                mine.snippet_id == snippet_id, col(SnippetBand.snippet_id) != snippet_id
+            )
+            .distinct()
+        )
+        ranked = similarity.rank_similar(
+            similarity.signature_from_bytes(own.signature),
+            self._load_signatures(self.session.exec(candidates)),
+            threshold,
+            limit,
+        )
+        if not ranked:
+            return []
+        statement = (
+            select(Snippet)
+            .where(col(Snippet.id).in_([candidate for candidate, _ in ranked]))
+            .options(*[defer(column) for column in BODY_COLUMNS])
+        )
+        snippets = {snippet.id: snippet for snippet in self.session.exec(statement)}
+        return [(snippets[candidate], score) for candidate, score in ranked]
+
+    def duplicate_clusters(
+        self, threshold: float | None = None
+    ) -> builtins.list[builtins.list[int]]:
+        """Clusters of near-identical snippets, from the crowded LSH buckets"""
+        from snipster_tui import similarity
+
+        if threshold is None:
+            threshold = similarity.DUPLICATE_THRESHOLD
+        self._index_missing()
+        crowded = (
+            select(SnippetBand.band, SnippetBand.bucket)
+            .group_by(col(SnippetBand.band), col(SnippetBand.bucket))
+            .having(func.count() > 1)
+            .subquery()
+        )
+        statement = (
+            select(SnippetBand.band, SnippetBand.bucket, SnippetBand.snippet_id)
+            .join(
+                crowded,
+                and_(
+                    crowded.c.band == SnippetBand.band,
+                    crowded.c.bucket == SnippetBand.bucket,
+                ),
+            )
+            .order_by(col(SnippetBand.band), col(SnippetBand.bucket))
+        )
+        buckets = [
+            [snippet_id for _, _, snippet_id in rows]
+            for _, rows in groupby(self.session.exec(statement), key=lambda r: r[:2])
+        ]
+        signatures = self._load_signatures({i for bucket in buckets for i in bucket})
+        return similarity.duplicate_clusters(buckets, signatures, threshold)
+
+    def record_usage(
+        self, usage: Mapping[int, UsageCount], batch_size: int = 500
+    ) -> None:
+        """Add buffered counts, one upsert per batch; snippets purged
+        meanwhile are skipped"""
+        upsert = UPSERTS[self.session.get_bind().dialect.name]
+        ids = list(usage)
+        for start in range(0, len(ids), batch_size):
+            stored = self.session.exec(
+                select(Snippet.id)
+                .where(col(Snippet.id).in_(ids[start : start + batch_size]))
+                .execution_options(**PRIMARY)
+            ).all()
+            if not stored:
+                continue
+            statement = upsert(SnippetUsage).values(
+                [
+                    {
+                        "snippet_id": snippet_id,
+                        "opens": usage[snippet_id].opens,
+                        "copies": usage[snippet_id].copies,
+                        "uses": usage[snippet_id].opens + usage[snippet_id].copies,
+                        "last_used": usage[snippet_id].last_used,
+                    }
+                    for snippet_id in stored
+                ]
+            )
+            new = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=["snippet_id"],
+                set_={
+                    "opens": SnippetUsage.opens + new.opens,
+                    "copies": SnippetUsage.copies + new.copies,
+                    "uses": SnippetUsage.uses + new.uses,
+                    "last_used": func.coalesce(new.last_used, SnippetUsage.last_used),
+                },
+            )
+            self.session.exec(statement)
+            # Frecency rides along as one executemany
+            table = Snippet.metadata.tables["snippet"]
+            self.session.connection().execute(
+                update(table)
+                .where(table.c.id == bindparam("snippet_id"))
+                .values(frecency=table.c.frecency + bindparam("weight")),
+                [
+                    {"snippet_id": snippet_id, "weight": usage[snippet_id].frecency}
+                    for snippet_id in stored
+                ],
+            )
+        # The UPDATE bypasses the ORM, loaded snippets must reload frecency
+        for instance in list(self.session.identity_map.values()):
+            if isinstance(instance, Snippet) and instance.id in usage:
+                self.session.expire(instance, ["frecency"])
+        self.session.commit()
+
+    def most_used(self, limit: int = 50) -> builtins.list[tuple[Snippet, int]]:
+        """Live snippets by opens + copies, without the code body"""
+        statement = (
+            select(Snippet, SnippetUsage.uses)
+            .join(SnippetUsage, col(SnippetUsage.snippet_id) == Snippet.id)
+            .where(LIVE)
+            .options(defer(attr(Snippet.code)))
+            .order_by(col(SnippetUsage.uses).desc(), col(Snippet.id))
+            .limit(limit)
+        )
+        return [(snippet, uses) for snippet, uses in self.session.exec(statement)]
@@ -0,0 +1,139 @@
+import itertools
+import threading
+import time
+from collections.abc import Sequence
+from typing import TypeIs
+
+from decouple import config
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+from sqlmodel import Session, create_engine
+
+# Seconds a replica health check (and lag measurement) is trusted
+HEALTH_INTERVAL = config("SNIPSTER_REPLICA_HEALTH_INTERVAL", default=10.0, cast=float)
+# After a commit on the primary, reads stay there at least this long even if
+# a replica reports no lag, the lag is only sampled every HEALTH_INTERVAL
+READ_YOUR_WRITES = config("SNIPSTER_READ_YOUR_WRITES", default=2.0, cast=float)
+
+# Execution option sending a SELECT to the primary, for reads a write relies on
+PRIMARY = {"snipster_primary": True}
+
+POSTGRES_LAG = text(
+    "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()"
+    " THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    " END, 0)"
+)
+
+
+def _is_select(clause) -> TypeIs[Select | StatementLambdaElement]:
+    # Cached lambda statements wrap the Select they build
+    if isinstance(clause, StatementLambdaElement):
+        return clause.is_select
+    return isinstance(clause, Select)
+
+
+class ReplicaRouter:
+    """Primary engine for writes, round-robin over healthy replicas for reads"""
+
+    def __init__(
+        self,
+        primary_url: str,
+        replica_urls: Sequence[str],
+        health_interval: float = HEALTH_INTERVAL,
+        read_your_writes: float = READ_YOUR_WRITES,
+    ):
+        self.primary = create_engine(primary_url, echo=False)
+        self.replicas = [create_engine(url, echo=False) for url in replica_urls]
+        self.health_interval = health_interval
+        self.read_your_writes = read_your_writes
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        # replica -> (checked at, healthy, lag in seconds)
+        self._health: dict[Engine, tuple[float, bool, float]] = {}
+        self._last_write = float("-inf")
+        event.listen(self.primary, "commit", self._on_commit)
+        for replica in self.replicas:
+            event.listen(replica, "handle_error", self._on_replica_error)
+
+    def _on_commit(self, connection) -> None:
+        self._last_write = time.monotonic()
+
+    def _on_replica_error(self, context) -> None:
+        # A dropped connection takes the replica out until its next check
+        if context.is_disconnect:
+            with self._lock:
+                self._health[context.engine] = (time.monotonic(), False, 0.0)
+
+    def check(self, replica: Engine) -> tuple[bool, float]:
+        """(reachable, replication lag in seconds), cached for health_interval"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._health.get(replica)
+        if cached and now - cached[0] < self.health_interval:
+            return cached[1], cached[2]
+        try:
+            with replica.connect() as connection:
+                if replica.dialect.name == "postgresql":
+                    lag = float(connection.execute(POSTGRES_LAG).scalar())
+                else:
+                    connection.execute(text("SELECT 1"))
+                    lag = 0.0
+            healthy = True
+        except DBAPIError:
+            healthy, lag = False, 0.0
+        with self._lock:
+            self._health[replica] = (now, healthy, lag)
+        return healthy, lag
+
+    def reader(self) -> Engine:
+        """Next healthy replica that has caught up with our last write"""
+        since_write = time.monotonic() - self._last_write
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._turn) % len(self.replicas)]
+            healthy, lag = self.check(replica)
+            if healthy and since_write > max(lag, self.read_your_writes):
+                return replica
+        return self.primary
+
+    def session(self, **kwargs) -> "RoutingSession":
+        return RoutingSession(self, **kwargs)
+
+    def dispose(self) -> None:
+        for engine in (self.primary, *self.replicas):
+            engine.dispose()
+
+
+class RoutingSession(Session):
+    """Session sending plain SELECTs to a replica and everything else to the
+    primary. Once a transaction wrote, it stays on the primary until it ends."""
+
+    def __init__(self, router: ReplicaRouter, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+        self._pinned = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self._pinned
+            or self._flushing
+            or not _is_select(clause)
+            or clause.get_execution_options().get("snipster_primary")
+        ):
+            self._pinned = True
+            return self.router.primary
+        return self.router.reader()
+
+    def commit(self) -> None:
+        super().commit()
+        self._pinned = False
+
+    def rollback(self) -> None:
+        super().rollback()
+        self._pinned = False
+
+    def close(self) -> None:
+        super().close()
+        self._pinned = False
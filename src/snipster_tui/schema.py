@@ -0,0 +1,107 @@
+from sqlalchemy import inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.engine.interfaces import ReflectedColumn
+from sqlalchemy.types import LargeBinary
+from sqlmodel import SQLModel
+
+from snipster_tui.exceptions import LibraryNotSetUpError
+from snipster_tui.models import Snippet, derived_values
+
+# Columns snippet gained after the first release, with the value existing
+# rows get (None: NULL)
+ADDED_COLUMNS = {
+    "content_hash": None,
+    "code_preview": "''",
+    "line_count": "0",
+    "byte_size": "0",
+    "deleted_at": None,
+    "frecency": "0",
+}
+
+# Rows whose derived columns are filled in per transaction
+BACKFILL_BATCH_SIZE = 500
+
+
+def install(engine: Engine) -> None:
+    """Create a new library, or bring an existing one up to date"""
+    SQLModel.metadata.create_all(engine)
+    upgrade(engine)
+
+
+def upgrade(engine: Engine) -> None:
+    """Bring a library written by an older version up to date
+
+    Idempotent, runs once per process for every engine it creates. Missing
+    tables and indexes are created, missing columns added and filled in.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("snippet"):
+        raise LibraryNotSetUpError(
+            f"No snippet library at {engine.url!r}, run snipster-tui and save "
+            "the configuration (Init) first"
+        )
+    columns = {column["name"]: column for column in inspector.get_columns("snippet")}
+    with engine.begin() as connection:
+        SQLModel.metadata.create_all(connection)
+        _convert_code_column(connection, columns["code"])
+        added = _add_columns(connection, columns)
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    if "content_hash" in added:
+        _backfill_derived(engine)
+
+
+def _convert_code_column(connection: Connection, column: ReflectedColumn) -> None:
+    """Bodies are codec-tagged blobs now (compression.py); Postgres needs the
+    column converted, SQLite stores either and reads old text rows as is"""
+    if connection.dialect.name != "postgresql":
+        return
+    if isinstance(column["type"], LargeBinary):
+        return
+    connection.execute(
+        text(
+            "ALTER TABLE snippet ALTER COLUMN code TYPE BYTEA"
+            " USING decode('00', 'hex') || convert_to(code, 'UTF8')"
+        )
+    )
+
+
+def _add_columns(connection: Connection, existing: dict) -> list[str]:
+    quote = connection.dialect.identifier_preparer.quote
+    added = []
+    for name, default in ADDED_COLUMNS.items():
+        if name in existing:
+            continue
+        column_type = (
+            Snippet.metadata.tables["snippet"].c[name].type.compile(connection.dialect)
+        )
+        ddl = f"ALTER TABLE snippet ADD COLUMN {quote(name)} {column_type}"
+        if default is not None:
+            ddl += f" NOT NULL DEFAULT {default}"
+        connection.execute(text(ddl))
+        added.append(name)
+    return added
+
+
+def _backfill_derived(engine: Engine) -> None:
+    """Hash, preview and sizes of rows stored before those columns existed"""
+    table = Snippet.metadata.tables["snippet"]
+    last = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(table.c.id, table.c.code)
+                .where(table.c.content_hash.is_(None), table.c.id > last)
+                .order_by(table.c.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return
+            for snippet_id, code in rows:
+                connection.execute(
+                    update(table)
+                    .where(table.c.id == snippet_id)
+                    .values(**derived_values(code))
+                )
+            last = rows[-1][0]
@@ -0,0 +1,128 @@
+import hashlib
+import random
+import re
+import zlib
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+
+# MinHash signatures over token shingles, bucketed with LSH banding.
+# 32 bands of 4 rows put the candidate threshold at ~(1/32)^(1/4) = 0.42,
+# candidates are then ranked by their estimated Jaccard similarity.
+NUM_PERMUTATIONS = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.8
+SIMILAR_THRESHOLD = 0.5
+
+# h(x) = (a * x + b) mod p with a < 2**31 and x, b < 2**32, so the products
+# stay below 2**64 and numpy's uint64 maths is exact
+_PRIME = (1 << 32) - 5
+_random = random.Random(20240101)
+_A = np.array(
+    [_random.randrange(1, 1 << 31) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64
+)[:, None]
+_B = np.array(
+    [_random.randrange(0, 1 << 32) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64
+)[:, None]
+# Shingles hashed per block, bounds the (permutations x shingles) matrix
+_BLOCK = 4096
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def shingle_hashes(code: str) -> np.ndarray:
+    """crc32 of every run of SHINGLE_SIZE tokens, whitespace and case ignored"""
+    tokens = TOKEN_PATTERN.findall(code.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    size = min(SHINGLE_SIZE, len(tokens))
+    shingles = {
+        zlib.crc32(" ".join(tokens[i : i + size]).encode("utf-8"))
+        for i in range(len(tokens) - size + 1)
+    }
+    return np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signature(code: str) -> np.ndarray:
+    """NUM_PERMUTATIONS minimum hashes, empty for code without tokens"""
+    hashes = shingle_hashes(code)
+    if not hashes.size:
+        return np.empty(0, dtype=np.uint32)
+    signature = np.full(NUM_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    for start in range(0, hashes.size, _BLOCK):
+        block = hashes[start : start + _BLOCK][None, :]
+        np.minimum(signature, ((_A * block + _B) % _PRIME).min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> list[int]:
+    """One signed 64 bit bucket key per band"""
+    if not signature.size:
+        return []
+    return [
+        int.from_bytes(
+            hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "big", signed=True
+        )
+        for band in signature.reshape(BANDS, ROWS_PER_BAND)
+    ]
+
+
+def signature_to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4").astype(np.uint32)
+
+
+def rank_similar(
+    signature: np.ndarray,
+    candidates: Mapping[int, np.ndarray],
+    threshold: float = SIMILAR_THRESHOLD,
+    limit: int = 10,
+) -> list[tuple[int, float]]:
+    """(snippet_id, estimated similarity) pairs, best first"""
+    candidates = {key: sig for key, sig in candidates.items() if sig.size}
+    if not signature.size or not candidates:
+        return []
+    ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+    scores = (np.stack(list(candidates.values())) == signature).mean(axis=1)
+    order = np.argsort(-scores, kind="stable")
+    return [(int(ids[i]), float(scores[i])) for i in order if scores[i] >= threshold][
+        :limit
+    ]
+
+
+def duplicate_clusters(
+    buckets: Iterable[Iterable[int]],
+    signatures: Mapping[int, np.ndarray],
+    threshold: float = DUPLICATE_THRESHOLD,
+) -> list[list[int]]:
+    """Group snippets sharing an LSH bucket whose similarity reaches threshold"""
+    parent: dict[int, int] = {}
+
+    def find(node: int) -> int:
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for bucket in buckets:
+        ids = sorted(set(bucket))
+        if len(ids) < 2:
+            continue
+        matrix = np.stack([signatures[snippet_id] for snippet_id in ids])
+        for i, snippet_id in enumerate(ids[:-1]):
+            scores = (matrix[i + 1 :] == matrix[i]).mean(axis=1)
+            for offset in np.nonzero(scores >= threshold)[0]:
+                parent[find(ids[i + 1 + offset])] = find(snippet_id)
+
+    clusters: dict[int, list[int]] = {}
+    for node in parent:
+        clusters.setdefault(find(node), []).append(node)
+    return sorted(
+        (sorted(members) for members in clusters.values() if len(members) > 1),
+        key=lambda members: members[0],
+    )
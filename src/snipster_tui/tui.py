@@ -1,61 +1,141 @@
-from pathlib import Path
+import difflib
+import threading
+from typing import cast
 
-from decouple import Config, RepositoryEnv
 from rich.syntax import Syntax
-from sqlmodel import Session, create_engine
-from textual import on
+from rich.text import Text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import create_engine
+from textual import on, work
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, Vertical, VerticalScroll
+from textual.coordinate import Coordinate
 from textual.reactive import reactive
 from textual.screen import ModalScreen
 from textual.widgets import Button, DataTable, Input, OptionList, Static, TextArea
+from textual.widgets.data_table import RowKey
 from textual.widgets.option_list import Option
-
-from snipster_tui.exceptions import NoMatches, SnippetNotFoundError
-from snipster_tui.models import Language, Snippet
-from snipster_tui.repo import DBSnippetRepo
-
-DEFAULT_PROJECT_HOME = Path.home() / ".snipster_tui"
-DEFAULT_DB_PATH = DEFAULT_PROJECT_HOME / "snipster_tui.sqlite"
-ENV_PATH = DEFAULT_PROJECT_HOME / ".env"
-
-
-def ensure_env_file() -> tuple[Config, str | None]:
-    if not ENV_PATH.exists():
-        print(f"[yellow]⚠️  No .env found at {ENV_PATH}")
-        DEFAULT_PROJECT_HOME.mkdir(parents=True, exist_ok=True)
-        # Datei anlegen, damit open nicht crasht
-        ENV_PATH.touch(exist_ok=True)
-        fallback_url = f"sqlite:///{DEFAULT_DB_PATH}"
-        return Config(RepositoryEnv(ENV_PATH)), fallback_url
-    return Config(RepositoryEnv(ENV_PATH)), None
-
-
-# EINMALIGE Config-Ladung
-config_modul, fallback_url = ensure_env_file()
-DATABASE_URL_MOD = fallback_url or f"sqlite:///{DEFAULT_DB_PATH}"
-
-DB_USER_MOD = config_modul("DB_USER", default="")
-DB_PASS_MOD = config_modul("DB_PASS", default="")
-DB_HOST_MOD = config_modul("DB_HOST", default="localhost")
-DB_PORT_MOD = config_modul("DB_PORT", default="5432")
-DB_NAME_MOD = config_modul("DB_NAME", default="snipster")
-
-# PostgreSQL URL if Postgres-config exists
-if DB_USER_MOD and all([DB_PASS_MOD, DB_HOST_MOD, DB_PORT_MOD, DB_NAME_MOD]):
-    DATABASE_URL_MOD = f"postgresql://{DB_USER_MOD}:{DB_PASS_MOD}@{DB_HOST_MOD}:{DB_PORT_MOD}/{DB_NAME_MOD}"
-
-
-def get_session():
-    return Session(create_engine(DATABASE_URL_MOD, echo=False))
+from textual.worker import get_current_worker
+
+# Config names stay importable from here for existing callers
+from snipster_tui import cli, client, highlight, related
+from snipster_tui.db import (  # noqa: F401
+    DATABASE_URL_MOD,
+    DEFAULT_DB_PATH,
+    DEFAULT_PROJECT_HOME,
+    ENV_PATH,
+    LIBRARIES_MOD,
+    ensure_env_file,
+    get_session,
+    probe,
+    session_scope,
+    warm_pool,
+)
+from snipster_tui.exceptions import (
+    DaemonError,
+    LibraryNotSetUpError,
+    NoMatches,
+    SnippetNotFoundError,
+)
+from snipster_tui.federation import FederatedSnippetRepository
+from snipster_tui.memory import LRUCache, MemoryBudget, MemoryReport, approx_size
+from snipster_tui.models import Language, Snippet, normalize_tags
+from snipster_tui.related import RelatedIndex
+from snipster_tui.repo import SORT_COLUMNS, DBSnippetRepo  # noqa: F401
+from snipster_tui.usage import FLUSH_INTERVAL, UsageBuffer
+
+LIST_COLUMNS = [
+    ("id", "ID"),
+    ("title", "Title"),
+    ("code", "Code"),
+    ("description", "Description"),
+    ("line_count", "Lines"),
+    ("byte_size", "Size"),
+    ("language", "Language"),
+    ("favorite", "Favorite"),
+    ("tags", "Tags"),
+]
+
+# Prefetch of the row under the cursor: wait until the cursor rests, then
+# load (and highlight) it and its neighbours in a background thread
+PREFETCH_DELAY = 0.15
+PREFETCH_NEIGHBOURS = 1
+PREFETCH_CACHE_SIZE = 32
+
+# Default order of the list, see usage.py
+DEFAULT_SORT = "frecency"
+
+# Rows hard-deleted per transaction when the trash is emptied
+PURGE_BATCH_SIZE = 200
+
+
+def open_repo():
+    """cli.open_repo mit den Einstellungen dieses Moduls, Snippets als Modelle"""
+    return cli.open_repo(
+        snippet_type=Snippet, session_factory=get_session, libraries=LIBRARIES_MOD
+    )
+
+
+class PrehighlightedSyntax(Syntax):
+    """Syntax that can be highlighted ahead of time, e.g. in a worker thread"""
+
+    _highlighted: tuple[str, Text] | None = None
+
+    def prehighlight(self) -> "PrehighlightedSyntax":
+        _, code = self._process_code(self.code)
+        self._highlighted = (code, super().highlight(code))
+        return self
+
+    def highlight(self, code: str, line_range=None) -> Text:
+        if line_range is None and self._highlighted and self._highlighted[0] == code:
+            return self._highlighted[1].copy()
+        return super().highlight(code, line_range)
+
+
+def format_size(nbytes: int) -> str:
+    if nbytes < 1024:
+        return f"{nbytes} B"
+    return f"{nbytes / 1024:.1f} KiB"
+
+
+def row_snippet_id(row_key: RowKey) -> int:
+    # Rows are keyed by the id of their snippet
+    return int(cast(str, row_key.value))
+
+
+def code_syntax(code: str, language: str) -> PrehighlightedSyntax:
+    return PrehighlightedSyntax(
+        code,
+        highlight.lexer_for(language or "text"),
+        theme=highlight.code_theme(),
+        line_numbers=True,
+    )
 
 
 class CodeViewScreen(ModalScreen[None]):
-    BINDINGS = [("escape", "close_modal", "Close")]
+    BINDINGS = [
+        ("escape", "close_modal", "Close"),
+        ("r", "show_related", "Related"),
+        ("h", "show_history", "History"),
+    ]
+
+    @property
+    def snipster(self) -> "Snipster":
+        return cast("Snipster", self.app)
 
     def action_close_modal(self) -> None:
         self.dismiss()
 
+    def action_show_related(self) -> None:
+        related = self.query_one("#related", OptionList)
+        related.display = True
+        related.clear_options()
+        related.add_option(Option("Searching…", disabled=True))
+        self.snipster.load_related(self)
+
+    def action_show_history(self) -> None:
+        self.app.push_screen(HistoryScreen(self.snippet_id, self.title))
+
     DEFAULT_CSS = """
     CodeViewScreen {
         align: center middle;
@@ -66,11 +146,20 @@ class CodeViewScreen(ModalScreen[None]):
         border: round solid #444;
         background: $panel;
     }
+    #code_row {
+        height: 1fr;
+    }
     #code_view {
+        width: 1fr;
         height: 1fr;
         padding: 1;
         background: $background;
     }
+    #related {
+        width: 32;
+        height: 1fr;
+        display: none;
+    }
     #buttons {
         height: auto;
         margin-top: 1;
@@ -80,12 +169,20 @@ class CodeViewScreen(ModalScreen[None]):
     }
     """
 
-    def __init__(self, snippet_id: int, code: str, title: str, language: str):
+    def __init__(
+        self,
+        snippet_id: int,
+        code: str,
+        title: str,
+        language: str,
+        syntax: Syntax | None = None,
+    ):
         super().__init__()  # ← ZUERST super()!
         self.snippet_id = snippet_id
         self.code = code
         self.title = title
         self.language = language or "text"
+        self.syntax = syntax or code_syntax(code, self.language)
 
     def compose(self) -> ComposeResult:
         yield VerticalScroll(
@@ -93,13 +190,19 @@ class CodeViewScreen(ModalScreen[None]):
                 f"[bold cyan]Snippet '{self.title}' (ID: {self.snippet_id})[/]",
                 id="title",
             ),
-            Static(
-                Syntax(self.code, self.language, theme="monokai", line_numbers=True),
-                id="code_view",
-                expand=True,
+            Horizontal(
+                Static(
+                    self.syntax,
+                    id="code_view",
+                    expand=True,
+                ),
+                OptionList(id="related"),
+                id="code_row",
             ),
             Horizontal(
                 Button("📋 Copy Code", id="copy_btn", variant="primary"),
+                Button("🔗 Related", id="related_btn"),
+                Button("🕘 History", id="history_btn"),
                 Button("❌ Close", id="close_btn", variant="error"),
                 id="buttons",
             ),
@@ -108,10 +211,126 @@ class CodeViewScreen(ModalScreen[None]):
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "copy_btn":
             self.app.copy_to_clipboard(self.code)
+            self.snipster.usage.copied(self.snippet_id)
             self.notify(f"Code copied! ({len(self.code)} chars)", severity="success")
+        elif event.button.id == "related_btn":
+            self.action_show_related()
+        elif event.button.id == "history_btn":
+            self.action_show_history()
         elif event.button.id == "close_btn":
             self.dismiss()
 
+    def show_related(self, related: list[tuple[int, str, float]]) -> None:
+        options = self.query_one("#related", OptionList)
+        options.clear_options()
+        for snippet_id, title, score in related:
+            options.add_option(
+                Option(f"{score:4.0%} {title}", id=f"related_{snippet_id}")
+            )
+        if not related:
+            options.add_option(Option("No related snippets", disabled=True))
+
+    @on(OptionList.OptionSelected, "#related")
+    def open_related(self, event: OptionList.OptionSelected) -> None:
+        if event.option.id is None:
+            return
+        snippet_id = int(event.option.id.removeprefix("related_"))
+        self.dismiss()
+        self.app.call_later(self.snipster.open_snippet, snippet_id)
+
+
+class HistoryScreen(ModalScreen[None]):
+    """Revisions of one snippet, each shown as diff to the version after it"""
+
+    BINDINGS = [("escape", "close_modal", "Close")]
+
+    DEFAULT_CSS = """
+    HistoryScreen {
+        align: center middle;
+    }
+    HistoryScreen > Vertical {
+        width: 90%;
+        height: 80%;
+        border: round solid #444;
+        background: $panel;
+    }
+    #history_row {
+        height: 1fr;
+    }
+    #revisions {
+        width: 36;
+        height: 1fr;
+    }
+    #diff_view {
+        width: 1fr;
+        height: 1fr;
+        padding: 0 1;
+        background: $background;
+    }
+    """
+
+    def __init__(self, snippet_id: int, title: str | None):
+        super().__init__()
+        self.snippet_id = snippet_id
+        self.title = title
+
+    def action_close_modal(self) -> None:
+        self.dismiss()
+
+    def compose(self) -> ComposeResult:
+        with open_repo() as repo:
+            revisions = repo.history(self.snippet_id)
+        self.newest = revisions[0].number if revisions else None
+        options = [
+            Option(
+                f"#{revision.number:<4} {revision.created_at:%Y-%m-%d %H:%M}",
+                id=f"revision_{revision.number}",
+            )
+            for revision in revisions
+        ]
+        if not options:
+            options = [Option("No earlier versions", disabled=True)]
+        yield Vertical(
+            Static(f"[bold cyan]History of '{self.title}' (ID: {self.snippet_id})[/]"),
+            Horizontal(
+                OptionList(*options, id="revisions"),
+                VerticalScroll(Static(id="diff_view"), id="diff_scroll"),
+                id="history_row",
+            ),
+        )
+
+    @on(OptionList.OptionHighlighted, "#revisions")
+    def show_diff(self, event: OptionList.OptionHighlighted) -> None:
+        if event.option.id is None:
+            return
+        number = int(event.option.id.removeprefix("revision_"))
+        with open_repo() as repo:
+            old = repo.revision_code(self.snippet_id, number)
+            # Newest revision is compared with the current code
+            if number == self.newest:
+                new = repo.get(self.snippet_id, with_body=True).code
+                label = "current"
+            else:
+                new = repo.revision_code(self.snippet_id, number + 1)
+                label = f"#{number + 1}"
+        diff = "".join(
+            difflib.unified_diff(
+                old.splitlines(keepends=True),
+                new.splitlines(keepends=True),
+                fromfile=f"#{number}",
+                tofile=label,
+            )
+        )
+        self.query_one("#diff_view", Static).update(
+            Syntax(diff or "(no changes)", "diff", theme=highlight.code_theme())
+        )
+
+
+def _screen_name(screen) -> str:
+    # The default screen is a plain Screen holding the main view
+    name = type(screen).__name__
+    return "Snipster" if name == "Screen" else name
+
 
 class Snipster(App):
     CSS = """
@@ -126,11 +345,113 @@ class Snipster(App):
     #main_menu {
         height: 3;
     }
+
+    #filter_chips {
+        height: 1;
+    }
+
+    #filter_chips Button {
+        margin-right: 1;
+    }
+
+    #chip_tags {
+        width: 30;
+        margin-right: 1;
+    }
     """
     show_add_inputs = reactive(False)
     show_delete_inputs = reactive(False)
     show_edit_inputs = reactive(False)
 
+    # List view state, applied in SQL by DBSnippetRepo.list. Most frecent
+    # first unless a header was clicked
+    list_sort = DEFAULT_SORT
+    list_descending = True
+    list_favorites_only = False
+    list_language: Language | None = None
+    list_tags: tuple[str, ...] = ()
+    list_match_all_tags = False
+    list_show_trash = False
+    list_most_used = False
+
+    def __init__(self, *args, memory_report: MemoryReport | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Table rows and the caches below share one budget, see memory.py
+        self.memory_budget = MemoryBudget()
+        # snippet id -> snippet with body / its highlighted syntax
+        self._prefetched = LRUCache(self.memory_budget, "snippets", PREFETCH_CACHE_SIZE)
+        self._highlighted = LRUCache(
+            self.memory_budget, "highlight", PREFETCH_CACHE_SIZE
+        )
+        self.memory_report = memory_report
+        # Opens and copies, written every FLUSH_INTERVAL and on exit
+        self.usage = UsageBuffer()
+        # One write at a time, a flush waits for the one in flight
+        self._usage_lock = threading.Lock()
+        self._prefetch_timer = None
+        # Beim ersten Aufruf geladen und einmal abgeglichen, danach von
+        # den Schreibzugriffen dieser App nachgeführt
+        self.related_index: RelatedIndex | None = None
+        self._related_lock = threading.Lock()
+        # Edit form: loaded snippet and its field values at load time
+        self._edit_snippet_id: int | None = None
+        self._edit_original: dict = {}
+
+    # Allocations for --memory-report are booked per active screen
+
+    def push_screen(self, screen, *args, **kwargs):
+        if self.memory_report is not None:
+            self.memory_report.switch(type(screen).__name__)
+        return super().push_screen(screen, *args, **kwargs)
+
+    def pop_screen(self):
+        result = super().pop_screen()
+        if self.memory_report is not None:
+            self.memory_report.switch(_screen_name(self.screen))
+        return result
+
+    def on_ready(self) -> None:
+        # The main menu is up, load lexers and theme and open connections
+        # while the user looks
+        self.warm_up_highlighting()
+        self.warm_up_pool()
+        self.set_interval(FLUSH_INTERVAL, self.flush_usage)
+
+    def on_unmount(self) -> None:
+        # Whatever the timer has not written yet
+        self.write_usage()
+
+    @work(thread=True, exclusive=True, group="usage")
+    def flush_usage(self) -> None:
+        self.write_usage()
+
+    def write_usage(self) -> None:
+        if not self.usage:
+            return
+        try:
+            with self._usage_lock, open_repo() as repo:
+                self.usage.flush(repo)
+        except (SQLAlchemyError, OSError, DaemonError, LibraryNotSetUpError) as e:
+            # Counts stay buffered, the next flush retries
+            self.log.warning(f"Usage counts not written: {e}")
+
+    @work(thread=True, group="warm_up")
+    def warm_up_highlighting(self) -> None:
+        highlight.warm_up()
+
+    @work(thread=True, group="warm_up")
+    def warm_up_pool(self) -> None:
+        # The daemon and the federation manage their own connections
+        if LIBRARIES_MOD or client.SOCKET_PATH.exists():
+            return
+        try:
+            with session_scope(get_session) as session:
+                engine = session.get_bind()
+            warm_pool(engine)
+        except (SQLAlchemyError, OSError, LibraryNotSetUpError) as e:
+            # Not configured yet or unreachable, the first action will tell
+            self.log.warning(f"Connection pool not warmed up: {e}")
+
     async def _auto_init_config(self) -> None:
         """Async Auto-Config Start (Thread-sicher)"""
         await self.call_later(self.init_config_tui)
@@ -204,6 +525,10 @@ class Snipster(App):
                 code_area,
                 Static("Description:"),
                 Input(placeholder="Description", id="edit_desc", disabled=True),
+                Static("Tags:"),
+                Input(
+                    placeholder="Tags (comma separated)", id="edit_tags", disabled=True
+                ),
                 Static("Language:"),
                 OptionList(
                     *[
@@ -230,11 +555,12 @@ class Snipster(App):
             self.show_edit_inputs = False
 
     async def toggle_favorite(self, snippet_id: int) -> None:
-        with get_session() as session:
-            snippet = session.get(Snippet, snippet_id)
-            if snippet:
-                snippet.favorite = not snippet.favorite
-                session.commit()
+        with open_repo() as repo:
+            snippet = repo.get(snippet_id, with_body=False)
+            if snippet and snippet.favorite:
+                repo.favorite_off(snippet_id)
+            elif snippet:
+                repo.favorite_on(snippet_id)
 
         content = self.query_one("#content_area")
         content.remove_children()  # ← NEU!
@@ -260,14 +586,32 @@ class Snipster(App):
         await self.delete_selected_snippet(snippet_id)
 
     async def delete_selected_snippet(self, snippet_id: int) -> None:
-        with get_session() as session:
-            repo = DBSnippetRepo(session)
+        if self.list_show_trash:
+            self.notify("Already in the trash, U restores it", severity="warning")
+            return
+        with open_repo() as repo:
             repo.delete(snippet_id)
+            self.reindex_related(repo, snippet_id)
 
         content = self.query_one("#content_area")
         content.remove_children()  # ← NEU!
         await self.list_snippets()
-        self.query_one("#status", Static).update(f"🗑️ Snippet {snippet_id} deleted!")
+        self.query_one("#status", Static).update(
+            f"🗑️ Snippet {snippet_id} moved to trash!"
+        )
+
+    async def restore_selected(self) -> None:
+        table = self.query_one("#snippet_table", DataTable)
+        if not self.list_show_trash or table.cursor_coordinate is None:
+            self.notify("Select a snippet in the trash first", severity="warning")
+            return
+        row_key, _ = table.coordinate_to_cell_key(table.cursor_coordinate)
+        snippet_id = row_snippet_id(row_key)
+        with open_repo() as repo:
+            repo.restore(snippet_id)
+            self.reindex_related(repo, snippet_id)
+        await self.list_snippets()
+        self.query_one("#status", Static).update(f"♻️ Snippet {snippet_id} restored!")
 
     async def refresh_list(self) -> None:
         """Liste neu laden (Ctrl+R)"""
@@ -280,9 +624,13 @@ class Snipster(App):
         ("f", "toggle_fav_selected", "Toggle Favorite"),
         ("d", "delete_selected", "Delete Selected"),
         ("e", "edit_selected", "Edit Selected"),
+        ("u", "restore_selected", "Restore Selected"),
         ("ctrl+r", "refresh_list", "Refresh List"),
     ]
 
+    async def action_restore_selected(self) -> None:
+        await self.restore_selected()
+
     async def action_toggle_fav_selected(self) -> None:
         await self.toggle_fav_selected()
 
@@ -321,6 +669,8 @@ class Snipster(App):
             code,
             Static("Beschreibung:"),
             Input(placeholder="Description", id="description"),
+            Static("Tags:"),
+            Input(placeholder="Tags (comma separated)", id="tags"),
             Static("Sprache:"),
             OptionList(
                 Option("Python", id="lang_python"),
@@ -349,6 +699,7 @@ class Snipster(App):
         title = title_input.value
         code = code_input.text
         description = description_input.value
+        tags = self.query_one("#tags", Input).value
 
         lang_list = self.query_one("#language_select", OptionList)
         language_str = "Python"  # Fallback
@@ -357,8 +708,6 @@ class Snipster(App):
 
         language_enum = Language[language_str.lower()]
 
-        session = get_session()
-        repo = DBSnippetRepo(session)
         snippet = Snippet(
             title=title,
             code=code,
@@ -366,10 +715,15 @@ class Snipster(App):
             language=language_enum,
             favorite=False,
         )
-        repo.add(snippet)
+        with open_repo() as repo:
+            repo.add(snippet)
+            snippet_id = snippet.id
+            self.reindex_related(repo, snippet_id)
+            if tags.strip():
+                repo.set_tags(snippet_id, tags.split(","))
 
         status = self.query_one("#status", Static)
-        status.update(f"✅ Snippet '{title}' added (ID: {snippet.id})")
+        status.update(f"✅ Snippet '{title}' added (ID: {snippet_id})")
 
         await self.list_snippets()  # ← Direkt Liste + Form weg!
 
@@ -381,21 +735,97 @@ class Snipster(App):
                 await table.remove()
 
         content = self.query_one("#content_area")
-        content.remove_children()
+        await content.remove_children()
 
-        # 2. Neue Tabelle
+        # 2. Filter-Chips + neue Tabelle
+        language = self.list_language.name if self.list_language else "all"
+        chips = [
+            Button(
+                "⭐ Favorites" if self.list_favorites_only else "☆ Favorites",
+                id="chip_favorites",
+                variant="warning" if self.list_favorites_only else "default",
+                compact=True,
+            ),
+            Button(
+                f"Language: {language}",
+                id="chip_language",
+                variant="primary" if self.list_language else "default",
+                compact=True,
+            ),
+            Input(
+                ", ".join(self.list_tags),
+                placeholder="Tags (Enter to filter)",
+                id="chip_tags",
+                compact=True,
+            ),
+            Button(
+                "Tags: all" if self.list_match_all_tags else "Tags: any",
+                id="chip_tag_mode",
+                compact=True,
+            ),
+            Button(
+                "🔥 Most used",
+                id="chip_most_used",
+                variant="success" if self.list_most_used else "default",
+                compact=True,
+            ),
+            Button(
+                "🗑️ Trash",
+                id="chip_trash",
+                variant="error" if self.list_show_trash else "default",
+                compact=True,
+            ),
+        ]
+        if self.list_show_trash:
+            chips.append(
+                Button("Empty Trash", id="empty_trash", variant="error", compact=True)
+            )
         table = DataTable(id="snippet_table")
-        await content.mount(table)
-
-        # 3. Daten laden
-        snippets = DBSnippetRepo(get_session()).list()
-        table.add_columns("ID", "Title", "Code", "Description", "Language", "Favorite")
-
+        await content.mount(Horizontal(*chips, id="filter_chips"), table)
+
+        # Every write ends up here, so prefetched rows may be stale now
+        self.workers.cancel_group(self, "prefetch")
+        self._prefetched.clear()
+        self._highlighted.clear()
+
+        # 3. Daten laden (Filter + Sortierung macht die DB)
+        # The code preview is stored with the row, the body stays unloaded
+        uses = {}
+        if self.list_most_used and self.usage:
+            # Counts still buffered belong in the ranking, written in the
+            # usage worker so the UI stays responsive meanwhile
+            await self.flush_usage().wait()
+        with open_repo() as repo:
+            if self.list_show_trash:
+                snippets = repo.list_trash()
+            elif self.list_most_used:
+                ranked = repo.most_used()
+                snippets = [snippet for snippet, _ in ranked]
+                uses = {snippet.id: count for snippet, count in ranked}
+            else:
+                snippets = repo.list(
+                    favorite=self.list_favorites_only or None,
+                    language=self.list_language,
+                    order_by=self.list_sort,
+                    descending=self.list_descending,
+                    tags=self.list_tags,
+                    match_all_tags=self.list_match_all_tags,
+                )
+            tags = repo.get_tags([snippet.id for snippet in snippets])
+            if isinstance(repo, FederatedSnippetRepository):
+                labels = {s.id: repo.qualified_id(s.id) for s in snippets}
+                unavailable = repo.unavailable
+            else:
+                labels, unavailable = {}, []
+        columns = LIST_COLUMNS + [("uses", "Uses")] if uses else LIST_COLUMNS
+        for key, label in columns:
+            if key == self.list_sort:
+                label += " ▼" if self.list_descending else " ▲"
+            table.add_column(label, key=key)
+
+        table_bytes = 0
         for snippet in snippets:
             favorite_icon = "⭐" if snippet.favorite else ""
-            code_preview = (
-                snippet.code[:100] + "..." if len(snippet.code) > 100 else snippet.code
-            )
             title_short = (
                 snippet.title[:25] + "..." if len(snippet.title) > 25 else snippet.title
             )
@@ -405,15 +835,22 @@ class Snipster(App):
                 else snippet.description
             )
 
-            table.add_row(
-                str(snippet.id),
+            row = (
+                labels.get(snippet.id, str(snippet.id)),
                 title_short,
-                code_preview,
+                snippet.code_preview,
                 desc_short,
+                str(snippet.line_count),
+                format_size(snippet.byte_size),
                 snippet.language.value,
                 favorite_icon,
-                key=str(snippet.id),
+                ", ".join(tags[snippet.id]),
             )
+            if uses:
+                row += (str(uses[snippet.id]),)
+            table.add_row(*row, key=str(snippet.id))
+            table_bytes += approx_size(row)
+        self.memory_budget.track("table", table_bytes)
 
         # 4. Fokus + Status
         table.cursor_type = "row"
@@ -422,24 +859,190 @@ class Snipster(App):
         self.call_later(table.focus)
 
         status = self.query_one("#status", Static)
+        if unavailable:
+            status.update(f"[red]⚠️ Not answering: {', '.join(unavailable)}[/]")
+            return
+        if self.list_show_trash:
+            status.update(
+                "↑↓=Nav, [green]U=Restore[/], [red]Empty Trash=delete for good[/]"
+            )
+            return
         status.update(
             "↑↓=Nav, Enter=Show Code, [yellow]F=Favorite[/], [red]D=Delete[/], [orange]E=Edit[/], [green]Ctrl+R=Refresh[/]"
         )
 
+    @on(DataTable.HeaderSelected, "#snippet_table")
+    async def sort_by_header(self, event: DataTable.HeaderSelected) -> None:
+        """Header-Klick sortiert, zweiter Klick dreht die Richtung, dritter
+        stellt die Frecency-Reihenfolge wieder her"""
+        column = event.column_key.value
+        if column not in SORT_COLUMNS:
+            return
+        if column == self.list_sort and self.list_descending:
+            self.list_sort = DEFAULT_SORT
+        elif column == self.list_sort:
+            self.list_descending = True
+        else:
+            self.list_sort = column
+            self.list_descending = False
+        await self.list_snippets()
+
+    @on(Button.Pressed, "#chip_favorites")
+    async def toggle_favorites_chip(self) -> None:
+        self.list_favorites_only = not self.list_favorites_only
+        await self.list_snippets()
+
+    @on(Button.Pressed, "#chip_language")
+    async def cycle_language_chip(self) -> None:
+        languages = [None, *Language]
+        index = languages.index(self.list_language)
+        self.list_language = languages[(index + 1) % len(languages)]
+        await self.list_snippets()
+
+    @on(Input.Submitted, "#chip_tags")
+    async def filter_by_tags(self, event: Input.Submitted) -> None:
+        self.list_tags = tuple(normalize_tags(event.value.split(",")))
+        await self.list_snippets()
+
+    @on(Button.Pressed, "#chip_tag_mode")
+    async def toggle_tag_mode_chip(self) -> None:
+        self.list_match_all_tags = not self.list_match_all_tags
+        await self.list_snippets()
+
+    @on(Button.Pressed, "#chip_most_used")
+    async def toggle_most_used_chip(self) -> None:
+        self.list_most_used = not self.list_most_used
+        self.list_show_trash = False
+        await self.list_snippets()
+
+    @on(Button.Pressed, "#chip_trash")
+    async def toggle_trash_chip(self) -> None:
+        self.list_show_trash = not self.list_show_trash
+        self.list_most_used = False
+        await self.list_snippets()
+
+    @on(Button.Pressed, "#empty_trash")
+    def empty_trash(self) -> None:
+        self.query_one("#status", Static).update("Emptying trash…")
+        self.purge_trash()
+
+    @work(thread=True, exclusive=True, group="purge")
+    def purge_trash(self) -> None:
+        """Hard-delete the trash batch by batch, off the UI thread"""
+        with open_repo() as repo:
+            count = repo.purge(batch_size=PURGE_BATCH_SIZE)
+        self.call_from_thread(self._trash_purged, count)
+
+    async def _trash_purged(self, count: int) -> None:
+        if self.list_show_trash:
+            await self.list_snippets()
+        self.query_one("#status", Static).update(f"🗑️ {count} snippets purged")
+
+    @on(DataTable.RowHighlighted, "#snippet_table")
+    def schedule_prefetch(self, event: DataTable.RowHighlighted) -> None:
+        """Restart the prefetch countdown whenever the cursor moves"""
+        if self._prefetch_timer is not None:
+            self._prefetch_timer.stop()
+        self.workers.cancel_group(self, "prefetch")
+        table = event.data_table
+        row = event.cursor_row
+        self._prefetch_timer = self.set_timer(
+            PREFETCH_DELAY, lambda: self.prefetch_around(table, row)
+        )
+
+    def prefetch_around(self, table: DataTable, row: int) -> None:
+        # Cursor row first, then its neighbours
+        rows = [row]
+        for distance in range(1, PREFETCH_NEIGHBOURS + 1):
+            rows += [row + distance, row - distance]
+        snippet_ids = []
+        for index in rows:
+            if 0 <= index < table.row_count:
+                row_key, _ = table.coordinate_to_cell_key(Coordinate(index, 0))
+                if row_snippet_id(row_key) not in self._prefetched:
+                    snippet_ids.append(row_snippet_id(row_key))
+        if snippet_ids:
+            self.prefetch_snippets(snippet_ids)
+
+    @work(thread=True, exclusive=True, group="prefetch")
+    def prefetch_snippets(self, snippet_ids: list[int]) -> None:
+        worker = get_current_worker()
+        with open_repo() as repo:
+            for snippet_id in snippet_ids:
+                if worker.is_cancelled:
+                    return
+                snippet = repo.get(snippet_id, with_body=True)
+                if snippet is None:
+                    continue
+                syntax = code_syntax(snippet.code, snippet.language.value)
+                syntax.prehighlight()
+                if not worker.is_cancelled:
+                    self.call_from_thread(self._store_prefetched, snippet, syntax)
+
+    def _store_prefetched(self, snippet: Snippet, syntax: PrehighlightedSyntax):
+        self._prefetched.put(snippet.id, snippet)
+        self._highlighted.put(snippet.id, syntax)
+
+    def reindex_related(self, repo, snippet_id: int) -> None:
+        """Schreibzugriff im Related-Index nachführen (statt neuem Abgleich)"""
+        # Der Daemon führt seinen Index selbst
+        if isinstance(repo, client.RemoteSnippetRepo):
+            return
+        with self._related_lock:
+            if self.related_index is not None:
+                self.related_index.refresh(repo, snippet_id)
+
+    @work(thread=True, exclusive=True, group="related")
+    def load_related(self, screen: CodeViewScreen) -> None:
+        """Fill the related panel of screen from the TF-IDF index"""
+        with open_repo() as repo:
+            # Der Daemon führt den Index selbst
+            if isinstance(repo, client.RemoteSnippetRepo):
+                matches = repo.related(screen.snippet_id)
+                rows = [(s.id, s.title, score) for s, score in matches]
+                self.call_from_thread(screen.show_related, rows)
+                return
+            with self._related_lock:
+                if self.related_index is None:
+                    index = RelatedIndex(related.INDEX_DIR)
+                    # Änderungen anderer Prozesse seit dem letzten Lauf
+                    index.sync(repo)
+                    self.related_index = index
+                matches = self.related_index.related(screen.snippet_id)
+            rows = []
+            for snippet_id, score in matches:
+                snippet = repo.get(snippet_id, with_body=False)
+                if snippet is not None:
+                    rows.append((snippet_id, snippet.title, score))
+        self.call_from_thread(screen.show_related, rows)
+
     @on(DataTable.RowSelected)
     async def on_row_action(self, event: DataTable.RowSelected) -> None:
         # Direkt aus Event lesen - KEIN table.query nötig!
         snippet_id = int(event.row_key.value) if event.row_key else None
-
         if snippet_id:
-            with get_session() as session:
-                snippet = session.get(Snippet, snippet_id)
-            if snippet:
-                await self.push_screen(
-                    CodeViewScreen(
-                        snippet.id, snippet.code, snippet.title, snippet.language.value
-                    )
+            await self.open_snippet(snippet_id)
+
+    async def open_snippet(self, snippet_id: int) -> None:
+        if snippet_id in self._prefetched:
+            snippet = self._prefetched.get(snippet_id)
+            # May have been trimmed on its own, CodeViewScreen highlights then
+            syntax = self._highlighted.get(snippet_id)
+        else:
+            with open_repo() as repo:
+                snippet = repo.get(snippet_id, with_body=True)
+            syntax = None
+        if snippet:
+            self.usage.opened(snippet.id)
+            await self.push_screen(
+                CodeViewScreen(
+                    snippet.id,
+                    snippet.code,
+                    snippet.title,
+                    snippet.language.value,
+                    syntax,
                 )
+            )
 
     @on(Button.Pressed, "#delete")
     async def delete_snippet(self) -> None:
@@ -469,9 +1072,8 @@ class Snipster(App):
                 status.update("Invalid snippet ID entered. Please enter a number.")
                 return
 
-            with get_session() as session:
-                repo = DBSnippetRepo(session)
-                snippet = session.get(Snippet, snippet_id)
+            with open_repo() as repo:
+                snippet = repo.get(snippet_id, with_body=False)
                 status = self.query_one("#status", Static)
 
                 if snippet is None:
@@ -479,7 +1081,8 @@ class Snipster(App):
                     return
 
                 repo.delete(snippet_id)
-                status.update(f"Snippet with ID {snippet_id} deleted.")
+                self.reindex_related(repo, snippet_id)
+                status.update(f"Snippet with ID {snippet_id} moved to trash.")
 
             content.remove_children()
             self.show_delete_inputs = False
@@ -502,15 +1105,15 @@ class Snipster(App):
 
         # 3. Löschen
         try:
-            with get_session() as session:
-                repo = DBSnippetRepo(session)
-                snippet = session.get(Snippet, snippet_id)
+            with open_repo() as repo:
+                snippet = repo.get(snippet_id, with_body=False)
                 if snippet is None:
                     raise SnippetNotFoundError(
                         f"Snippet with ID {snippet_id} not found."
                     )
                 repo.delete(snippet_id)
-            status.update(f"✅ Snippet ID {snippet_id} deleted!")
+                self.reindex_related(repo, snippet_id)
+            status.update(f"✅ Snippet ID {snippet_id} moved to trash!")
         except SnippetNotFoundError as e:
             status.update(str(e))
 
@@ -524,19 +1127,20 @@ class Snipster(App):
             self.query_one("#status", Static).update("❌ Invalid ID!")
             return
 
-        with get_session() as session:
-            repo = DBSnippetRepo(session)
-            snippet = repo.get(snippet_id)
+        with open_repo() as repo:
+            snippet = repo.get(snippet_id, with_body=True)
             if not snippet:
                 self.query_one("#status", Static).update(
                     f"❌ Snippet {snippet_id} not found!"
                 )
                 return
+            tags = repo.get_tags([snippet_id])[snippet_id]
 
         # 🔥 TEXTAREA.text statt Input.value!
         self.query_one("#edit_title", Input).value = snippet.title
         self.query_one("#edit_code", TextArea).text = snippet.code  # ← .text!
         self.query_one("#edit_desc", Input).value = snippet.description
+        self.query_one("#edit_tags", Input).value = ", ".join(tags)
 
         # Language setzen
         lang_list = self.query_one("#edit_language", OptionList)
@@ -546,23 +1150,21 @@ class Snipster(App):
                 break
 
         # Aktivieren
-        for widget_id in ["edit_title", "edit_code", "edit_desc"]:
+        for widget_id in ["edit_title", "edit_code", "edit_desc", "edit_tags"]:
             self.query_one(
                 f"#{widget_id}", Input | TextArea
             ).disabled = False  # ← Auch TextArea!
         self.query_one("#edit_language", OptionList).disabled = False
         self.query_one("#update_snippet", Button).disabled = False
 
+        # Stand beim Laden merken, Update schickt nur die Differenz
+        self._edit_snippet_id = snippet_id
+        self._edit_original = self._edit_form_values()
+
         self.query_one("#status", Static).update(f"✅ Loaded '{snippet.title}'")
         self.query_one("#edit_code", TextArea).focus()  # ← Code editierbar!
 
-    @on(Button.Pressed, "#update_snippet")
-    async def update_snippet(self) -> None:
-        snippet_id = int(self.query_one("#edit_id", Input).value)
-        title = self.query_one("#edit_title", Input).value
-        code = self.query_one("#edit_code", TextArea).text  # ← .text!
-        desc = self.query_one("#edit_desc", Input).value
-
+    def _edit_form_values(self) -> dict:
         lang_list = self.query_one("#edit_language", OptionList)
         index = lang_list.highlighted
         lang_option = lang_list.options[index] if index is not None else None
@@ -571,21 +1173,40 @@ class Snipster(App):
             if lang_option
             else Language.python
         )
+        return {
+            "title": self.query_one("#edit_title", Input).value,
+            "code": self.query_one("#edit_code", TextArea).text,  # ← .text!
+            "description": self.query_one("#edit_desc", Input).value,
+            "language": language,
+            "tags": normalize_tags(
+                self.query_one("#edit_tags", Input).value.split(",")
+            ),
+        }
 
-        # Update-Snippet
-        update_snippet = Snippet(
-            id=snippet_id,  # ID bleibt!
-            title=title,
-            code=code,
-            description=desc,
-            language=language,
-        )
-
-        with get_session() as session:
-            repo = DBSnippetRepo(session)
-            repo.update(update_snippet)
+    @on(Button.Pressed, "#update_snippet")
+    async def update_snippet(self) -> None:
+        snippet_id = self._edit_snippet_id
+        if snippet_id is None:
+            return
+        # Nur geänderte Felder schreiben (favorite & Co. bleiben unangetastet)
+        changed = {
+            key: value
+            for key, value in self._edit_form_values().items()
+            if self._edit_original.get(key) != value
+        }
+        tags = changed.pop("tags", None)
+
+        if changed or tags is not None:
+            with open_repo() as repo:
+                repo.patch(snippet_id, **changed)
+                self.reindex_related(repo, snippet_id)
+                if tags is not None:
+                    repo.set_tags(snippet_id, tags)
+            message = f"✅ Snippet {snippet_id} updated!"
+        else:
+            message = f"Snippet {snippet_id} unchanged"
 
-        self.query_one("#status", Static).update(f"✅ Snippet {snippet_id} updated!")
+        self.query_one("#status", Static).update(message)
         self.show_edit_inputs = False
 
         content = self.query_one("#content_area")
@@ -645,7 +1266,13 @@ class Snipster(App):
             await content.mount(Input(placeholder="DB_HOST", id="host", disabled=True))
             await content.mount(Input(placeholder="DB_PORT", id="port", disabled=True))
             await content.mount(Input(placeholder="DB_NAME", id="name", disabled=True))
-            await content.mount(Button("Save", id="save"))
+            await content.mount(
+                Horizontal(
+                    Button("Save", id="save"),
+                    Button("Test connection", id="test_connection"),
+                    id="config_buttons",
+                )
+            )
 
     def show_success_message(self) -> None:
         """Zeigt Erfolgsnachricht nach Speichern"""
@@ -656,6 +1283,54 @@ class Snipster(App):
         """Schedule closing config form after delay"""
         self.call_later(lambda s=self: self.close_config_form(), 3.0)
 
+    def config_database_url(self) -> str | None:
+        """DB-URL aus dem Config-Formular, None (mit Status) bei Fehlern"""
+        status = self.query_one("#status", Static)
+        option_list = self.query_one("#db_options", OptionList)
+        highlighted_index = option_list.highlighted
+        use_default_db = (highlighted_index is not None) and (highlighted_index == 0)
+
+        if use_default_db:
+            status.update("[green]Using Default SQLite DB[/]")
+            return f"sqlite:///{DEFAULT_DB_PATH}"
+        # Postgres-Werte aus Inputs lesen
+        try:
+            db_user = self.query_one("#user", Input).value
+            db_pass = self.query_one("#password", Input).value
+            db_host = self.query_one("#host", Input).value
+            db_port = self.query_one("#port", Input).value
+            db_name = self.query_one("#name", Input).value
+        except Exception as e:
+            status.update(f"[red]Error reading inputs: {e}[/]")
+            return None
+        if not all([db_user, db_pass, db_host, db_port, db_name]):
+            status.update("[red]Please fill all Postgres fields[/]")
+            return None
+        status.update("[green]Using custom Postgres DB[/]")
+        return f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+
+    @on(Button.Pressed, "#test_connection")
+    def test_connection(self) -> None:
+        database_url = self.config_database_url()
+        if database_url is not None:
+            self.query_one("#status", Static).update("⏳ Testing connection…")
+            self.probe_connection(database_url)
+
+    @work(thread=True, exclusive=True, group="probe")
+    def probe_connection(self, database_url: str) -> None:
+        try:
+            connect_time, round_trip = probe(database_url)
+        except (SQLAlchemyError, OSError, ImportError) as e:
+            # ImportError: the driver for the URL is not installed
+            message = f"[red]❌ Connection failed: {e}[/]"
+        else:
+            message = (
+                f"[green]✅ Connected in {connect_time * 1000:.0f} ms, "
+                f"round trip {round_trip * 1000:.1f} ms[/]"
+            )
+        status = self.query_one("#status", Static)
+        self.call_from_thread(status.update, message)
+
     @on(Button.Pressed, "#save")
     async def save_config(self) -> None:
         """Save-Handler mit Directory-Setup + Config-Writing"""
@@ -675,43 +1350,22 @@ class Snipster(App):
             return
 
         # 2. DB-URL basierend auf Auswahl
-        option_list = self.query_one("#db_options", OptionList)
-        highlighted_index = option_list.highlighted
-        use_default_db = (highlighted_index is not None) and (highlighted_index == 0)
-
-        if use_default_db:
-            database_url = f"sqlite:///{DEFAULT_DB_PATH}"
-            status.update("[green]Using Default SQLite DB[/]")
-        else:
-            # Postgres-Werte aus Inputs lesen
-            try:
-                db_user = self.query_one("#user", Input).value
-                db_pass = self.query_one("#password", Input).value
-                db_host = self.query_one("#host", Input).value
-                db_port = self.query_one("#port", Input).value
-                db_name = self.query_one("#name", Input).value
-
-                if not all([db_user, db_pass, db_host, db_port, db_name]):
-                    status.update("[red]Please fill all Postgres fields[/]")
-                    return
-
-                database_url = (
-                    f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
-                )
-                status.update("[green]Using custom Postgres DB[/]")
-            except Exception as e:
-                status.update(f"[red]Error reading inputs: {e}[/]")
-                return
+        database_url = self.config_database_url()
+        if database_url is None:
+            return
 
         # 3. Config-File schreiben
         try:
             content = [f"DATABASE_URL={database_url}"]
             ENV_PATH.write_text("\n".join(content) + "\n")
             status.update(f"[green]✅ Configuration saved at: {ENV_PATH}[/]")
-            from snipster_tui.models import SQLModel
+            from snipster_tui import schema
 
             engine = create_engine(database_url, echo=False)
-            SQLModel.metadata.create_all(engine)
+            try:
+                schema.install(engine)
+            finally:
+                engine.dispose()
         except Exception as e:
             status.update(f"[red]Error writing config: {e}[/]")
             return
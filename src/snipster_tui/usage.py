@@ -0,0 +1,100 @@
+import threading
+from datetime import UTC, datetime, timedelta
+
+from decouple import config
+
+from snipster_tui.models import UsageCount
+from snipster_tui.repo import SnippetRepository
+
+# Off: opens and copies are not counted at all
+TRACK_USAGE = config("SNIPSTER_TRACK_USAGE", default=True, cast=bool)
+
+# Seconds between two writes of the buffered counts
+FLUSH_INTERVAL = config("SNIPSTER_USAGE_FLUSH_SECONDS", default=30, cast=float)
+
+# Frecency: every use counts 1, halving every FRECENCY_HALF_LIFE. Instead of
+# decaying all scores as time passes, a use at time t adds
+# 2 ** ((t - FRECENCY_EPOCH) / half life). Decaying to now would divide every
+# score by the same factor, so the stored sums already rank correctly and
+# only grow on use; decayed() turns one into the score as of now.
+# At a 14 day half life the sums stay within float range for ~39 years.
+FRECENCY_HALF_LIFE = timedelta(
+    days=config("SNIPSTER_FRECENCY_HALF_LIFE_DAYS", default=14, cast=float)
+)
+FRECENCY_EPOCH = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def frecency_weight(used_at: datetime) -> float:
+    return 2.0 ** ((used_at - FRECENCY_EPOCH) / FRECENCY_HALF_LIFE)
+
+
+def decayed(frecency: float, now: datetime | None = None) -> float:
+    """Stored frecency as of now: uses weighted by how recent they are"""
+    return frecency / frecency_weight(now or _now())
+
+
+class UsageBuffer:
+    """Opens and copies counted in memory, written in one batch by flush()
+
+    Counting never touches the database, so it is cheap enough for the paths
+    showing a snippet. Thread-safe, flush() may run in a worker.
+    """
+
+    def __init__(self, enabled: bool | None = None):
+        self.enabled = TRACK_USAGE if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._pending: dict[int, UsageCount] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def opened(self, snippet_id: int) -> None:
+        now = _now()
+        self._add(snippet_id, UsageCount(1, 0, now, frecency_weight(now)))
+
+    def copied(self, snippet_id: int) -> None:
+        now = _now()
+        self._add(snippet_id, UsageCount(0, 1, now, frecency_weight(now)))
+
+    def pending(self) -> dict[int, UsageCount]:
+        with self._lock:
+            return dict(self._pending)
+
+    def _add(self, snippet_id: int, count: UsageCount) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._merge(snippet_id, count)
+
+    def _merge(self, snippet_id: int, count: UsageCount) -> None:
+        old = self._pending.get(snippet_id)
+        if old is not None:
+            count = UsageCount(
+                old.opens + count.opens,
+                old.copies + count.copies,
+                max(filter(None, (old.last_used, count.last_used)), default=None),
+                old.frecency + count.frecency,
+            )
+        self._pending[snippet_id] = count
+
+    def flush(self, repo: SnippetRepository) -> int:
+        """Write and forget the counts so far, returns for how many snippets
+
+        If the write fails the counts stay buffered for the next attempt.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            repo.record_usage(pending)
+        except Exception:
+            with self._lock:
+                for snippet_id, count in pending.items():
+                    self._merge(snippet_id, count)
+            raise
+        return len(pending)
+
+
+def _now() -> datetime:
+    return datetime.now(UTC)
@@ -0,0 +1,37 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+from snipster_tui import client, db, related, tui
+from snipster_tui.repo import DBSnippetRepo
+
+
+@pytest.fixture(autouse=True)
+def isolated_environment(monkeypatch, tmp_path):
+    """Kein laufender Daemon, keine Bibliotheken und kein Related-Index aus
+    der Umgebung des Entwicklers"""
+    monkeypatch.setattr(client, "SOCKET_PATH", tmp_path / "snipster.sock")
+    monkeypatch.setattr(db, "LIBRARIES_MOD", "")
+    monkeypatch.setattr(tui, "LIBRARIES_MOD", "")
+    monkeypatch.setattr(related, "INDEX_DIR", tmp_path / "related")
+
+
+@pytest.fixture
+def tui_library(monkeypatch):
+    """Fabrik: In-Memory-Bibliothek mit den übergebenen Snippets, die die TUI
+    über get_session benutzt. Gibt die Engine zurück."""
+
+    def create(snippets=()):
+        engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        SQLModel.metadata.create_all(engine)
+        repo = DBSnippetRepo(Session(engine))
+        for snippet in snippets:
+            repo.add(snippet)
+        monkeypatch.setattr(tui, "get_session", lambda: Session(engine))
+        return engine
+
+    return create
@@ -0,0 +1,173 @@
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import update
+from sqlmodel import Session, SQLModel, col, create_engine, delete
+from sqlmodel.pool import StaticPool
+
+from snipster_tui import cli, db
+from snipster_tui.models import Snippet, SnippetBand, SnippetSignature
+from snipster_tui.repo import DBSnippetRepo
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr("snipster_tui.db.get_session", lambda: Session(engine))
+    yield engine
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_cli_never_imports_textual():
+    code = (
+        "import sys, snipster_tui.cli, snipster_tui.db, snipster_tui.repo;"
+        "print('textual' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_cli_add_and_get(engine, tmp_path, capsys):
+    source = tmp_path / "hello.rs"
+    source.write_text('fn main() { println!("Hello"); }\n')
+
+    assert cli.main(["add", str(source), "--tag", "Demo"]) == 0
+    snippet_id = int(capsys.readouterr().out)
+
+    assert cli.main(["get", str(snippet_id)]) == 0
+    assert capsys.readouterr().out == 'fn main() { println!("Hello"); }\n'
+
+    assert cli.main(["get", str(snippet_id), "--json"]) == 0
+    data = json.loads(capsys.readouterr().out)
+    assert data["title"] == "hello"
+    assert data["language"] == "rs"
+    assert data["tags"] == ["demo"]
+
+
+def test_cli_leaves_similarity_thresholds_to_the_repo(engine, monkeypatch):
+    thresholds = []
+
+    def similar(self, snippet_id, threshold=None, limit=10):
+        thresholds.append(threshold)
+        return []
+
+    def duplicate_clusters(self, threshold=None):
+        thresholds.append(threshold)
+        return []
+
+    monkeypatch.setattr(DBSnippetRepo, "similar", similar)
+    monkeypatch.setattr(DBSnippetRepo, "duplicate_clusters", duplicate_clusters)
+    assert cli.main(["similar", "1"]) == 0
+    assert cli.main(["duplicates"]) == 0
+    assert cli.main(["duplicates", "--threshold", "0.9"]) == 0
+    assert thresholds == [None, None, 0.9]
+
+
+def test_cli_add_from_stdin(engine, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO("SELECT 1;"))
+
+    assert cli.main(["add", "--title", "One", "--language", "sql"]) == 0
+    snippet_id = int(capsys.readouterr().out)
+
+    cli.main(["get", str(snippet_id)])
+    assert capsys.readouterr().out == "SELECT 1;\n"
+
+
+def test_cli_get_missing(engine, capsys):
+    assert cli.main(["get", "42"]) == 1
+    assert "not found" in capsys.readouterr().err
+
+
+def test_cli_list_and_search(engine, monkeypatch, capsys):
+    for title in ("Hello python", "Goodbye python"):
+        monkeypatch.setattr("sys.stdin", io.StringIO("print()"))
+        cli.main(["add", "--title", title, "--language", "py", "--tag", "demo"])
+    capsys.readouterr()
+
+    assert cli.main(["list"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [
+        "1\t  py\tHello python\t[demo]",
+        "2\t  py\tGoodbye python\t[demo]",
+    ]
+
+    assert cli.main(["search", "Hello", "--json"]) == 0
+    rows = json.loads(capsys.readouterr().out)
+    assert [row["title"] for row in rows] == ["Hello python"]
+
+    assert cli.main(["search", "nothing"]) == 1
+
+
+def test_cli_purge(engine, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO("print()"))
+    cli.main(["add", "--title", "Old"])
+    with Session(engine) as session:
+        DBSnippetRepo(session).delete(1)
+    capsys.readouterr()
+
+    assert cli.main(["purge"]) == 0
+    assert capsys.readouterr().out == "Purged 0 snippets from the trash\n"
+    assert cli.main(["purge", "--all"]) == 0
+    assert capsys.readouterr().out == "Purged 1 snippets from the trash\n"
+
+
+def test_cli_maintain_repairs_derived_data(engine, monkeypatch, capsys):
+    for title in ("Kept", "Drifted", "Trashed"):
+        monkeypatch.setattr("sys.stdin", io.StringIO(f"print({title!r})\n"))
+        cli.main(["add", "--title", title, "--language", "py"])
+    with Session(engine) as session:
+        repo = DBSnippetRepo(session)
+        repo.delete(3)
+        # Left behind, as by a delete that did not finish
+        session.add(SnippetSignature(snippet_id=3, content_hash="", signature=b""))
+        session.exec(
+            update(Snippet).where(col(Snippet.id) == 2).values(code_preview="stale")
+        )
+        session.exec(delete(SnippetBand).where(col(SnippetBand.snippet_id) == 2))
+        session.exec(
+            delete(SnippetSignature).where(col(SnippetSignature.snippet_id) == 2)
+        )
+        session.commit()
+    capsys.readouterr()
+
+    assert cli.main(["maintain", "--workers", "2", "--chunk-size", "1", "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert (report["checked"], report["repaired"], report["reindexed"]) == (2, 1, 1)
+    assert report["orphans"] == 1
+    assert report["workers"] == 2
+    assert [step[0] for step in report["steps"]] == [
+        "integrity_check",
+        "reindex",
+        "analyze",
+        "vacuum",
+    ]
+    assert report["steps"][0][2] == "ok"
+    with Session(engine) as session:
+        assert session.get_one(Snippet, 2).code_preview == "print('Drifted')\n"
+        assert session.get(SnippetSignature, 3) is None
+
+    assert cli.main(["maintain", "--workers", "1", "--skip-vacuum"]) == 0
+    out = capsys.readouterr().out
+    assert "1 workers" in out
+    assert "0 repaired, 0 signatures rebuilt, 0 orphans removed" in out
+    assert "vacuum" not in out
+
+
+def test_cli_asks_for_setup_on_a_fresh_install(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(db, "DATABASE_URL_MOD", f"sqlite:///{tmp_path / 'new.sqlite'}")
+    db.get_engine.cache_clear()
+    try:
+        assert cli.main(["list"]) == 1
+    finally:
+        db.get_engine.cache_clear()
+    error = capsys.readouterr().err
+    assert "save the configuration (Init) first" in error
+    assert "Traceback" not in error
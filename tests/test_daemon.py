@@ -0,0 +1,276 @@
+import json
+import socket
+import stat
+import subprocess
+import sys
+import threading
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlmodel import SQLModel, create_engine
+
+from snipster_tui import cli, client, daemon, related
+from snipster_tui.exceptions import DaemonError, SnippetNotFoundError
+from snipster_tui.models import Language, Snippet, UsageCount
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'daemon.sqlite'}"
+    SQLModel.metadata.create_all(create_engine(database_url))
+    path = tmp_path / "snipster.sock"
+    server = daemon.serve(path, database_url)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def remote(socket_path):
+    with client.connect(socket_path) as remote:
+        yield remote
+
+
+def add_example(remote, title="Hello python", **fields):
+    snippet = Snippet(
+        title=title,
+        code="print('Hello, World!')",
+        description="A simple hello world snippet",
+        **fields,
+    )
+    remote.add(snippet)
+    return snippet
+
+
+def test_connect_without_daemon(tmp_path):
+    assert client.connect(tmp_path / "missing.sock") is None
+
+
+def test_remote_add_and_get(remote):
+    snippet = add_example(remote, language=Language.rust)
+    assert snippet.id == 1
+    assert snippet.content_hash is not None
+
+    loaded = remote.get(1)
+    assert loaded.title == "Hello python"
+    assert loaded.code == "print('Hello, World!')"
+    assert loaded.language == Language.rust
+    assert remote.get(2) is None
+
+
+def test_remote_list_filters_and_tags(remote):
+    add_example(remote, "Hello python")
+    add_example(remote, "Hello rust", language=Language.rust, favorite=True)
+    remote.set_tags(2, ["Demo", "rust"])
+
+    assert [s.title for s in remote.list(favorite=True)] == ["Hello rust"]
+    assert [s.id for s in remote.list(language=Language.python)] == [1]
+    assert [s.id for s in remote.list(tags=["demo"])] == [2]
+    assert [s.id for s in remote.list(order_by="title", descending=True)] == [2, 1]
+    assert remote.get_tags([1, 2]) == {1: [], 2: ["demo", "rust"]}
+    assert [s.title for s in remote.get_many([2, 1])] == ["Hello python", "Hello rust"]
+    assert remote.list_tags() == ["demo", "rust"]
+    assert [s.id for s in remote.search("rust")] == [2]
+
+
+def test_remote_writes(remote):
+    snippet = add_example(remote)
+    remote.favorite_on(snippet.id)
+    assert [s.id for s in remote.list_favorites()] == [snippet.id]
+
+    remote.update(Snippet(id=snippet.id, title="Renamed", code="pass", description=""))
+    assert remote.get(snippet.id).code == "pass"
+
+    remote.delete(snippet.id)
+    with pytest.raises(SnippetNotFoundError):
+        remote.delete(snippet.id)
+    with pytest.raises(ValueError):
+        remote.list(order_by="code")
+
+
+def test_remote_iter_snippets(remote):
+    for number in range(5):
+        add_example(remote, f"Snippet {number}")
+
+    snippets = list(remote.iter_snippets(batch_size=2, with_body=False))
+    assert [s.title for s in snippets] == [f"Snippet {n}" for n in range(5)]
+
+
+def test_remote_pipeline(remote):
+    add_example(remote)
+    results = remote.pipeline(
+        [
+            ("get", {"snippet_id": 1, "with_body": False}),
+            ("list_tags", {}),
+            ("get", {"snippet_id": 7}),
+        ]
+    )
+    assert results[0]["title"] == "Hello python"
+    assert "code" not in results[0]
+    assert results[1:] == [[], None]
+
+
+def test_pipeline_reads_every_reply_before_raising(remote):
+    with pytest.raises(ValueError):
+        remote.pipeline([("list", {"order_by": "nope"}), ("list_tags", {})])
+    # The reply to list_tags was consumed with the failed pipeline
+    assert remote.list_tags() == []
+
+
+def test_unexpected_error_is_logged_and_answered(remote, monkeypatch, caplog):
+    def broken(self):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(daemon.DBSnippetRepo, "list_tags", broken)
+    with pytest.raises(DaemonError, match="broken"):
+        remote.list_tags()
+    record = next(r for r in caplog.records if r.name == "snipster_tui.daemon")
+    assert record.exc_info is not None
+    assert remote.list_trash() == []
+
+
+def test_socket_is_owner_only(socket_path):
+    assert stat.S_IMODE(socket_path.stat().st_mode) & 0o077 == 0
+
+
+def test_serve_refuses_second_daemon(socket_path):
+    with pytest.raises(DaemonError):
+        daemon.serve(socket_path)
+
+
+def test_serve_replaces_stale_socket(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'daemon.sqlite'}"
+    SQLModel.metadata.create_all(create_engine(database_url))
+    path = tmp_path / "stale.sock"
+    path.touch()
+    server = daemon.serve(path, database_url)
+    assert path.is_socket()
+    server.server_close()
+    assert not path.exists()
+
+
+def test_cli_uses_daemon(socket_path, remote, monkeypatch, capsys):
+    monkeypatch.setattr(client, "SOCKET_PATH", socket_path)
+    add_example(remote)
+
+    assert cli.main(["get", "1"]) == 0
+    assert capsys.readouterr().out == "print('Hello, World!')\n"
+
+
+def test_remote_similar(remote):
+    add_example(remote, "First")
+    add_example(remote, "Second")
+
+    matches = remote.similar(1)
+    assert [(snippet.title, score) for snippet, score in matches] == [("Second", 1.0)]
+    assert remote.duplicate_clusters() == [[1, 2]]
+
+
+def test_remote_patch(remote):
+    add_example(remote, favorite=True)
+    remote.patch(1, title="Renamed", language=Language.rust)
+
+    loaded = remote.get(1)
+    assert (loaded.title, loaded.language, loaded.favorite) == (
+        "Renamed",
+        Language.rust,
+        True,
+    )
+    with pytest.raises(ValueError):
+        remote.patch(1, id=2)
+
+
+def test_remote_history(remote):
+    add_example(remote)
+    remote.patch(1, code="print('Bye')")
+
+    [revision] = remote.history(1)
+    assert (revision.number, revision.title) == (1, "Hello python")
+    assert remote.revision_code(1, 1) == "print('Hello, World!')"
+
+
+def test_remote_trash(remote):
+    add_example(remote)
+    remote.delete(1)
+
+    [trashed] = remote.list_trash()
+    assert trashed.deleted_at is not None
+    assert remote.purge(older_than=timedelta(days=1)) == 0
+
+    remote.restore(1)
+    assert remote.get(1).deleted_at is None
+    remote.delete(1)
+    assert remote.purge() == 1
+
+
+def test_remote_usage(remote):
+    add_example(remote, "Hello python")
+    add_example(remote, "Hello rust")
+    remote.record_usage({2: UsageCount(opens=2, last_used=datetime.now(UTC))})
+    remote.record_usage({1: UsageCount(copies=1), 2: UsageCount(copies=1)})
+
+    ranked = remote.most_used()
+    assert [(snippet.title, uses) for snippet, uses in ranked] == [
+        ("Hello rust", 3),
+        ("Hello python", 1),
+    ]
+
+
+def test_get_without_body_keeps_description_a_string(remote):
+    add_example(remote)
+    loaded = remote.get(1, with_body=False)
+    assert loaded.code is None
+    assert loaded.description == ""
+
+
+def test_malformed_request_gets_an_error_reply(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        stream = sock.makefile("rwb")
+        stream.write(b"not json\n")
+        stream.flush()
+        reply = json.loads(stream.readline())
+        assert reply["id"] is None
+        assert reply["error"] == "JSONDecodeError"
+
+        # The connection stays usable
+        stream.write(b'{"id": 1, "op": "list_tags"}\n')
+        stream.flush()
+        assert json.loads(stream.readline()) == {"id": 1, "ok": []}
+
+
+def test_daemon_owns_the_related_index(remote, monkeypatch, tmp_path):
+    monkeypatch.setattr(related, "INDEX_DIR", tmp_path / "related")
+    add_example(remote, "Parse json config")
+    add_example(remote, "Parse json settings")
+    remote.patch(2, code="import json\njson.loads(config)")
+    add_example(remote, "Unrelated")
+    remote.patch(3, code="SELECT 1", description="sql query")
+
+    [(match, score)] = remote.related(1)
+    assert match.title == "Parse json settings"
+    assert score > 0
+
+    # Writes served by the daemon keep its index current
+    remote.add(
+        Snippet(
+            title="Parse json config", code="print('Hello, World!')", description=""
+        )
+    )
+    assert remote.related(1)[0][0].id == 4
+    remote.delete(4)
+    assert 4 not in [s.id for s, _ in remote.related(1)]
+
+
+def test_client_does_not_import_the_database_stack():
+    script = (
+        "import sys, snipster_tui.client; "
+        "print(sorted({'sqlalchemy', 'sqlmodel', 'numpy'} & set(sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,28 @@
+import math
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine
+
+from snipster_tui import db
+
+
+def test_warm_pool_leaves_connections_in_the_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'warm.sqlite'}")
+    assert db.warm_pool(engine, connections=3) == 3
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.checkedin() == 3
+    assert engine.pool.checkedout() == 0
+    engine.dispose()
+
+
+def test_probe_measures_connect_and_round_trip(tmp_path):
+    connect_time, round_trip = db.probe(f"sqlite:///{tmp_path / 'probe.sqlite'}")
+    for seconds in (connect_time, round_trip):
+        assert 0 < seconds < math.inf
+
+
+def test_probe_reports_unreachable_databases(tmp_path):
+    with pytest.raises(OperationalError):
+        db.probe(f"sqlite:///{tmp_path / 'missing' / 'probe.sqlite'}")
@@ -0,0 +1,86 @@
+import gzip
+import json
+
+import pytest
+
+from snipster_tui import cli
+from snipster_tui.export import export_snippets, slugify
+from snipster_tui.models import Language, Snippet
+from snipster_tui.repo import InMemorySnippetRepo
+
+
+@pytest.fixture
+def repo():
+    repo = InMemorySnippetRepo()
+    repo.add(
+        Snippet(
+            title="Hello python",
+            code="print('Hello, World!')",
+            description="A simple hello world snippet",
+            language=Language.python,
+        )
+    )
+    repo.add(
+        Snippet(
+            title="Hello PowerShell",
+            code='Write-Output "Hello, World!"',
+            description="",
+            language=Language.powershell,
+            favorite=True,
+        )
+    )
+    return repo
+
+
+def test_slugify():
+    assert slugify("Hello World of golang!") == "hello-world-of-golang"
+    assert slugify("???") == "snippet"
+
+
+def test_export_jsonl(repo, tmp_path):
+    target = tmp_path / "snippets.jsonl"
+    assert export_snippets(repo, "jsonl", target) == 2
+
+    rows = [json.loads(line) for line in target.read_text().splitlines()]
+    assert [row["title"] for row in rows] == ["Hello python", "Hello PowerShell"]
+    assert rows[1]["language"] == "ps"
+
+
+def test_export_jsonl_gzip(repo, tmp_path):
+    export_snippets(repo, "jsonl", tmp_path / "snippets.jsonl", compress=True)
+
+    with gzip.open(tmp_path / "snippets.jsonl.gz", "rt") as fh:
+        assert len(fh.readlines()) == 2
+
+
+def test_export_markdown(repo, tmp_path):
+    target = tmp_path / "cookbook.md"
+    export_snippets(repo, "markdown", target)
+
+    text = target.read_text()
+    assert "## Hello python\n" in text
+    assert "```python\nprint('Hello, World!')\n```" in text
+    assert "## Hello PowerShell ⭐" in text
+
+
+def test_export_files(repo, tmp_path):
+    assert export_snippets(repo, "files", tmp_path / "out", workers=2) == 2
+
+    assert (tmp_path / "out" / "00001-hello-python.py").read_text() == (
+        "print('Hello, World!')"
+    )
+    assert (tmp_path / "out" / "00002-hello-powershell.ps1").exists()
+
+
+def test_export_unknown_format(repo, tmp_path):
+    with pytest.raises(ValueError):
+        export_snippets(repo, "csv", tmp_path / "out.csv")
+
+
+def test_cli_export(repo, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("snipster_tui.repo.DBSnippetRepo", lambda session: repo)
+    target = tmp_path / "cookbook.md"
+
+    assert cli.main(["export", str(target), "--format", "markdown"]) == 0
+    assert "Exported 2 snippets" in capsys.readouterr().out
+    assert target.exists()
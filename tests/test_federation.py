@@ -0,0 +1,221 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, create_engine
+
+from snipster_tui.exceptions import SnippetNotFoundError
+from snipster_tui.federation import (
+    ID_STRIDE,
+    FederatedSnippetRepository,
+    get_federation,
+    open_federation,
+    parse_libraries,
+)
+from snipster_tui.models import Language, Snippet, UsageCount
+from snipster_tui.repo import InMemorySnippetRepo
+
+
+class SlowRepo(InMemorySnippetRepo):
+    """Blocks list() until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def list(self, *args, **kwargs):
+        self.release.wait(5)
+        return super().list(*args, **kwargs)
+
+
+class BrokenRepo(InMemorySnippetRepo):
+    def search(self, *args, **kwargs):
+        raise OperationalError("SELECT", {}, Exception("connection refused"))
+
+
+def make_snippet(title, language=Language.python, code="print()"):
+    return Snippet(title=title, code=code, description="", language=language)
+
+
+@pytest.fixture
+def libraries():
+    personal, team = InMemorySnippetRepo(), InMemorySnippetRepo()
+    personal.add(make_snippet("Hello python"))
+    personal.add(make_snippet("Deploy script", Language.bash))
+    team.add(make_snippet("Hello", Language.rust))
+    team.add(make_snippet("Say hello", Language.golang))
+    return personal, team
+
+
+@pytest.fixture
+def federation(libraries):
+    personal, team = libraries
+    federation = FederatedSnippetRepository({"personal": personal, "team": team})
+    yield federation
+    federation.close()
+
+
+def test_list_merges_libraries(federation):
+    assert [s.id for s in federation.list()] == [1, 2, ID_STRIDE + 1, ID_STRIDE + 2]
+    by_title = federation.list(order_by="title")
+    assert [s.title for s in by_title] == [
+        "Deploy script",
+        "Hello",
+        "Hello python",
+        "Say hello",
+    ]
+    assert [s.id for s in federation.list(language=Language.rust)] == [ID_STRIDE + 1]
+    assert federation.qualified_id(ID_STRIDE + 2) == "team:2"
+    assert federation.unavailable == []
+
+
+def test_search_ranks_exact_and_prefix_matches_first(federation):
+    assert [s.title for s in federation.search("hello")] == [
+        "Hello",
+        "Hello python",
+        "Say hello",
+    ]
+
+
+def test_writes_go_to_the_owning_library(federation, libraries):
+    personal, team = libraries
+    federation.patch(ID_STRIDE + 1, title="Hello rust")
+    federation.favorite_on(ID_STRIDE + 1)
+    federation.set_tags(ID_STRIDE + 1, ["Demo"])
+
+    assert team.get(1).title == "Hello rust"
+    assert personal.get(1).title == "Hello python"
+    assert [s.id for s in federation.list_favorites()] == [ID_STRIDE + 1]
+    assert federation.get_tags([1, ID_STRIDE + 1]) == {1: [], ID_STRIDE + 1: ["demo"]}
+    assert [s.id for s in federation.get_many([ID_STRIDE + 1, 1])] == [
+        1,
+        ID_STRIDE + 1,
+    ]
+    assert federation.list_tags() == ["demo"]
+
+    federation.delete(ID_STRIDE + 2)
+    assert [s.id for s in federation.list_trash()] == [ID_STRIDE + 2]
+    assert len(team.list()) == 1
+    with pytest.raises(SnippetNotFoundError):
+        federation.delete(5 * ID_STRIDE + 1)
+
+
+def test_add_goes_to_write_to(libraries):
+    personal, team = libraries
+    federation = FederatedSnippetRepository(
+        {"personal": personal, "team": team}, write_to="team"
+    )
+    snippet = make_snippet("Shared")
+    federation.add(snippet)
+
+    assert snippet.id == ID_STRIDE + 3
+    shared = team.get(3)
+    assert shared is not None
+    assert shared.title == "Shared"
+    shared = federation.get(snippet.id)
+    assert shared is not None
+    assert shared.title == "Shared"
+    # The library's own instance keeps its local id
+    assert team.get(3).id == 3
+    federation.close()
+
+
+def test_similar_and_duplicates_keep_global_ids(federation):
+    code = "def greet(name):\n    return 'Hello ' + name\n"
+    for title in ("One", "Two"):
+        federation.write_to = "team"
+        federation.add(make_snippet(title, code=code))
+
+    assert [s.id for s, _ in federation.similar(ID_STRIDE + 3)] == [ID_STRIDE + 4]
+    assert [ID_STRIDE + 3, ID_STRIDE + 4] in federation.duplicate_clusters()
+
+
+def test_slow_library_is_left_out(libraries):
+    personal, _ = libraries
+    slow = SlowRepo()
+    slow.add(make_snippet("Late"))
+    federation = FederatedSnippetRepository(
+        {"personal": personal, "slow": slow}, timeout=0.1
+    )
+
+    started = time.monotonic()
+    assert [s.title for s in federation.list()] == ["Hello python", "Deploy script"]
+    assert time.monotonic() - started < 1
+    assert federation.unavailable == ["slow"]
+
+    # Still busy with the first call, so not asked again
+    federation.list()
+    assert federation.unavailable == ["slow"]
+
+    slow.release.set()
+    time.sleep(0.2)
+    assert len(federation.list()) == 3
+    assert federation.unavailable == []
+    federation.close()
+
+
+def test_unreachable_library_is_left_out(libraries):
+    personal, _ = libraries
+    broken = BrokenRepo()
+    federation = FederatedSnippetRepository({"personal": personal, "down": broken})
+
+    assert [s.title for s in federation.search("hello")] == ["Hello python"]
+    assert federation.unavailable == ["down"]
+    federation.close()
+
+
+def test_open_federation_over_databases(tmp_path):
+    urls = {}
+    for name in ("personal", "team"):
+        urls[name] = f"sqlite:///{tmp_path / name}.sqlite"
+        SQLModel.metadata.create_all(create_engine(urls[name]))
+    value = ",".join(f"{name}={url}" for name, url in urls.items())
+    assert parse_libraries(value) == urls
+
+    with open_federation(parse_libraries(value)) as federation:
+        federation.add(make_snippet("Local"))
+        federation.write_to = "team"
+        federation.add(make_snippet("Shared"))
+        snippets = federation.list()
+        assert [(s.id, s.title) for s in snippets] == [
+            (1, "Local"),
+            (ID_STRIDE + 1, "Shared"),
+        ]
+        assert federation.get(ID_STRIDE + 1, with_body=True).code == "print()"
+
+
+def test_usage_goes_to_the_owning_library(federation, libraries):
+    _, team = libraries
+    federation.record_usage({2: UsageCount(opens=1), ID_STRIDE + 1: UsageCount(2)})
+
+    assert [(s.id, uses) for s, uses in federation.most_used()] == [
+        (ID_STRIDE + 1, 2),
+        (2, 1),
+    ]
+    assert [(s.id, uses) for s, uses in team.most_used()] == [(1, 2)]
+
+
+def test_one_federation_per_process(tmp_path):
+    url = f"sqlite:///{tmp_path / 'personal.sqlite'}"
+    SQLModel.metadata.create_all(create_engine(url))
+    value = f"personal={url}"
+
+    federation = get_federation(value)
+    assert get_federation(value) is federation
+    federation.add(make_snippet("Kept"))
+    assert [s.title for s in get_federation(value).list()] == ["Kept"]
+
+
+def test_close_waits_for_running_calls(libraries):
+    personal, _ = libraries
+    slow = SlowRepo()
+    federation = FederatedSnippetRepository(
+        {"personal": personal, "slow": slow}, timeout=0.1
+    )
+    federation.list()
+    assert federation.unavailable == ["slow"]
+
+    threading.Timer(0.2, slow.release.set).start()
+    federation.close()
+    assert slow.release.is_set()
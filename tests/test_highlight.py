@@ -0,0 +1,33 @@
+import pytest
+from pygments.lexers.shell import PowerShellLexer
+from pygments.lexers.special import TextLexer
+
+from snipster_tui import highlight
+from snipster_tui.models import Language
+
+
+@pytest.mark.parametrize(
+    "language, lexer",
+    [
+        (Language.powershell.value, "PowerShell"),
+        (Language.other.value, "Text only"),
+        (Language.golang.value, "Go"),
+        ("text", "Text only"),
+        ("no such language", "Text only"),
+    ],
+)
+def test_lexer_table(language, lexer):
+    assert highlight.lexer_for(language).name == lexer
+
+
+def test_lexers_are_shared():
+    assert highlight.lexer_for("ps") is highlight.lexer_for("ps")
+    assert isinstance(highlight.lexer_for("ps"), PowerShellLexer)
+    assert highlight.code_theme() is highlight.code_theme()
+
+
+def test_warm_up_loads_every_language():
+    highlight.lexer_for.cache_clear()
+    highlight.warm_up()
+    assert highlight.lexer_for.cache_info().currsize == len(Language)
+    assert isinstance(highlight.lexer_for(Language.other.value), TextLexer)
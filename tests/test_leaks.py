@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from snipster_tui import db
+from snipster_tui.leaks import LeakTracker
+from snipster_tui.models import Snippet
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leaks.sqlite'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def tracker(engine, monkeypatch):
+    tracker = LeakTracker()
+    tracker.watch(engine)
+    monkeypatch.setattr(db, "DEBUG_SESSIONS", True)
+    monkeypatch.setattr(db, "leak_tracker", tracker)
+    return tracker
+
+
+def test_unclosed_session_is_reported(engine, tracker):
+    session = tracker.opened(Session(engine))
+    session.exec(select(Snippet)).all()
+
+    assert tracker.checked_out() == {str(engine.url): 1}
+    report = tracker.report()
+    assert report.startswith("1 unclosed session(s)")
+    assert "test_unclosed_session_is_reported" in report
+
+    session.close()
+    assert tracker.checked_out() == {}
+    assert tracker.report() is None
+
+
+def test_session_scope_closes_and_rolls_back(engine, tracker, caplog):
+    with db.session_scope(lambda: Session(engine)) as session:
+        session.add(Snippet(title="Kept", code="print()", description=""))
+        session.commit()
+        session.exec(select(Snippet)).all()
+        # Open scopes are not leaks
+        assert tracker.unclosed() == []
+
+    with (
+        pytest.raises(RuntimeError),
+        db.session_scope(lambda: Session(engine)) as session,
+    ):
+        session.add(Snippet(title="Dropped", code="print()", description=""))
+        session.flush()
+        raise RuntimeError("handler failed")
+
+    assert tracker.checked_out() == {}
+    with Session(engine) as session:
+        assert [s.title for s in session.exec(select(Snippet))] == ["Kept"]
+
+    leaked = tracker.opened(Session(engine))
+    leaked.exec(select(Snippet)).all()
+    with (
+        caplog.at_level(logging.WARNING, logger="snipster_tui.leaks"),
+        db.session_scope(lambda: Session(engine)),
+    ):
+        pass
+    assert "1 unclosed session(s)" in caplog.text
+    leaked.close()
@@ -0,0 +1,70 @@
+import io
+
+from rich.text import Text
+
+from snipster_tui.memory import (
+    LRUCache,
+    MemoryBudget,
+    MemoryReport,
+    approx_size,
+)
+from snipster_tui.models import Snippet
+
+
+def test_approx_size_grows_with_content():
+    small = Snippet(title="a", code="x", description="")
+    large = Snippet(title="a", code="x" * 10_000, description="")
+    assert approx_size(large) - approx_size(small) >= 9_999
+    highlighted = Text("print()")
+    highlighted.stylize("bold", 0, 5)
+    assert approx_size(highlighted) > approx_size("print()")
+
+
+def test_cache_keeps_recently_used_entries():
+    budget = MemoryBudget(limit=1000)
+    cache = LRUCache(budget, "snippets", max_entries=3)
+    for key in range(3):
+        cache.put(key, "value", nbytes=100)
+    cache.get(0)
+    cache.put(3, "value", nbytes=100)
+
+    assert 1 not in cache
+    assert [key for key in range(4) if key in cache] == [0, 2, 3]
+    assert cache.nbytes == 300
+
+
+def test_budget_trims_least_recently_used_across_caches():
+    budget = MemoryBudget(limit=1000)
+    snippets = LRUCache(budget, "snippets")
+    highlight = LRUCache(budget, "highlight")
+    snippets.put(1, "a", nbytes=300)
+    highlight.put(1, "a", nbytes=300)
+    snippets.put(2, "b", nbytes=300)
+    snippets.get(1)
+
+    # Over budget: the highlight of 1 is the oldest use
+    highlight.put(2, "b", nbytes=300)
+    assert 1 not in highlight
+    assert 1 in snippets and 2 in snippets and 2 in highlight
+
+    # A bigger table squeezes the caches further
+    budget.track("table", 700)
+    assert budget.used() <= 1000
+    assert budget.usage() == {"table": 700, "snippets": 0, "highlight": 300}
+
+
+def test_memory_report_books_allocations_per_screen():
+    report = MemoryReport(top=3)
+    report.start("Snipster")
+    kept: list[str | bytes] = [str(number) * 1000 for number in range(200)]
+    report.switch("CodeViewScreen")
+    kept += [str(number).encode() * 1000 for number in range(50)]
+    report.stop()
+
+    out = io.StringIO()
+    report.write(out)
+    text = out.getvalue()
+    assert "== Snipster:" in text and "== CodeViewScreen:" in text
+    assert sum(report.growth["Snipster"].values()) > 200_000
+    assert "test_memory.py" in text
+    assert kept
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from snipster_tui import mirror
+from snipster_tui.mirror import SnippetMirror
+from snipster_tui.models import Language, Snippet
+from snipster_tui.repo import InMemorySnippetRepo
+
+
+@pytest.fixture
+def repo():
+    repo = InMemorySnippetRepo()
+    repo.add(
+        Snippet(
+            title="Hello python",
+            code="print('Hello, World!')",
+            description="A simple hello world snippet",
+            language=Language.python,
+        )
+    )
+    repo.add(
+        Snippet(
+            title="Hello rust",
+            code='fn main() { println!("Hello World!"); }',
+            description="A simple Rust hello world snippet",
+            language=Language.rust,
+        )
+    )
+    return repo
+
+
+def test_sync_from_db_materializes_by_language(repo, tmp_path):
+    stats = SnippetMirror(repo, tmp_path).sync_from_db()
+
+    assert stats.written == 2
+    assert (tmp_path / "python" / "00001-hello-python.py").exists()
+    assert (tmp_path / "rust" / "00002-hello-rust.rs").exists()
+
+
+def test_resync_only_rewrites_changed(repo, tmp_path):
+    SnippetMirror(repo, tmp_path).sync_from_db()
+
+    snippet = repo.get(2)
+    repo.update(Snippet(**{**snippet.model_dump(), "code": "fn main() {}"}))
+    stats = SnippetMirror(repo, tmp_path).sync_from_db()
+
+    assert (stats.written, stats.unchanged) == (1, 1)
+    assert (tmp_path / "rust" / "00002-hello-rust.rs").read_text() == "fn main() {}"
+
+
+def test_sync_loads_changed_bodies_in_one_call(repo, tmp_path, monkeypatch):
+    calls = []
+    get_many = repo.get_many
+    monkeypatch.setattr(repo, "get", None)
+    monkeypatch.setattr(
+        repo, "get_many", lambda ids, **kwargs: calls.append(ids) or get_many(ids)
+    )
+
+    assert SnippetMirror(repo, tmp_path).sync_from_db().written == 2
+    assert calls == [[1, 2]]
+
+
+def test_sync_loads_bodies_in_batches(repo, tmp_path, monkeypatch):
+    calls = []
+    get_many = repo.get_many
+    monkeypatch.setattr(mirror, "BODY_BATCH_SIZE", 1)
+    monkeypatch.setattr(
+        repo, "get_many", lambda ids, **kwargs: calls.append(ids) or get_many(ids)
+    )
+
+    assert SnippetMirror(repo, tmp_path).sync_from_db().written == 2
+    assert calls == [[1], [2]]
+
+
+def test_resync_moves_and_removes_files(repo, tmp_path):
+    mirror = SnippetMirror(repo, tmp_path)
+    mirror.sync_from_db()
+
+    snippet = repo.get(1)
+    repo.update(Snippet(**{**snippet.model_dump(), "language": Language.bash}))
+    repo.delete(2)
+    stats = mirror.sync_from_db()
+
+    assert stats.removed == 1
+    assert not (tmp_path / "python" / "00001-hello-python.py").exists()
+    assert (tmp_path / "bash" / "00001-hello-python.sh").exists()
+    assert not (tmp_path / "rust" / "00002-hello-rust.rs").exists()
+
+
+def test_edited_files_sync_back(repo, tmp_path):
+    mirror = SnippetMirror(repo, tmp_path)
+    mirror.sync_from_db()
+
+    path = tmp_path / "python" / "00001-hello-python.py"
+    path.write_text("print('edited')")
+    changes = mirror.scan_changes()
+    assert changes == {1: "print('edited')"}
+
+    assert mirror.sync_to_db(changes) == 1
+    assert repo.get(1).code == "print('edited')"
+    assert mirror.scan_changes() == {}
+    assert mirror.sync_from_db().written == 0
+
+
+def test_watch_pushes_debounced_batch(repo, tmp_path, monkeypatch):
+    mirror = SnippetMirror(repo, tmp_path, debounce=0)
+    mirror.sync_from_db()
+    (tmp_path / "rust" / "00002-hello-rust.rs").write_text("fn main() {}")
+
+    stop = threading.Event()
+    original = mirror.sync_to_db
+
+    def sync_and_stop(changes):
+        count = original(changes)
+        stop.set()
+        return count
+
+    monkeypatch.setattr(mirror, "sync_to_db", sync_and_stop)
+    mirror.watch(interval=0.01, stop=stop)
+
+    assert repo.get(2).code == "fn main() {}"
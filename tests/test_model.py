@@ -1,6 +1,16 @@
+import subprocess
+import sys
+
 import pytest
-from sqlmodel import Session, SQLModel, create_engine, select, true
+from sqlmodel import Session, SQLModel, create_engine, select, text, true
 
+from snipster_tui.compression import (
+    CODEC_PLAIN,
+    CODEC_ZLIB,
+    compress_code,
+    compress_threshold,
+    decompress_code,
+)
 from snipster_tui.models import Snippet
 
 
@@ -84,3 +94,69 @@ def test_create_snippet_with_cls_method(engine):
     assert snippet.id is not None
     assert snippet.title == "Test Snippet with Class Method"
     assert snippet.code == "print('Hello, World!')"
+
+
+def test_large_code_is_stored_compressed(engine):
+    big_code = "SELECT * FROM snippet;\n" * 1000
+    snippet = Snippet(title="Dump", code=big_code, description="Big SQL dump")
+    with Session(engine) as session:
+        session.add(snippet)
+        session.commit()
+        raw = (
+            session.connection()
+            .execute(
+                text("SELECT code FROM snippet WHERE id = :id").bindparams(
+                    id=snippet.id
+                )
+            )
+            .one()[0]
+        )
+        assert raw[:1] == CODEC_ZLIB
+        assert len(raw) < len(big_code)
+
+    with Session(engine) as session:
+        assert session.get_one(Snippet, snippet.id).code == big_code
+
+
+def test_small_code_is_stored_plain(engine):
+    snippet = Snippet(title="Tiny", code="print('hi')", description="Small")
+    with Session(engine) as session:
+        session.add(snippet)
+        session.commit()
+        raw = (
+            session.connection()
+            .execute(
+                text("SELECT code FROM snippet WHERE id = :id").bindparams(
+                    id=snippet.id
+                )
+            )
+            .one()[0]
+        )
+        assert raw == CODEC_PLAIN + b"print('hi')"
+
+
+def test_decompress_plain_text_rows():
+    assert decompress_code("print('legacy')") == "print('legacy')"
+    assert decompress_code(compress_code("x" * 10, threshold=1)) == "x" * 10
+
+
+def test_compress_threshold_is_read_on_first_use(monkeypatch):
+    monkeypatch.setenv("SNIPSTER_COMPRESS_THRESHOLD", "8")
+    compress_threshold.cache_clear()
+    try:
+        assert compress_code("x" * 100)[:1] == CODEC_ZLIB
+    finally:
+        compress_threshold.cache_clear()
+
+
+def test_models_do_not_import_the_config(tmp_path):
+    script = "import sys, snipster_tui.models; print('snipster_tui.db' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"HOME": str(tmp_path), "PYTHONPATH": ":".join(sys.path)},
+    ).stdout
+    assert output.split() == ["False"]
+    assert not (tmp_path / ".snipster_tui").exists()
@@ -0,0 +1,123 @@
+import subprocess
+import sys
+
+import pytest
+
+from snipster_tui import related
+from snipster_tui.models import Language, Snippet
+from snipster_tui.related import RelatedIndex, tokenize
+from snipster_tui.repo import InMemorySnippetRepo
+
+
+@pytest.fixture
+def repo():
+    repo = InMemorySnippetRepo()
+    for title, code in [
+        (
+            "Read JSON file",
+            "import json\nwith open(path) as fh:\n    data = json.load(fh)",
+        ),
+        (
+            "Write JSON file",
+            "import json\nwith open(path, 'w') as fh:\n    json.dump(data, fh)",
+        ),
+        ("Docker cleanup", "docker system prune --all --volumes"),
+        ("List containers", "docker ps --all --format '{{.Names}}'"),
+    ]:
+        repo.add(
+            Snippet(title=title, code=code, description="", language=Language.other)
+        )
+    return repo
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("parseHTTPResponse snake_case x42") == [
+        "parse",
+        "http",
+        "response",
+        "snake",
+        "case",
+        "42",
+    ]
+
+
+def test_related_ranks_by_cosine(repo):
+    index = RelatedIndex(directory=None)
+    assert index.sync(repo) == 4
+
+    related = index.related(1)
+    assert related[0][0] == 2
+    assert 0 < related[0][1] <= 1
+    assert [snippet_id for snippet_id, _ in index.related(3)][:1] == [4]
+    assert index.related(99) == []
+
+
+def test_sync_is_incremental(repo):
+    index = RelatedIndex(directory=None)
+    index.sync(repo)
+    assert index.sync(repo) == 0
+
+    repo.update(
+        Snippet(id=3, title="Read JSON", code="json.loads(text)", description="")
+    )
+    repo.delete(4)
+    assert index.sync(repo) == 2
+    assert len(index) == 3
+    assert index.related(3)[0][0] in (1, 2)
+
+
+def test_refresh_follows_single_writes(repo):
+    index = RelatedIndex(directory=None)
+    index.sync(repo)
+
+    repo.patch(3, title="Read JSON", code="json.loads(text)")
+    index.refresh(repo, 3)
+    assert index.related(3)[0][0] in (1, 2)
+
+    repo.delete(4)
+    index.refresh(repo, 4)
+    assert len(index) == 3
+    assert index.sync(repo) == 0
+
+
+def test_index_persists_snapshot_and_journal(repo, tmp_path):
+    index = RelatedIndex(tmp_path)
+    index.sync(repo)
+    index.save()
+    repo.delete(2)
+    index.refresh(repo, 2)
+    assert (tmp_path / "journal.jsonl").exists()
+
+    reloaded = RelatedIndex(tmp_path)
+    assert len(reloaded) == 3
+    assert reloaded.fingerprints == index.fingerprints
+    assert reloaded.related(3) == index.related(3)
+    assert reloaded.sync(repo) == 0
+
+
+def test_sync_loads_in_batches_and_snapshots_once(repo, tmp_path, monkeypatch):
+    monkeypatch.setattr(related, "SYNC_BATCH_SIZE", 3)
+    loaded = []
+    get_many = repo.get_many
+
+    def recording_get_many(snippet_ids, with_body=True):
+        loaded.append(list(snippet_ids))
+        return get_many(snippet_ids, with_body)
+
+    monkeypatch.setattr(repo, "get_many", recording_get_many)
+    monkeypatch.setattr(repo, "get", None)
+    index = RelatedIndex(tmp_path)
+    assert index.sync(repo) == 4
+
+    assert loaded == [[1, 2, 3], [4]]
+    assert (tmp_path / "snapshot.npz").exists()
+    assert not (tmp_path / "journal.jsonl").exists()
+    assert len(RelatedIndex(tmp_path)) == 4
+
+
+def test_related_imports_numpy_on_first_index():
+    script = "import sys, snipster_tui.related; print('numpy' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.split() == ["False"]
@@ -1,10 +1,19 @@
+import re
+import subprocess
+import sys
+from datetime import UTC, datetime, timedelta
+
 import pytest
+from sqlalchemy import event, inspect
+from sqlalchemy.engine.default import CacheStats
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
 
+from snipster_tui import history
 from snipster_tui.exceptions import SnippetNotFoundError
-from snipster_tui.models import Language, Snippet
+from snipster_tui.models import Language, Snippet, UsageCount
 from snipster_tui.repo import DBSnippetRepo, InMemorySnippetRepo
+from snipster_tui.usage import frecency_weight
 
 example_snippets = [
     Snippet(
@@ -186,6 +195,15 @@ def test_get_snippet_not_found(add_snippet, repo):
     assert repo.get(99) is None
 
 
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_get_many(add_snippet, add_second_snippet, repo):
+    repo.delete(1)
+    snippets = repo.get_many([2, 99, 1, 2])
+    assert [s.id for s in snippets] == [2]
+    assert snippets[0].code == add_second_snippet.code
+    assert repo.get_many([]) == []
+
+
 @pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
 def test_delete_snippet(add_snippet, repo):
     repo.delete(1)
@@ -269,3 +287,412 @@ def test_list_favorite_snippets(repo, add_snippets):
     expected_favorites = [s for s in add_snippets if getattr(s, "favorite", True)]
     assert len(favorite_snippets) == len(expected_favorites)
     assert all(s.favorite for s in favorite_snippets)
+
+
+@pytest.mark.parametrize("repo", [DBSnippetRepo], indirect=True)
+def test_list_and_writes_defer_code_body(add_snippet, repo):
+    repo.session.expunge_all()
+    listed = repo.list()
+    assert "code" in inspect(listed[0]).unloaded
+
+    repo.favorite_on(1)
+    assert "code" in inspect(listed[0]).unloaded
+    assert repo.get(1, with_body=False).favorite is True
+
+
+@pytest.mark.parametrize("repo", [DBSnippetRepo], indirect=True)
+def test_get_with_body_undefers_code(add_snippet, repo):
+    repo.session.expunge_all()
+    snippet = repo.get(1, with_body=True)
+    assert "code" not in inspect(snippet).unloaded
+    assert snippet.code == "print('Hello, World! 1')"
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_iter_snippets_streams_all(add_snippet, add_second_snippet, repo):
+    streamed = list(repo.iter_snippets(batch_size=1))
+    assert [s.id for s in streamed] == [1, 2]
+    assert streamed[1].code == add_second_snippet.code
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_list_sorted_and_filtered(
+    add_snippet, add_second_snippet, add_favorite_snippet, repo
+):
+    assert [s.id for s in repo.list(order_by="title")] == [3, 1, 2]
+    assert [s.id for s in repo.list(order_by="language", descending=True)] == [2, 1, 3]
+    assert [s.id for s in repo.list(language=Language.python)] == [1, 3]
+    assert [s.id for s in repo.list(favorite=True, language=Language.python)] == [3]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_list_unknown_sort_column(repo):
+    with pytest.raises(ValueError):
+        repo.list(order_by="code")
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_set_and_get_tags(add_snippet, add_second_snippet, repo):
+    repo.set_tags(1, ["CLI", " hello ", "cli"])
+    repo.set_tags(2, ["hello", "rust"])
+
+    assert repo.get_tags([1, 2]) == {1: ["cli", "hello"], 2: ["hello", "rust"]}
+    assert repo.list_tags() == ["cli", "hello", "rust"]
+
+    repo.set_tags(1, ["cli"])
+    assert repo.get_tags([1]) == {1: ["cli"]}
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_list_filtered_by_tags(
+    add_snippet, add_second_snippet, add_third_snippet, repo
+):
+    repo.set_tags(1, ["hello", "python"])
+    repo.set_tags(2, ["hello", "rust"])
+    repo.set_tags(3, ["rust"])
+
+    assert [s.id for s in repo.list(tags=["python", "rust"])] == [1, 2, 3]
+    assert [s.id for s in repo.list(tags=["hello", "rust"], match_all_tags=True)] == [2]
+    assert [s.id for s in repo.list(tags=["Hello"], language=Language.rust)] == [2]
+    assert repo.list(tags=["unknown"]) == []
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_delete_snippet_drops_tags(add_snippet, repo):
+    repo.set_tags(1, ["hello"])
+    repo.delete(1)
+    assert repo.get_tags([1]) == {1: []}
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_set_tags_non_existing(repo):
+    with pytest.raises(SnippetNotFoundError):
+        repo.set_tags(99, ["hello"])
+
+
+near_duplicates = [
+    (
+        "def greet(name):\n    message = 'Hello ' + name\n    print(message)\n"
+        "    return message\n\ngreet('World')\n"
+    ),
+    (
+        "def greet(name):\n    message = 'Hello ' + name\n    print(message)\n"
+        "    return message\n\ngreet('Snipster')\n"
+    ),
+    "SELECT id, title FROM snippet WHERE favorite ORDER BY title;",
+]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_similar_snippets(repo):
+    for number, code in enumerate(near_duplicates):
+        repo.add(Snippet(title=f"Snippet {number}", code=code, description=""))
+
+    matches = repo.similar(1)
+    assert [snippet.id for snippet, _ in matches] == [2]
+    assert matches[0][1] > 0.6
+    assert repo.similar(3) == []
+    assert repo.duplicate_clusters(threshold=0.6) == [[1, 2]]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_similarity_follows_updates_and_deletes(repo):
+    for number, code in enumerate(near_duplicates):
+        repo.add(Snippet(title=f"Snippet {number}", code=code, description=""))
+
+    repo.update(Snippet(id=3, title="Copy", code=near_duplicates[0], description=""))
+    assert repo.duplicate_clusters() == [[1, 3]]
+
+    repo.delete(1)
+    assert [snippet.id for snippet, _ in repo.similar(3)] == [2]
+    with pytest.raises(SnippetNotFoundError):
+        repo.similar(1)
+
+
+@pytest.mark.parametrize("repo", [DBSnippetRepo], indirect=True)
+def test_similarity_indexes_unindexed_rows(repo, session):
+    # Rows written before the index existed (or behind the repo's back)
+    for code in near_duplicates[:2]:
+        session.add(Snippet(title="Legacy", code=code, description=""))
+    session.commit()
+
+    assert repo.duplicate_clusters(threshold=0.6) == [[1, 2]]
+    assert repo.get(1).content_hash is not None
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_patch_keeps_other_fields(add_snippet, repo):
+    repo.favorite_on(1)
+    repo.patch(1, title="Renamed", language=Language.rust)
+
+    snippet = repo.get(1)
+    assert snippet.title == "Renamed"
+    assert snippet.language == Language.rust
+    assert snippet.favorite is True
+    assert snippet.code == "print('Hello, World! 1')"
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_patch_code_refreshes_hash_and_similarity(repo):
+    for number, code in enumerate(near_duplicates):
+        repo.add(Snippet(title=f"Snippet {number}", code=code, description=""))
+    old_hash = repo.get(3).content_hash
+
+    repo.patch(3, code=near_duplicates[0])
+    assert repo.get(3).content_hash != old_hash
+    assert repo.duplicate_clusters() == [[1, 3]]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_patch_rejects_unknown_fields_and_ids(add_snippet, repo):
+    with pytest.raises(ValueError):
+        repo.patch(1, content_hash="forged")
+    with pytest.raises(SnippetNotFoundError):
+        repo.patch(42, title="Missing")
+
+
+@pytest.mark.parametrize("repo", [DBSnippetRepo], indirect=True)
+def test_patch_updates_only_given_columns(add_snippet, repo, engine):
+    repo.session.expunge_all()
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    repo.patch(1, title="Renamed")
+    event.remove(engine, "before_cursor_execute", record)
+
+    updates = [s for s in statements if s.startswith("UPDATE")]
+    assert updates == ["UPDATE snippet SET title=? WHERE snippet.id = ?"]
+    assert not any("snippet.code" in s for s in statements)
+
+
+@pytest.mark.parametrize("repo", [DBSnippetRepo], indirect=True)
+def test_hot_queries_reuse_compiled_statements(repo, engine):
+    for title, language in [
+        ("Hello python", Language.python),
+        ("Hello rust", Language.rust),
+        ("Hello World of golang", Language.golang),
+    ]:
+        repo.add(
+            Snippet(title=title, code="print()", description="", language=language)
+        )
+    hits = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        hits.append(context.cache_hit == CacheStats.CACHE_HIT)
+
+    # Warm up, then the same call sites with other values
+    repo.get(1)
+    repo.list(language=Language.python, order_by="title")
+    repo.search("hello", Language.python)
+    hits.clear()
+    assert repo.get(2).title == "Hello rust"
+    rust = repo.list(language=Language.rust, order_by="title")
+    assert [s.title for s in rust] == ["Hello rust"]
+    assert [s.title for s in repo.search("golang", Language.golang)] == [
+        "Hello World of golang"
+    ]
+    event.remove(engine, "before_cursor_execute", record)
+    assert hits == [True, True, True]
+
+
+@pytest.mark.parametrize(
+    "build, args",
+    [
+        (DBSnippetRepo.get_statement, (3, False)),
+        (DBSnippetRepo.list_statement, (True, False, Language.python, "title", True)),
+        (DBSnippetRepo.search_statement, ("hello", Language.rust)),
+    ],
+)
+def test_fresh_statements_match_the_cached_ones(build, args):
+    def sql(statement):
+        # Cached ones name their bound parameters after the closure variables
+        return re.sub(r":\w+", ":param", str(statement))
+
+    assert sql(build(*args, cached=False)) == sql(build(*args))
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_preview_columns_follow_the_code(repo):
+    code = "line = 'ä'\n" * 20
+    repo.add(Snippet(title="Long", code=code, description=""))
+    snippet = repo.list()[0]
+    assert snippet.code_preview == code[:100] + "..."
+    assert (snippet.line_count, snippet.byte_size) == (20, 240)
+
+    repo.patch(1, code="print()")
+    assert repo.get(1).code_preview == "print()"
+    repo.update(Snippet(id=1, title="Long", code="a\nb", description=""))
+    snippet = repo.get(1, with_body=False)
+    assert (snippet.code_preview, snippet.line_count, snippet.byte_size) == (
+        "a\nb",
+        2,
+        3,
+    )
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_updates_record_revisions(add_snippet, repo):
+    repo.update(
+        Snippet(
+            id=1,
+            title="Renamed",
+            code="print('two')",
+            description="",
+            language=Language.python,
+        )
+    )
+    repo.patch(1, code="print('three')")
+    repo.patch(1, title="Title only")
+
+    assert [r.number for r in repo.history(1)] == [2, 1]
+    assert repo.revision_code(1, 1) == "print('Hello, World! 1')"
+    assert repo.revision_code(1, 2) == "print('two')"
+    with pytest.raises(SnippetNotFoundError):
+        repo.revision_code(1, 3)
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_update_of_a_loaded_instance_keeps_history(repo):
+    repo.add(Snippet(title="Lines", code="a\nb\n", description=""))
+    repo.patch(1, code="a\nB\n")
+    snippet = repo.get(1)
+    snippet.code = "x\nb\n"
+    repo.update(snippet)
+
+    assert [r.number for r in repo.history(1)] == [2, 1]
+    assert repo.revision_code(1, 2) == "a\nB\n"
+    assert repo.revision_code(1, 1) == "a\nb\n"
+    assert repo.get(1).code == "x\nb\n"
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_revisions_across_keyframes(repo):
+    lines = [f"value_{number} = None\n" for number in range(40)]
+    repo.add(Snippet(title="Counter", code="".join(lines), description=""))
+    versions = ["".join(lines)]
+    for number in range(history.KEYFRAME_INTERVAL + 10):
+        lines[number % 40] = f"value_{number % 40} = {number * 7}\n"
+        versions.append("".join(lines))
+        repo.patch(1, code=versions[-1])
+
+    for number in (1, history.KEYFRAME_INTERVAL - 1, history.KEYFRAME_INTERVAL, 70):
+        assert repo.revision_code(1, number) == versions[number - 1]
+    revisions = repo.history(1)
+    assert [r.number for r in revisions if r.keyframe] == [history.KEYFRAME_INTERVAL]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_deleted_snippets_go_to_trash(add_snippet, add_second_snippet, repo):
+    repo.set_tags(1, ["hello"])
+    repo.delete(1)
+
+    assert [s.id for s in repo.list()] == [2]
+    assert repo.search("Hello") == [add_second_snippet]
+    assert [s.id for s in repo.iter_snippets()] == [2]
+    with pytest.raises(SnippetNotFoundError):
+        repo.patch(1, title="Gone")
+    [trashed] = repo.list_trash()
+    assert trashed.id == 1
+    assert trashed.deleted_at is not None
+
+    repo.restore(1)
+    assert [s.id for s in repo.list()] == [1, 2]
+    assert repo.get(1).deleted_at is None
+    assert repo.get_tags([1]) == {1: ["hello"]}
+    with pytest.raises(SnippetNotFoundError):
+        repo.restore(1)
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_purge_respects_retention(add_snippet, add_second_snippet, repo):
+    repo.patch(1, code="print('Revised')")
+    repo.delete(1)
+    repo.delete(2)
+
+    assert repo.purge(older_than=timedelta(days=1)) == 0
+    assert repo.purge(batch_size=1) == 2
+    assert repo.list_trash() == []
+    with pytest.raises(SnippetNotFoundError):
+        repo.restore(1)
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_trashed_snippets_are_not_similar(repo):
+    for number, code in enumerate(near_duplicates):
+        repo.add(Snippet(title=f"Snippet {number}", code=code, description=""))
+
+    repo.delete(2)
+    assert repo.similar(1) == []
+    assert repo.duplicate_clusters(threshold=0.6) == []
+
+    repo.restore(2)
+    assert [snippet.id for snippet, _ in repo.similar(1)] == [2]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_usage_counts_and_most_used(add_snippet, add_second_snippet, repo):
+    used_at = datetime(2026, 1, 1, tzinfo=UTC)
+    repo.record_usage({1: UsageCount(opens=1, last_used=used_at)})
+    repo.record_usage(
+        {2: UsageCount(2, 1, used_at), 1: UsageCount(copies=1), 9: UsageCount(1)}
+    )
+
+    assert [(s.id, uses) for s, uses in repo.most_used()] == [(2, 3), (1, 2)]
+    assert repo.most_used(limit=1)[0][0].title == "Hello World"
+
+    repo.delete(2)
+    assert [s.id for s, _ in repo.most_used()] == [1]
+    repo.purge()
+    repo.record_usage({2: UsageCount(opens=1)})
+    assert [s.id for s, _ in repo.most_used()] == [1]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_frecency_orders_list_and_search(
+    add_snippet, add_second_snippet, add_third_snippet, repo
+):
+    now = datetime.now(UTC)
+    # Three uses two months ago weigh less than one today
+    old = sum(frecency_weight(now - timedelta(days=60 + day)) for day in range(3))
+    repo.record_usage({1: UsageCount(opens=3, frecency=old)})
+    repo.record_usage({3: UsageCount(copies=1, frecency=frecency_weight(now))})
+
+    ranked = repo.list(order_by="frecency", descending=True)
+    assert [snippet.id for snippet in ranked] == [3, 1, 2]
+    assert [snippet.id for snippet in repo.search("Hello")] == [3, 1, 2]
+
+
+@pytest.mark.parametrize("repo", [InMemorySnippetRepo, DBSnippetRepo], indirect=True)
+def test_edits_keep_the_rank(add_snippet, add_second_snippet, repo):
+    repo.record_usage({2: UsageCount(opens=1, frecency=5.0)})
+
+    repo.update(
+        Snippet(
+            id=2,
+            title="Edited",
+            code="fn main() {}",
+            description="",
+            language=Language.rust,
+        )
+    )
+    repo.patch(2, title="Patched")
+
+    edited = repo.get(2)
+    assert edited.frecency == 5.0
+    assert edited.code_preview == "fn main() {}"
+    assert [s.id for s in repo.list(order_by="frecency", descending=True)] == [2, 1]
+
+
+def test_repo_imports_numpy_on_first_similarity_use():
+    script = (
+        "import sys, snipster_tui.repo; "
+        "print('numpy' in sys.modules, 'snipster_tui.similarity' in sys.modules)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.split() == ["False", "False"]
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from snipster_tui.models import Snippet
+from snipster_tui.repo import DBSnippetRepo
+from snipster_tui.routing import ReplicaRouter
+
+
+def make_snippet(title):
+    return Snippet(title=title, code="print()", description="")
+
+
+def create_library(url, title):
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        DBSnippetRepo(session).add(make_snippet(title))
+    engine.dispose()
+
+
+@pytest.fixture
+def urls(tmp_path):
+    # No replication between the files, so each read shows where it went
+    urls = {
+        name: f"sqlite:///{tmp_path / name}.sqlite"
+        for name in ("primary", "replica_a", "replica_b")
+    }
+    create_library(urls["primary"], "On primary")
+    create_library(urls["replica_a"], "On replica a")
+    create_library(urls["replica_b"], "On replica b")
+    return urls
+
+
+@pytest.fixture
+def router(urls):
+    router = ReplicaRouter(
+        urls["primary"],
+        [urls["replica_a"], urls["replica_b"]],
+        read_your_writes=0.2,
+    )
+    yield router
+    router.dispose()
+
+
+def test_reads_round_robin_over_replicas(router):
+    repo = DBSnippetRepo(router.session())
+    titles = []
+    for _ in range(4):
+        repo.session.expunge_all()
+        titles.append(repo.list()[0].title)
+    assert titles == ["On replica a", "On replica b"] * 2
+
+
+def test_writes_go_to_primary_and_reads_follow(router, urls):
+    repo = DBSnippetRepo(router.session())
+    repo.add(make_snippet("Fresh"))
+    # Read-your-writes: the replicas don't have it (yet)
+    assert [s.title for s in repo.list()] == ["On primary", "Fresh"]
+
+    time.sleep(0.25)
+    repo.session.expunge_all()
+    assert [s.title for s in repo.list()] in (["On replica a"], ["On replica b"])
+
+    # Reads a write depends on still see the primary
+    repo.favorite_on(2)
+    with Session(create_engine(urls["primary"])) as session:
+        snippet = DBSnippetRepo(session).get(2)
+        assert snippet is not None
+        assert snippet.favorite is True
+
+
+def test_unhealthy_replica_is_skipped(urls, tmp_path):
+    router = ReplicaRouter(
+        urls["primary"],
+        [f"sqlite:///{tmp_path / 'missing' / 'replica.sqlite'}", urls["replica_a"]],
+        read_your_writes=0,
+    )
+    assert router.check(router.replicas[0]) == (False, 0.0)
+    repo = DBSnippetRepo(router.session())
+    for _ in range(3):
+        repo.session.expunge_all()
+        assert [s.title for s in repo.list()] == ["On replica a"]
+    router.dispose()
+
+
+def test_no_healthy_replica_falls_back_to_primary(urls, tmp_path):
+    router = ReplicaRouter(
+        urls["primary"],
+        [f"sqlite:///{tmp_path / 'missing' / 'replica.sqlite'}"],
+        read_your_writes=0,
+    )
+    assert router.reader() is router.primary
+    repo = DBSnippetRepo(router.session())
+    assert [s.title for s in repo.list()] == ["On primary"]
+    router.dispose()
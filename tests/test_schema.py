@@ -0,0 +1,80 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import Session, create_engine
+
+from snipster_tui import schema
+from snipster_tui.exceptions import LibraryNotSetUpError
+from snipster_tui.models import Snippet, UsageCount
+from snipster_tui.repo import DBSnippetRepo
+
+# The snippet table as the first release created it
+BASELINE_DDL = (
+    "CREATE TABLE snippet (id INTEGER NOT NULL, title VARCHAR NOT NULL, "
+    "code VARCHAR NOT NULL, description VARCHAR NOT NULL, "
+    "favorite BOOLEAN NOT NULL, language VARCHAR(10) NOT NULL, PRIMARY KEY (id))"
+)
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.sqlite'}")
+    with engine.begin() as connection:
+        connection.execute(text(BASELINE_DDL))
+        connection.execute(
+            text(
+                "INSERT INTO snippet VALUES (1, 'Hello', 'print(\"Hello\")\n', "
+                "'old snippet', 0, 'python'), (2, 'Other', 'x = 1', '', 1, 'python')"
+            )
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_opens_a_baseline_library(baseline_engine):
+    schema.upgrade(baseline_engine)
+
+    inspector = inspect(baseline_engine)
+    columns = {column["name"] for column in inspector.get_columns("snippet")}
+    assert set(schema.ADDED_COLUMNS) <= columns
+    assert "snippet_usage" in inspector.get_table_names()
+    assert inspector.get_indexes("snippet")
+
+    with Session(baseline_engine) as session:
+        repo = DBSnippetRepo(session)
+        snippet = repo.get(1)
+        assert snippet is not None
+        assert snippet.code == 'print("Hello")\n'
+        assert snippet.code_preview == 'print("Hello")\n'
+        assert snippet.line_count == 1
+        assert snippet.content_hash
+        assert [s.id for s in repo.list()] == [1, 2]
+        assert [s.id for s in repo.search("Hello")] == [1]
+        assert [s.id for s in repo.list_favorites()] == [2]
+
+        repo.patch(1, code="print('changed')")
+        now = datetime.now(UTC)
+        repo.record_usage({2: UsageCount(1, 0, now, 1.0)})
+        repo.add(Snippet(title="New", code="y = 2", description=""))
+        snippet = repo.get(1)
+        assert snippet is not None
+        assert snippet.code == "print('changed')"
+        assert repo.most_used()[0][0].id == 2
+        assert repo.similar(1) is not None
+
+
+def test_upgrade_is_idempotent(baseline_engine):
+    schema.upgrade(baseline_engine)
+    schema.upgrade(baseline_engine)
+    with Session(baseline_engine) as session:
+        assert len(DBSnippetRepo(session).list()) == 2
+
+
+def test_upgrade_needs_a_library(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.sqlite'}")
+    with pytest.raises(LibraryNotSetUpError):
+        schema.upgrade(engine)
+    schema.install(engine)
+    schema.upgrade(engine)
+    engine.dispose()
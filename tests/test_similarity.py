@@ -0,0 +1,49 @@
+from snipster_tui import similarity
+
+
+def test_signature_ignores_whitespace_and_case():
+    first = similarity.minhash_signature("SELECT *\n  FROM snippet;")
+    second = similarity.minhash_signature("select * from   SNIPPET;")
+
+    assert first.shape == (similarity.NUM_PERMUTATIONS,)
+    assert (first == second).all()
+    assert similarity.band_keys(first) == similarity.band_keys(second)
+
+
+def test_signature_roundtrip_and_empty_code():
+    signature = similarity.minhash_signature("print('Hello, World!')")
+    blob = similarity.signature_to_bytes(signature)
+
+    assert len(blob) == similarity.NUM_PERMUTATIONS * 4
+    assert (similarity.signature_from_bytes(blob) == signature).all()
+    assert similarity.minhash_signature("   ").size == 0
+    assert similarity.band_keys(similarity.minhash_signature("")) == []
+
+
+def test_rank_similar_orders_by_estimate():
+    base = " ".join(f"token{i}" for i in range(200))
+    close = base.replace("token5 ", "changed ")
+    far = base.replace("token1", "other")
+    signatures = {
+        2: similarity.minhash_signature(far),
+        3: similarity.minhash_signature(close),
+    }
+
+    ranked = similarity.rank_similar(
+        similarity.minhash_signature(base), signatures, threshold=0.0
+    )
+    assert [snippet_id for snippet_id, _ in ranked] == [3, 2]
+    assert ranked[0][1] > ranked[1][1]
+
+
+def test_duplicate_clusters_are_transitive():
+    code = " ".join(f"token{i}" for i in range(200))
+    signatures = {
+        1: similarity.minhash_signature(code),
+        2: similarity.minhash_signature(code + " tail"),
+        3: similarity.minhash_signature(code + " tail end"),
+        4: similarity.minhash_signature("something else entirely"),
+    }
+
+    clusters = similarity.duplicate_clusters([[1, 2], [2, 3], [3, 4]], signatures)
+    assert clusters == [[1, 2, 3]]
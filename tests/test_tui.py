@@ -1,10 +1,14 @@
+import asyncio
 from pathlib import Path
 
 import pytest
 from decouple import Config, RepositoryEnv
 from sqlmodel import Session, SQLModel, create_engine, text
 from sqlmodel.pool import StaticPool
+from textual.widgets import OptionList
 
+from snipster_tui import tui
+from snipster_tui.memory import MemoryReport
 from snipster_tui.models import Language, Snippet
 from snipster_tui.tui import DBSnippetRepo, Snipster
 
@@ -62,6 +66,8 @@ def tui_config(request, monkeypatch, engine):
     monkeypatch.setattr("snipster_tui.tui.get_session", mock_get_session)
     monkeypatch.setattr("snipster_tui.tui.ensure_env_file", mock_ensure_env_file)
     monkeypatch.setattr("snipster_tui.tui.DATABASE_URL_MOD", db_url)
+    # Die Snapshots teilen sich die Engine, Nutzung darf die Reihenfolge nicht ändern
+    monkeypatch.setattr("snipster_tui.usage.TRACK_USAGE", False)
 
     import importlib
 
@@ -436,6 +442,27 @@ def test_list_snippets_ui_list_favorite(
     assert snap_compare(Snipster(), run_before=click_list)
 
 
+@pytest.mark.parametrize("engine", ["memory"], indirect=True)
+def test_list_snippets_ui_filter_and_sort(
+    engine, repo, example_snippets, snap_compare, monkeypatch, tui_config
+):
+    """Favoriten-Chip + Sortierung per Header-Klick"""
+
+    def mock_get_session():
+        return repo.session
+
+    async def click_list(pilot):
+        monkeypatch.setattr("snipster_tui.tui.get_session", mock_get_session)
+        await pilot.press("tab")
+        await pilot.press("enter")
+        await pilot.click("#chip_favorites")
+        await pilot.click("#chip_favorites")
+        await pilot.click("#snippet_table", offset=(10, 0))
+        await pilot.pause()
+
+    assert snap_compare(Snipster(), run_before=click_list)
+
+
 @pytest.mark.parametrize("engine", ["memory"], indirect=True)
 def test_list_snippets_ui_list_edit(
     engine, repo, example_snippets, snap_compare, monkeypatch, tui_config
@@ -568,3 +595,287 @@ def test_init_snippet_ui_default(
         await pilot.pause()
 
     assert snap_compare(Snipster(), run_before=click_init_defaults)
+
+
+def test_list_snippets_prefetch(example_snippets, tui_library):
+    """Cursor bleibt stehen → Snippet + Nachbar werden im Hintergrund geladen"""
+    tui_library(example_snippets)
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test() as pilot:
+            await pilot.click("#list")
+            await pilot.pause(tui.PREFETCH_DELAY * 2)
+            await app.workers.wait_for_complete()
+            assert set(app._prefetched) == {1, 2}
+
+            await pilot.press("enter")
+            assert isinstance(app.screen, tui.CodeViewScreen)
+            assert app.screen.syntax is app._highlighted.get(1)
+
+            await pilot.press("escape", "down", "down")
+            await pilot.pause(tui.PREFETCH_DELAY * 2)
+            await app.workers.wait_for_complete()
+            assert set(app._prefetched) == {1, 2, 3, 4}
+
+    asyncio.run(run())
+
+
+def test_memory_budget_trims_prefetch(example_snippets, tui_library):
+    """Kleines Budget → nur die zuletzt benutzten Einträge bleiben im Cache"""
+    tui_library(example_snippets)
+    report = MemoryReport()
+
+    async def run():
+        app = tui.Snipster(memory_report=report)
+        async with app.run_test() as pilot:
+            await pilot.click("#list")
+            table_bytes = app.memory_budget.usage()["table"]
+            assert table_bytes > 0
+            app.memory_budget.limit = table_bytes + 2500
+
+            await pilot.press("down", "down")
+            await pilot.pause(tui.PREFETCH_DELAY * 2)
+            await app.workers.wait_for_complete()
+            assert app.memory_budget.used() <= app.memory_budget.limit
+            # Three or four rows were prefetched, only the latest fit
+            assert len(app._prefetched) <= 2
+            assert 4 in app._prefetched and 4 in app._highlighted
+
+            await pilot.press("enter")
+            await pilot.press("escape")
+
+    report.start("Snipster")
+    asyncio.run(run())
+    report.stop()
+    assert set(report.growth) == {"Snipster", "CodeViewScreen"}
+
+
+def test_code_view_related_panel(example_snippets, tui_library, monkeypatch, tmp_path):
+    """R im Code-View → verwandte Snippets, Auswahl öffnet das Snippet"""
+    tui_library(example_snippets)
+    monkeypatch.setattr(tui.related, "INDEX_DIR", tmp_path)
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test() as pilot:
+            await pilot.click("#list")
+            await pilot.press("enter", "r")
+            await app.workers.wait_for_complete()
+            await pilot.pause()
+
+            options = app.screen.query_one("#related", OptionList)
+            assert options.display
+            assert options.option_count == 5
+            first = options.get_option_at_index(0).id
+            assert first is not None
+            assert first != "related_1"
+
+            options.highlighted = 0
+            options.action_select()
+            await pilot.pause()
+            assert isinstance(app.screen, tui.CodeViewScreen)
+            assert app.screen.snippet_id == int(first.removeprefix("related_"))
+
+    asyncio.run(run())
+    assert (tmp_path / "snapshot.npz").exists()
+
+
+def test_edit_writes_only_changed_fields(example_snippets, tui_library, monkeypatch):
+    """Edit → nur der geänderte Titel wird geschrieben, Favorit bleibt"""
+    engine = tui_library(example_snippets)
+    repo = DBSnippetRepo(Session(engine))
+    repo.favorite_on(1)
+    patches = []
+    original_patch = DBSnippetRepo.patch
+
+    def recording_patch(self, snippet_id, **fields):
+        patches.append((snippet_id, fields))
+        original_patch(self, snippet_id, **fields)
+
+    monkeypatch.setattr(DBSnippetRepo, "patch", recording_patch)
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test() as pilot:
+            await pilot.click("#list")
+            await pilot.press("e")
+            await pilot.pause()
+            app.query_one("#edit_title", tui.Input).value = "Renamed"
+            app.query_one("#update_snippet", tui.Button).press()
+            await pilot.pause()
+
+    asyncio.run(run())
+    assert patches == [(1, {"title": "Renamed"})]
+    snippet = DBSnippetRepo(Session(engine)).get(1)
+    assert snippet is not None
+    assert (snippet.title, snippet.favorite) == ("Renamed", True)
+
+
+def test_code_view_history(example_snippets, tui_library):
+    """History → Revisionen links, Diff zur nächsten Version rechts"""
+    engine = tui_library(example_snippets[:1])
+    repo = DBSnippetRepo(Session(engine))
+    repo.patch(1, code="print('Second version')")
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test() as pilot:
+            await app.open_snippet(1)
+            await pilot.press("h")
+            await pilot.pause()
+            assert isinstance(app.screen, tui.HistoryScreen)
+            revisions = app.screen.query_one("#revisions", OptionList)
+            assert revisions.option_count == 1
+            revisions.highlighted = 0
+            await pilot.pause()
+            diff = app.screen.query_one("#diff_view", tui.Static).content.code
+            assert "+print('Second version')" in diff
+
+    asyncio.run(run())
+
+
+def test_trash_chip_restore_and_empty(example_snippets, tui_library):
+    """D → Papierkorb, Trash-Chip zeigt ihn, U stellt wieder her"""
+    engine = tui_library(example_snippets[:2])
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test(size=(160, 40)) as pilot:
+            await pilot.click("#list")
+            await pilot.press("d")
+            await pilot.pause()
+            table = app.query_one("#snippet_table", tui.DataTable)
+            assert table.row_count == 1
+
+            await pilot.click("#chip_trash")
+            table = app.query_one("#snippet_table", tui.DataTable)
+            assert [row.value for row in table.rows] == ["1"]
+            await pilot.press("u")
+            assert app.query_one("#snippet_table", tui.DataTable).row_count == 0
+
+            await pilot.click("#chip_trash")
+            await pilot.press("d", "d")
+            await pilot.click("#chip_trash")
+            await pilot.click("#empty_trash")
+            await app.workers.wait_for_complete()
+            await pilot.pause()
+            assert app.query_one("#snippet_table", tui.DataTable).row_count == 0
+
+    asyncio.run(run())
+    assert DBSnippetRepo(Session(engine)).list_trash() == []
+
+
+def test_list_snippets_federated(example_snippets, monkeypatch, tmp_path):
+    """Mehrere Bibliotheken → IDs mit Namespace in der Tabelle"""
+    libraries = {}
+    for name, snippet in zip(("personal", "team"), example_snippets):
+        libraries[name] = f"sqlite:///{tmp_path / name}.sqlite"
+        engine = create_engine(libraries[name])
+        SQLModel.metadata.create_all(engine)
+        DBSnippetRepo(Session(engine)).add(snippet)
+    value = ",".join(f"{name}={url}" for name, url in libraries.items())
+    monkeypatch.setattr(tui, "LIBRARIES_MOD", value)
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test() as pilot:
+            await pilot.click("#list")
+            table = app.query_one("#snippet_table", tui.DataTable)
+            ids = [table.get_row_at(row)[0] for row in range(table.row_count)]
+            assert ids == ["personal:1", "team:1"]
+
+    asyncio.run(run())
+
+
+def test_init_test_connection(monkeypatch, tmp_path):
+    """Test connection → Latenz im Status, fehlende Postgres-Felder → Hinweis"""
+    monkeypatch.setattr(tui, "DEFAULT_DB_PATH", tmp_path / "probe.sqlite")
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test() as pilot:
+            await pilot.click("#init")
+            status = app.query_one("#status", tui.Static)
+
+            app.query_one("#db_options", OptionList).highlighted = 1
+            app.query_one("#test_connection", tui.Button).press()
+            await pilot.pause()
+            assert "Please fill all Postgres fields" in str(status.render())
+
+            app.query_one("#db_options", OptionList).highlighted = 0
+            app.query_one("#test_connection", tui.Button).press()
+            await pilot.pause()
+            await app.workers.wait_for_complete()
+            await pilot.pause()
+            assert "Connected in" in str(status.render())
+            assert "round trip" in str(status.render())
+
+    asyncio.run(run())
+
+
+def test_usage_is_counted_and_ranked(example_snippets, tui_library):
+    """Öffnen/Kopieren wird gepuffert, Most-used-Chip sortiert danach"""
+    engine = tui_library(example_snippets[:3])
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test(size=(160, 40)) as pilot:
+            await pilot.click("#list")
+            await pilot.press("down", "enter")
+            await pilot.click("#copy_btn")
+            await pilot.press("escape", "enter", "escape")
+            assert app.usage.pending()[2].opens == 2
+            assert DBSnippetRepo(Session(engine)).most_used() == []
+
+            await pilot.click("#chip_most_used")
+            table = app.query_one("#snippet_table", tui.DataTable)
+            assert [row.value for row in table.rows] == ["2"]
+            assert table.get_row_at(0)[-1] == "3"
+            assert len(app.usage) == 0
+
+            # Ohne Chip: Standardliste nach Frecency
+            await pilot.click("#chip_most_used")
+            table = app.query_one("#snippet_table", tui.DataTable)
+            assert [row.value for row in table.rows] == ["2", "1", "3"]
+
+            await pilot.press("enter", "escape")
+        # Beim Beenden wird der Rest geschrieben
+        assert DBSnippetRepo(Session(engine)).most_used()[0][1] == 4
+
+    asyncio.run(run())
+
+
+def test_related_index_follows_writes(
+    example_snippets, tui_library, monkeypatch, tmp_path
+):
+    """Löschen nach dem ersten Laden → Index nachgeführt, kein neuer Abgleich"""
+    tui_library(example_snippets)
+    monkeypatch.setattr(tui.related, "INDEX_DIR", tmp_path)
+    syncs = []
+    original_sync = tui.RelatedIndex.sync
+
+    def counting_sync(index, repo):
+        syncs.append(repo)
+        return original_sync(index, repo)
+
+    monkeypatch.setattr(tui.RelatedIndex, "sync", counting_sync)
+
+    async def run():
+        app = tui.Snipster()
+        async with app.run_test() as pilot:
+            await pilot.click("#list")
+            await pilot.press("enter", "r")
+            await app.workers.wait_for_complete()
+            await pilot.press("escape")
+            await pilot.pause()
+
+            await app.delete_selected_snippet(2)
+            assert app.related_index is not None
+            assert 2 not in app.related_index.documents
+            await pilot.press("enter", "r")
+            await app.workers.wait_for_complete()
+            await pilot.pause()
+
+    asyncio.run(run())
+    assert len(syncs) == 1
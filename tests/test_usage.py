@@ -0,0 +1,61 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from snipster_tui.repo import InMemorySnippetRepo
+from snipster_tui.usage import (
+    FRECENCY_HALF_LIFE,
+    UsageBuffer,
+    decayed,
+    frecency_weight,
+)
+
+
+class FailingRepo(InMemorySnippetRepo):
+    def record_usage(self, usage):
+        raise OSError("database is locked")
+
+
+def test_buffer_sums_until_flushed():
+    buffer = UsageBuffer()
+    buffer.opened(1)
+    buffer.opened(1)
+    buffer.copied(1)
+    buffer.copied(2)
+
+    pending = buffer.pending()
+    assert (pending[1].opens, pending[1].copies) == (2, 1)
+    assert (pending[2].opens, pending[2].copies) == (0, 1)
+    assert pending[1].last_used is not None
+
+    repo = InMemorySnippetRepo()
+    assert buffer.flush(repo) == 2
+    assert len(buffer) == 0
+    assert buffer.flush(repo) == 0
+
+
+def test_failed_flush_keeps_the_counts():
+    buffer = UsageBuffer()
+    buffer.opened(1)
+    with pytest.raises(OSError):
+        buffer.flush(FailingRepo())
+    buffer.opened(1)
+    assert buffer.pending()[1].opens == 2
+
+
+def test_disabled_buffer_counts_nothing():
+    buffer = UsageBuffer(enabled=False)
+    buffer.opened(1)
+    buffer.copied(1)
+    assert len(buffer) == 0
+
+
+def test_frecency_halves_every_half_life():
+    now = datetime(2026, 3, 1, tzinfo=UTC)
+    recent = frecency_weight(now)
+    old = frecency_weight(now - FRECENCY_HALF_LIFE)
+
+    assert recent == pytest.approx(2 * old)
+    assert decayed(recent + old, now) == pytest.approx(1.5)
+    # Ranking by the stored sums does not depend on when it is read
+    assert decayed(recent, now + FRECENCY_HALF_LIFE) == pytest.approx(0.5)